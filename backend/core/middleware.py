@@ -0,0 +1,74 @@
+"""
+Response compression: brotli when the client accepts it and the brotli
+package is installed, gzip otherwise
+"""
+
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+ACCEPTS_BR = re.compile(r'\bbr\b')
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+# Already compressed formats gain nothing
+SKIP_CONTENT_TYPES = (
+    'image/', 'video/', 'audio/', 'application/zip', 'application/gzip', 'application/pdf',
+    'application/vnd.openxmlformats',
+)
+
+
+def choose_encoding(accept_encoding: str):
+    if BROTLI_AVAILABLE and ACCEPTS_BR.search(accept_encoding):
+        return 'br'
+    if ACCEPTS_GZIP.search(accept_encoding):
+        return 'gzip'
+    return None
+
+
+def compress(content: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(content, quality=getattr(settings, 'RESPONSE_COMPRESSION_BROTLI_QUALITY', 5))
+    # Random bytes in the gzip header mitigate BREACH, as GZipMiddleware does
+    return compress_string(content, max_random_bytes=100)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress non-streaming responses of at least
+    settings.RESPONSE_COMPRESSION_MIN_BYTES. Like GZipMiddleware it weakens
+    strong ETags, which conditional GETs still match.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < getattr(settings, 'RESPONSE_COMPRESSION_MIN_BYTES', 1024):
+            return response
+        if response.get('Content-Type', '').startswith(SKIP_CONTENT_TYPES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
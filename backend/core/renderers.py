@@ -0,0 +1,62 @@
+"""
+orjson-based renderer and parser for Django REST framework.
+
+Output matches rest_framework.renderers.JSONRenderer: datetimes, dates,
+times, timedeltas, Decimals, lazy translation strings, sets and querysets
+are converted by DRF's own encoder, non-string dict keys are stringified
+and U+2028/U+2029 are escaped.
+"""
+
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_drf_encoder = JSONEncoder()
+
+OPTIONS = (
+    orjson.OPT_NON_STR_KEYS |
+    orjson.OPT_SERIALIZE_NUMPY |
+    # DRF's encoder formats these ('Z' for UTC, error on aware times)
+    orjson.OPT_PASSTHROUGH_DATETIME
+)
+
+
+def _default(obj):
+    return _drf_encoder.default(obj)
+
+
+def dumps(data, indent: bool = False) -> bytes:
+    """
+    Serialize like DRF's JSONRenderer, returning UTF-8 bytes
+    """
+    return orjson.dumps(data, default=_default, option=OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in JSONRenderer replacement; indentation requests render with two spaces
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        content = dumps(data, indent=bool(indent))
+        # Keep the output a strict javascript subset, as DRF does
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSON request bodies parsed with orjson (UTF-8 only, as RFC 8259 requires)
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
@@ -67,6 +67,7 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -125,6 +126,44 @@ else:
             }
         }
 
+# The session covering indexes INCLUDE their non-key columns on PostgreSQL
+# only; SQLite builds them as plain composite indexes
+if DATABASES['default']['ENGINE'].endswith('sqlite3'):
+    SILENCED_SYSTEM_CHECKS = ['models.W040']
+
+# Caches: grouped timetable views ('default') and per-institution reference
+# data ('reference'). A redis:// URL shares entries between processes, a
+# file:// URL names a directory for FileBasedCache; the default is per-process.
+CACHE_URL = config('CACHE_URL', default='')
+REFERENCE_CACHE_URL = config('REFERENCE_CACHE_URL', default=CACHE_URL)
+
+
+def _cache_backend(url, name):
+    if url.startswith('redis'):
+        return {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': url}
+    if url.startswith('file://'):
+        return {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': url[len('file://'):]}
+    return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': name}
+
+
+CACHES = {
+    'default': _cache_backend(CACHE_URL, 'timetable-cache'),
+    'reference': _cache_backend(REFERENCE_CACHE_URL, 'reference-data'),
+}
+TIMETABLE_VIEW_CACHE_SECONDS = config('TIMETABLE_VIEW_CACHE_SECONDS', default=3600, cast=int)
+REFERENCE_CACHE_SECONDS = config('REFERENCE_CACHE_SECONDS', default=3600, cast=int)
+# Uncommitted generated variants are deleted after this long
+TIMETABLE_VARIANT_TTL_HOURS = config('TIMETABLE_VARIANT_TTL_HOURS', default=24, cast=int)
+# Archived timetables (timetable.archive): a full snapshot every N versions, deltas between
+TIMETABLE_ARCHIVE_SNAPSHOT_INTERVAL = config('TIMETABLE_ARCHIVE_SNAPSHOT_INTERVAL', default=10, cast=int)
+TIMETABLE_ARCHIVE_CACHE_SECONDS = config('TIMETABLE_ARCHIVE_CACHE_SECONDS', default=3600, cast=int)
+# Compact the timetables an activation archives
+TIMETABLE_ARCHIVE_ON_ACTIVATE = config('TIMETABLE_ARCHIVE_ON_ACTIVATE', default=True, cast=bool)
+
+# Response compression (core.middleware.CompressionMiddleware); brotli is used when installed
+RESPONSE_COMPRESSION_MIN_BYTES = config('RESPONSE_COMPRESSION_MIN_BYTES', default=1024, cast=int)
+RESPONSE_COMPRESSION_BROTLI_QUALITY = config('RESPONSE_COMPRESSION_BROTLI_QUALITY', default=5, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -163,6 +202,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'users.User'
 
 # REST Framework Configuration
+# orjson is optional; without it DRF's own JSON renderer and parser are used
+try:
+    import orjson  # noqa: F401
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -172,7 +218,12 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'core.renderers.ORJSONRenderer' if ORJSON_AVAILABLE else 'rest_framework.renderers.JSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.ORJSONParser' if ORJSON_AVAILABLE else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
@@ -211,9 +262,27 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = FILE_UPLOAD_MAX_MEMORY_SIZE
 
 # Scheduler Settings
 SCHEDULER_TIMEOUT = config('SCHEDULER_TIMEOUT', default=300, cast=int)  # 5 minutes
+# Budget for explaining an infeasible solve (assumption re-solve plus core minimization)
+SCHEDULER_EXPLAIN_SECONDS = config('SCHEDULER_EXPLAIN_SECONDS', default=30, cast=int)
 MAX_GENERATIONS = config('MAX_GENERATIONS', default=1000, cast=int)
 POPULATION_SIZE = config('POPULATION_SIZE', default=100, cast=int)
 
+# Database job queue (run_generation_worker)
+SCHEDULER_JOB_POLL_SECONDS = config('SCHEDULER_JOB_POLL_SECONDS', default=2, cast=float)
+SCHEDULER_JOB_HEARTBEAT_SECONDS = config('SCHEDULER_JOB_HEARTBEAT_SECONDS', default=15, cast=int)
+SCHEDULER_JOB_STALE_SECONDS = config('SCHEDULER_JOB_STALE_SECONDS', default=120, cast=int)
+# Duplicate generation requests attach to the in-flight job; requests with other
+# inputs for the same institution are queued behind it ('queue') or refused ('reject')
+SCHEDULER_COALESCE_POLICY = config('SCHEDULER_COALESCE_POLICY', default='queue')
+SCHEDULER_COALESCE_WAIT_SECONDS = config('SCHEDULER_COALESCE_WAIT_SECONDS', default=SCHEDULER_TIMEOUT + 60, cast=int)
+
+# Engine selection thresholds (see scheduler.estimator.DEFAULT_THRESHOLDS)
+SCHEDULER_ENGINE_THRESHOLDS = {
+    'monolithic_max_variables': config('SCHEDULER_MONOLITHIC_MAX_VARIABLES', default=50000, cast=int),
+    'prepass_max_variables': config('SCHEDULER_PREPASS_MAX_VARIABLES', default=150000, cast=int),
+    'max_memory_mb': config('SCHEDULER_MAX_MEMORY_MB', default=4096, cast=int),
+}
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
@@ -0,0 +1,401 @@
+"""
+Capacity planning: the minimum rooms per (kind, capacity band) that still
+admit a timetable satisfying every hard constraint
+"""
+
+import logging
+import math
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from ortools.sat.python import cp_model
+
+from .feasibility import FeasibilityAnalyzer
+from .teacher_assignment import TeacherAssigner
+
+logger = logging.getLogger(__name__)
+
+SEARCH_MODES = ('minimize', 'probes')
+KINDS = ('theory', 'lab')
+LAB_SEAT_FACTOR = 2  # a lab seat costs twice a classroom seat when breaking ties
+# Soft terms mirrored from the scheduler's objective and optimization score
+MAX_SUBJECT_SESSIONS_PER_DAY = 2
+IDEAL_MAX_CLASS_HOURS_PER_DAY = 6
+
+
+def _room_type(kind: str, capacity: int) -> str:
+    return f"{kind}:{capacity}"
+
+
+def solve_probe(task: Dict) -> Dict:
+    """
+    Build and solve the aggregated room-count model for one probe. Runs in a
+    worker process; ``task['spec']`` holds plain ids and counts only.
+
+    ``task['mode']`` is 'min_rooms' (minimize rooms, then seats), 'feasible'
+    (any schedule within ``budget`` rooms) or 'quality' (best soft-constraint
+    penalty within ``budget`` rooms).
+    """
+    start = time.perf_counter()
+    spec = task['spec']
+    mode = task['mode']
+    budget = task.get('budget')
+    slots = range(len(spec['slot_days']))
+    bands = spec['bands']
+    kinds = spec['kinds']
+    demands = spec['demands']
+
+    model = cp_model.CpModel()
+    place = []
+    by_teacher_slot = defaultdict(list)
+    by_teacher_day = defaultdict(list)
+    by_teacher = defaultdict(list)
+    by_class_slot = defaultdict(list)
+    by_class_day = defaultdict(list)
+    # sessions[slot][(needs_lab, band)] -> placements needing that room type
+    sessions = [defaultdict(list) for _ in slots]
+
+    for index, demand in enumerate(demands):
+        row = [model.NewBoolVar(f"place_{index}_{slot}") for slot in slots]
+        place.append(row)
+        model.Add(sum(row) == demand['hours'])
+        for slot, var in enumerate(row):
+            day = spec['slot_days'][slot]
+            by_teacher_slot[(demand['teacher'], slot)].append(var)
+            by_teacher_day[(demand['teacher'], day)].append(var)
+            by_teacher[demand['teacher']].append(var)
+            by_class_slot[(demand['class_group'], slot)].append(var)
+            by_class_day[(demand['class_group'], day)].append(var)
+            sessions[slot][(demand['needs_lab'], demand['band'])].append(var)
+
+    for terms in list(by_teacher_slot.values()) + list(by_class_slot.values()):
+        if len(terms) > 1:
+            model.Add(sum(terms) <= 1)
+    for (teacher_id, _), terms in by_teacher_day.items():
+        model.Add(sum(terms) <= spec['teachers'][teacher_id]['max_hours_per_day'])
+    for teacher_id, terms in by_teacher.items():
+        model.Add(sum(terms) <= spec['teachers'][teacher_id]['max_hours_per_week'])
+
+    counts = {
+        (kind, band): model.NewIntVar(0, spec['max_rooms'], f"rooms_{kind}_{bands[band]}")
+        for kind in kinds for band in range(len(bands))
+    }
+    total_rooms = sum(counts.values())
+    # The counting bound lets the solver prove minimality without search
+    model.Add(total_rooms >= spec.get('lower_bound', 0))
+    if budget is not None:
+        model.Add(total_rooms <= budget)
+
+    # Hall's condition per slot: lab sessions of band >= a and other sessions
+    # of band >= b need as many rooms as the union of their eligible types.
+    # Eligible sets are nested by capacity, so these thresholds are exact.
+    lab_kind = 'lab' if 'lab' in kinds else None
+    none = len(bands)
+    for slot in slots:
+        for lab_from in range(none + 1):
+            for other_from in range(none + 1):
+                needed = [var for (needs_lab, band), terms in sessions[slot].items()
+                          if band >= (lab_from if needs_lab else other_from) for var in terms]
+                if not needed:
+                    continue
+                available = [counts[('theory', band)] for band in range(other_from, none)]
+                if lab_kind:
+                    available += [counts[(lab_kind, band)] for band in range(min(lab_from, other_from), none)]
+                model.Add(sum(needed) <= sum(available))
+
+    seats = sum(
+        count * bands[band] * (LAB_SEAT_FACTOR if kind == 'lab' else 1)
+        for (kind, band), count in counts.items()
+    )
+    max_seats = spec['max_rooms'] * len(counts) * max(bands) * LAB_SEAT_FACTOR + 1
+    clustering, overload = [], []
+    if mode == 'min_rooms':
+        model.Minimize(max_seats * total_rooms + seats)
+    elif mode == 'quality':
+        for index, demand in enumerate(demands):
+            per_day = defaultdict(list)
+            for slot, var in enumerate(place[index]):
+                per_day[spec['slot_days'][slot]].append(var)
+            for day, terms in per_day.items():
+                if demand['hours'] > MAX_SUBJECT_SESSIONS_PER_DAY:
+                    excess = model.NewIntVar(0, demand['hours'], f"cluster_{index}_{day}")
+                    model.Add(sum(terms) <= MAX_SUBJECT_SESSIONS_PER_DAY + excess)
+                    clustering.append(excess)
+        for (class_id, day), terms in by_class_day.items():
+            if len(terms) > IDEAL_MAX_CLASS_HOURS_PER_DAY:
+                excess = model.NewIntVar(0, len(terms), f"overload_{class_id}_{day}")
+                model.Add(sum(terms) <= IDEAL_MAX_CLASS_HOURS_PER_DAY + excess)
+                overload.append(excess)
+        model.Minimize(max_seats * (spec['max_rooms'] * len(counts) + 1) * (sum(clustering) + sum(overload))
+                       + max_seats * total_rooms + seats)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = task['time_limit']
+    solver.parameters.num_search_workers = task['num_workers']
+    status = solver.Solve(model)
+
+    result = {
+        'mode': mode,
+        'budget': budget,
+        'status': solver.StatusName(status).lower(),
+        'time': time.perf_counter() - start,
+    }
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        rooms = {
+            _room_type(kind, bands[band]): solver.Value(count)
+            for (kind, band), count in counts.items() if solver.Value(count)
+        }
+        result['rooms'] = rooms
+        result['total_rooms'] = sum(rooms.values())
+        result['seats'] = sum(
+            solver.Value(count) * bands[band] for (kind, band), count in counts.items()
+        )
+        if mode == 'quality':
+            result['clustering_penalty'] = sum(solver.Value(var) for var in clustering)
+            result['overloaded_hours'] = sum(solver.Value(var) for var in overload)
+            result['penalty'] = result['clustering_penalty'] + result['overloaded_hours']
+    return result
+
+
+class CapacityPlanner:
+    """
+    Finds the fewest rooms per (kind, capacity band) for which the demand
+    model still has a timetable, and how quality improves with extra rooms.
+
+    Teachers are fixed by the teacher-assignment pre-pass and individual
+    rooms are replaced by one integer count per room type, so the model has
+    one Boolean per (demand, slot) regardless of how many rooms are tried.
+    The minimum is found by one minimizing solve ('minimize') or by rounds
+    of parallel feasibility probes on the total room budget ('probes').
+    """
+
+    def __init__(self, data, capacity_bands: Optional[List[int]] = None, strength_growth: float = 1.0,
+                 search: str = 'minimize', max_extra_rooms: int = 3, time_limit: float = 60,
+                 max_workers: Optional[int] = None):
+        if search not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{search}' (expected one of: {', '.join(SEARCH_MODES)})")
+        self.data = data
+        self.capacity_bands = sorted(set(capacity_bands)) if capacity_bands else None
+        self.strength_growth = strength_growth
+        self.search = search
+        self.max_extra_rooms = max_extra_rooms
+        self.time_limit = time_limit
+        cpus = os.cpu_count() or 1
+        self.max_workers = max(1, max_workers or cpus)
+
+    def _strengths(self) -> Dict[int, int]:
+        return {
+            class_group.id: math.ceil(class_group.strength * self.strength_growth)
+            for class_group in self.data.class_groups
+        }
+
+    def _bands(self, strengths: Dict[int, int]) -> List[int]:
+        if self.capacity_bands:
+            return self.capacity_bands
+        # Existing room sizes, plus one band for classes that outgrew them
+        bands = sorted({room.capacity for room in self.data.rooms})
+        largest = max(strengths.values(), default=0)
+        if not bands or largest > bands[-1]:
+            bands.append(int(math.ceil(largest / 10.0) * 10))
+        return bands
+
+    def build_spec(self) -> Dict:
+        """
+        Reduce the scheduling data to the plain demand model the probes
+        solve. Raises ValueError when no teacher assignment exists or a class
+        fits no capacity band.
+        """
+        analyzer = FeasibilityAnalyzer(self.data)
+        if not analyzer.slots:
+            raise ValueError("No usable time slots in the weekly calendar")
+        assignment = TeacherAssigner(self.data).assign()
+        if assignment is None:
+            raise ValueError("Teachers cannot cover the required hours; capacity planning needs "
+                             "a feasible teacher assignment (see the feasibility analysis)")
+
+        strengths = self._strengths()
+        bands = self._bands(strengths)
+        lab_rule = self.data.constraints.get('lab_subjects_in_lab_rooms', True)
+        subjects = {subject.id: subject for subject in self.data.subjects}
+
+        demands = []
+        for (subject_id, class_id), hours in analyzer.demands().items():
+            band = next((index for index, capacity in enumerate(bands) if capacity >= strengths[class_id]), None)
+            if band is None:
+                raise ValueError(f"Class group {class_id} ({strengths[class_id]} students) fits no "
+                                 f"capacity band (largest is {bands[-1]})")
+            demands.append({
+                'subject': subject_id,
+                'class_group': class_id,
+                'teacher': assignment[(subject_id, class_id)],
+                'hours': hours,
+                'needs_lab': bool(lab_rule and subjects[subject_id].type == 'lab'),
+                'band': band,
+            })
+
+        kinds = KINDS if any(demand['needs_lab'] for demand in demands) else KINDS[:1]
+        teachers = {
+            teacher.id: {
+                'max_hours_per_day': teacher.max_hours_per_day,
+                'max_hours_per_week': analyzer.teacher_capacity(teacher),
+            }
+            for teacher in self.data.teachers
+        }
+        return {
+            'slot_days': [day for day, _, _ in analyzer.slots],
+            'bands': bands,
+            'kinds': kinds,
+            'demands': demands,
+            'teachers': teachers,
+            # Never more sessions at once than class groups
+            'max_rooms': len(self.data.class_groups),
+        }
+
+    def existing_rooms(self, spec: Dict) -> Dict[str, int]:
+        """
+        Current rooms counted in the largest band they can serve
+        """
+        rooms = defaultdict(int)
+        for room in self.data.rooms:
+            fitting = [capacity for capacity in spec['bands'] if capacity <= room.capacity]
+            if not fitting:
+                continue
+            kind = 'lab' if room.is_lab and 'lab' in spec['kinds'] else 'theory'
+            rooms[_room_type(kind, fitting[-1])] += 1
+        return dict(rooms)
+
+    @staticmethod
+    def lower_bound(spec: Dict) -> int:
+        """
+        Counting bound on total rooms: the busiest room-type family cannot
+        host more than one session per slot per room
+        """
+        hours = defaultdict(int)
+        for demand in spec['demands']:
+            hours[(demand['needs_lab'], demand['band'])] += demand['hours']
+        slots = len(spec['slot_days'])
+        none = len(spec['bands'])
+        bound = 0
+        for lab_from in range(none + 1):
+            for other_from in range(none + 1):
+                needed = sum(h for (needs_lab, band), h in hours.items()
+                             if band >= (lab_from if needs_lab else other_from))
+                bound = max(bound, math.ceil(needed / slots))
+        return bound
+
+    def _task(self, spec: Dict, mode: str, budget: Optional[int] = None, parallel: int = 1) -> Dict:
+        return {
+            'spec': spec,
+            'mode': mode,
+            'budget': budget,
+            'time_limit': self.time_limit,
+            'num_workers': max(1, (os.cpu_count() or 1) // parallel),
+        }
+
+    def _solve_all(self, tasks: List[Dict]) -> List[Dict]:
+        if self.max_workers == 1 or len(tasks) == 1:
+            return [solve_probe(task) for task in tasks]
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tasks)), mp_context=context) as pool:
+            return list(pool.map(solve_probe, tasks))
+
+    def _minimize(self, spec: Dict) -> Optional[Dict]:
+        result = solve_probe(self._task(spec, 'min_rooms'))
+        return result if 'rooms' in result else None
+
+    def _probe_search(self, spec: Dict, low: int) -> Tuple[Optional[Dict], List[Dict], bool]:
+        """
+        Narrow [low, high] on the total room budget with rounds of parallel
+        feasibility probes; an unknown probe neither raises ``low`` nor lowers
+        ``high``. Returns the smallest feasible probe, all probes, and whether
+        its room count is proven minimal.
+        """
+        high = spec['max_rooms']
+        parallel = min(self.max_workers, high - low + 1)
+        probes = []
+        best = solve_probe(self._task(spec, 'feasible', high, 1))
+        probes.append(best)
+        if 'rooms' not in best:
+            return None, probes, False
+        high = best['total_rooms']
+
+        while low < high:
+            step = max(1, (high - low) // (parallel + 1))
+            budgets = sorted({min(high - 1, low + step * (i + 1) - 1) for i in range(parallel)})
+            results = self._solve_all([self._task(spec, 'feasible', budget, len(budgets)) for budget in budgets])
+            probes.extend(results)
+            progress = False
+            for result in results:
+                if 'rooms' in result and result['total_rooms'] < high:
+                    high, best, progress = result['total_rooms'], result, True
+                elif result['status'] == 'infeasible' and result['budget'] + 1 > low:
+                    low, progress = result['budget'] + 1, True
+            if not progress:
+                logger.warning(f"Capacity probes stalled between {low} and {high} rooms; "
+                               f"raise the time limit for a proven minimum")
+                break
+        return best, probes, low >= high
+
+    def run(self) -> Dict:
+        start = time.perf_counter()
+        spec = self.build_spec()
+        lower = spec['lower_bound'] = self.lower_bound(spec)
+        existing = self.existing_rooms(spec)
+
+        probes = []
+        if self.search == 'probes':
+            minimum, probes, proven = self._probe_search(spec, lower)
+            if minimum is not None:
+                # Probes only bound the total; pick the cheapest mix at that total
+                polished = solve_probe(self._task(spec, 'min_rooms', minimum['total_rooms']))
+                minimum = polished if 'rooms' in polished else minimum
+        else:
+            minimum = self._minimize(spec)
+            proven = minimum is not None and minimum['status'] == 'optimal'
+        if minimum is None:
+            return {
+                'status': 'infeasible',
+                'error': "No room configuration satisfies the hard constraints within the time limit "
+                         "(teacher or class-group limits leave no schedule)",
+                'lower_bound': lower,
+                'existing_rooms': existing,
+                'statistics': {'total_time': time.perf_counter() - start, 'probes': len(probes)},
+            }
+
+        budgets = list(range(minimum['total_rooms'],
+                             min(spec['max_rooms'], minimum['total_rooms'] + self.max_extra_rooms) + 1))
+        curve = self._solve_all([self._task(spec, 'quality', budget, len(budgets)) for budget in budgets])
+        base_penalty = next((point['penalty'] for point in curve if 'penalty' in point), None)
+        for point in curve:
+            if 'penalty' in point and base_penalty:
+                point['improvement_percentage'] = round(100.0 * (base_penalty - point['penalty']) / base_penalty, 1)
+
+        required = minimum['rooms']
+        elapsed = time.perf_counter() - start
+        logger.info(f"Capacity plan: {minimum['total_rooms']} rooms ({required}) in {elapsed:.2f}s, "
+                    f"lower bound {lower}, {len(spec['demands'])} demands")
+        return {
+            'status': 'optimal' if proven or minimum['total_rooms'] == lower else 'feasible',
+            'minimum_rooms': minimum['total_rooms'],
+            'required_rooms': required,
+            'existing_rooms': existing,
+            'surplus': {
+                room_type: existing.get(room_type, 0) - required.get(room_type, 0)
+                for room_type in sorted(set(existing) | set(required))
+            },
+            'lower_bound': lower,
+            'capacity_bands': spec['bands'],
+            'curve': curve,
+            'statistics': {
+                'total_time': elapsed,
+                'demands': len(spec['demands']),
+                'variables': len(spec['demands']) * len(spec['slot_days']),
+                'search': self.search,
+                'probes': len(probes),
+                'strength_growth': self.strength_growth,
+            },
+        }
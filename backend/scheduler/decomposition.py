@@ -0,0 +1,395 @@
+"""
+Branch decomposition: solve every branch as its own CP-SAT model in parallel
+worker processes without double-booking the teachers and rooms they share
+"""
+
+import copy
+import logging
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from typing import Dict, List, Optional, Set
+
+from .feasibility import FeasibilityAnalyzer
+from .teacher_assignment import TeacherAssigner
+
+logger = logging.getLogger(__name__)
+
+SOLVED = ('optimal', 'feasible')
+
+
+def init_worker():
+    """
+    Process-pool initializer for spawned workers that unpickle model instances
+    """
+    import django
+    django.setup()
+
+
+def solve_branch(task: Dict) -> Dict:
+    """
+    Build and solve one branch subproblem. Runs in a worker process and
+    never touches the database; ``task['data']`` carries everything.
+    """
+    from .ortools_scheduler import TimetableScheduler
+
+    start = time.perf_counter()
+    data = task['data']
+    scheduler = TimetableScheduler.__new__(TimetableScheduler)
+    scheduler._setup(data.institution, task.get('parameters'))
+    scheduler.data = data
+    if task.get('seed') is not None:
+        scheduler.solver.parameters.random_seed = task['seed']
+
+    scheduler.create_variables()
+    scheduler.add_constraints()
+    solution = scheduler.solve(time_limit=task['time_limit'], num_workers=task['num_workers'])
+
+    status = (solution.get('solver_status') or solution.get('status')) if solution else 'failed'
+    return {
+        'branch_id': task['branch_id'],
+        'status': status,
+        'sessions': solution.get('sessions', []) if status in SOLVED else [],
+        'variables': len(scheduler.variables),
+        'time': time.perf_counter() - start,
+        'timings': scheduler.timings,
+    }
+
+
+def _split_slots(slots: List[int], weights: Dict[int, float], offset: int = 0) -> Dict[int, Set[int]]:
+    """
+    Deal slots to owners in proportion to their weights with smooth weighted
+    round-robin, so every owner gets slots spread across the whole week.
+    Dealing each resource from a different ``offset`` staggers ownership, so
+    no branch is locked out of every room at the same time.
+    """
+    offset %= len(slots) or 1
+    slots = slots[offset:] + slots[:offset]
+    total = sum(weights.values())
+    credit = dict.fromkeys(weights, 0.0)
+    owned = {owner: set() for owner in weights}
+    for slot in slots:
+        for owner, weight in weights.items():
+            credit[owner] += weight
+        winner = max(credit, key=lambda owner: (credit[owner], -owner))
+        credit[winner] -= total
+        owned[winner].add(slot)
+    return owned
+
+
+def _split_hours(hours: int, weights: Dict[int, float]) -> Dict[int, int]:
+    """
+    Largest-remainder split of an hour cap in proportion to ``weights``
+    """
+    total = sum(weights.values())
+    exact = {owner: hours * weight / total for owner, weight in weights.items()}
+    shares = {owner: int(value) for owner, value in exact.items()}
+    leftover = hours - sum(shares.values())
+    for owner in sorted(exact, key=lambda owner: shares[owner] - exact[owner])[:leftover]:
+        shares[owner] += 1
+    return shares
+
+
+class BranchDecomposer:
+    """
+    Splits an institution-wide SchedulingData into one subproblem per branch
+    and coordinates the resources they share:
+
+    * a global teacher-assignment pre-pass decides how many hours every
+      teacher gives each branch
+    * the weekly/daily hours and the time slots of each shared teacher, and
+      the time slots of each shared room, are pre-partitioned between
+      branches in proportion to their demand
+    * branches are solved in parallel worker processes
+    * a branch that fails inside its partition is re-solved against the
+      slots actually used by the others (capacity they did not need is
+      released), and any remaining conflict in the merged result is
+      repaired the same way
+    """
+
+    def __init__(self, data, max_workers: Optional[int] = None, time_limit: float = 60,
+                 solver_workers: Optional[int] = None, seed: Optional[int] = None, repair_rounds: int = 2):
+        self.data = data
+        self.time_limit = time_limit
+        self.seed = seed
+        self.repair_rounds = repair_rounds
+
+        self.classes_by_branch = defaultdict(list)
+        for class_group in data.class_groups:
+            self.classes_by_branch[class_group.branch_id].append(class_group)
+        self.subjects_by_branch = defaultdict(list)
+        for subject in data.subjects:
+            self.subjects_by_branch[subject.branch_id].append(subject)
+        self.branch_ids = sorted(
+            branch_id for branch_id in self.classes_by_branch if self.subjects_by_branch.get(branch_id)
+        )
+
+        cpus = os.cpu_count() or 1
+        self.max_workers = max(1, min(max_workers or cpus, len(self.branch_ids) or 1))
+        self.solver_workers = solver_workers or max(1, cpus // self.max_workers)
+
+        self.teachers = {teacher.id: teacher for teacher in data.teachers}
+        self.slot_index = {
+            (day, start_time.strftime('%H:%M:%S')): index
+            for index, (day, start_time, _) in enumerate(data.time_slots)
+        }
+        self.branch_of_class = {class_group.id: class_group.branch_id for class_group in data.class_groups}
+        self.class_strength = {class_group.id: class_group.strength for class_group in data.class_groups}
+        self.capacity = FeasibilityAnalyzer(data)
+
+        self.assignment = None
+        self.teacher_loads = {}  # teacher_id -> {branch_id: hours}
+        self.room_weights = {}  # room_id -> {branch_id: demand hours that fit the room}
+        self.branch_data = {}
+
+    def shared_resources(self) -> Dict[str, List[int]]:
+        return {
+            'teachers': sorted(tid for tid, loads in self.teacher_loads.items() if len(loads) > 1),
+            'rooms': sorted(rid for rid, weights in self.room_weights.items() if len(weights) > 1),
+        }
+
+    def partition(self) -> Dict[int, object]:
+        """
+        Build the per-branch SchedulingData with shared capacity pre-partitioned
+        """
+        demands = self.capacity.demands()
+        self.assignment = TeacherAssigner(self.data).assign()
+
+        teacher_loads = defaultdict(lambda: defaultdict(float))
+        branch_eligibility = defaultdict(lambda: defaultdict(set))
+        for (subject_id, class_id), hours in demands.items():
+            branch_id = self.branch_of_class[class_id]
+            if self.assignment is not None:
+                candidates = [self.assignment[(subject_id, class_id)]]
+            else:
+                # No feasible global assignment: share the demand between all eligible teachers
+                candidates = [tid for tid in self.data.subject_teachers.get(subject_id, ()) if tid in self.teachers]
+            for teacher_id in candidates:
+                teacher_loads[teacher_id][branch_id] += hours / len(candidates)
+                branch_eligibility[branch_id][subject_id].add(teacher_id)
+        self.teacher_loads = {tid: dict(loads) for tid, loads in teacher_loads.items()}
+
+        branch_hours = defaultdict(lambda: defaultdict(int))
+        for (subject_id, class_id), hours in demands.items():
+            branch_hours[self.branch_of_class[class_id]][class_id] += hours
+        self.room_weights = {}
+        for room in self.data.rooms:
+            weights = {
+                branch_id: sum(hours for class_id, hours in classes.items()
+                               if room.capacity >= self.class_strength[class_id])
+                for branch_id, classes in branch_hours.items()
+            }
+            self.room_weights[room.id] = {branch_id: w for branch_id, w in weights.items() if w}
+
+        slots = list(range(len(self.data.time_slots)))
+        blocked = {branch_id: {} for branch_id in self.branch_ids}
+        teacher_caps = {branch_id: {} for branch_id in self.branch_ids}
+        for teacher_id, loads in self.teacher_loads.items():
+            if len(loads) < 2:
+                continue
+            teacher = self.teachers[teacher_id]
+            weekly = _split_hours(self.capacity.teacher_capacity(teacher), loads)
+            daily = _split_hours(teacher.max_hours_per_day, loads)
+            owned = _split_slots(slots, loads, offset=teacher_id)
+            for branch_id in loads:
+                teacher_caps[branch_id][teacher_id] = (weekly[branch_id], max(1, daily[branch_id]))
+                blocked[branch_id][('teacher', teacher_id)] = set(slots) - owned[branch_id]
+        for position, (room_id, weights) in enumerate(self.room_weights.items()):
+            if len(weights) < 2:
+                continue
+            owned = _split_slots(slots, weights, offset=position)
+            for branch_id in self.branch_ids:
+                blocked[branch_id][('room', room_id)] = set(slots) - owned.get(branch_id, set())
+
+        self.branch_data = {
+            branch_id: self._branch_data(branch_id, branch_eligibility[branch_id],
+                                         teacher_caps[branch_id], blocked[branch_id])
+            for branch_id in self.branch_ids
+        }
+        shared = self.shared_resources()
+        logger.info(f"Decomposed into {len(self.branch_ids)} branches sharing {len(shared['teachers'])} teachers "
+                    f"and {len(shared['rooms'])} rooms")
+        return self.branch_data
+
+    def _branch_data(self, branch_id: int, eligibility: Dict[int, Set[int]], teacher_caps: Dict,
+                     blocked: Dict):
+        teacher_ids = set().union(*eligibility.values()) if eligibility else set()
+        teachers = []
+        for teacher_id in sorted(teacher_ids):
+            teacher = self.teachers[teacher_id]
+            if teacher_id in teacher_caps:
+                teacher = copy.copy(teacher)
+                teacher.max_hours_per_week, teacher.max_hours_per_day = teacher_caps[teacher_id]
+            teachers.append(teacher)
+
+        constraints = dict(self.data.constraints)
+        # Teachers stay pinned to the global assignment the capacity split was computed from
+        constraints['teacher_assignment_prepass'] = False
+        class_ids = {class_group.id for class_group in self.classes_by_branch[branch_id]}
+        assignment = None
+        if self.assignment is not None:
+            assignment = {key: teacher_id for key, teacher_id in self.assignment.items() if key[1] in class_ids}
+        # A branch that fails inside its partition is re-solved, not explained
+        constraints['explain_infeasibility'] = False
+        return replace(
+            self.data,
+            subjects=self.subjects_by_branch[branch_id],
+            teachers=teachers,
+            class_groups=self.classes_by_branch[branch_id],
+            constraints=constraints,
+            subject_teachers={subject_id: sorted(tids) for subject_id, tids in eligibility.items()},
+            blocked_slots=blocked,
+            teacher_assignment=assignment,
+        )
+
+    def _task(self, branch_id: int, data) -> Dict:
+        return {
+            'branch_id': branch_id,
+            'data': data,
+            'time_limit': self.time_limit,
+            'num_workers': self.solver_workers,
+            'seed': None if self.seed is None else self.seed + branch_id,
+        }
+
+    def _solve_all(self, tasks: List[Dict]) -> Dict[int, Dict]:
+        if self.max_workers == 1 or len(tasks) == 1:
+            return {task['branch_id']: solve_branch(task) for task in tasks}
+        # spawn keeps OR-Tools threads and Django connections out of the children
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context,
+                                 initializer=init_worker) as pool:
+            return {result['branch_id']: result for result in pool.map(solve_branch, tasks)}
+
+    def _released_data(self, branch_id: int, results: Dict[int, Dict]):
+        """
+        Branch subproblem limited only by what the other branches actually
+        scheduled, with the full remaining capacity of shared teachers
+        """
+        used = defaultdict(set)
+        weekly_used = defaultdict(int)
+        daily_used = defaultdict(lambda: defaultdict(int))
+        for other_id, result in results.items():
+            if other_id == branch_id:
+                continue
+            for session in result['sessions']:
+                slot = self.slot_index[(session['day_of_week'], session['start_time'])]
+                used[('teacher', session['teacher_id'])].add(slot)
+                used[('room', session['room_id'])].add(slot)
+                weekly_used[session['teacher_id']] += 1
+                daily_used[session['teacher_id']][session['day_of_week']] += 1
+
+        data = self.branch_data[branch_id]
+        teachers = []
+        for teacher in data.teachers:
+            original = self.teachers[teacher.id]
+            if weekly_used.get(teacher.id):
+                teacher = copy.copy(original)
+                teacher.max_hours_per_week = max(0, self.capacity.teacher_capacity(original) - weekly_used[teacher.id])
+                teacher.max_hours_per_day = max(0, original.max_hours_per_day - max(daily_used[teacher.id].values()))
+            else:
+                teacher = original
+            teachers.append(teacher)
+        return replace(data, teachers=teachers, blocked_slots=dict(used))
+
+    def _find_conflicts(self, results: Dict[int, Dict]) -> List[Dict]:
+        """
+        Cross-branch double bookings and teacher caps exceeded in the merged result
+        """
+        conflicts = []
+        booked = {}
+        weekly = defaultdict(lambda: defaultdict(int))
+        daily = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+        for branch_id, result in results.items():
+            for session in result['sessions']:
+                time_key = (session['day_of_week'], session['start_time'])
+                for kind in ('teacher', 'room'):
+                    key = (kind, session[f"{kind}_id"], time_key)
+                    if key in booked and booked[key] != branch_id:
+                        conflicts.append({
+                            'type': f"{kind}_conflict", f"{kind}_id": key[1], 'time': time_key,
+                            'branches': [booked[key], branch_id],
+                        })
+                    booked.setdefault(key, branch_id)
+                weekly[session['teacher_id']][branch_id] += 1
+                daily[session['teacher_id']][session['day_of_week']][branch_id] += 1
+
+        for teacher_id, per_branch in weekly.items():
+            teacher = self.teachers[teacher_id]
+            if len(per_branch) > 1 and sum(per_branch.values()) > self.capacity.teacher_capacity(teacher):
+                conflicts.append({'type': 'teacher_weekly_cap', 'teacher_id': teacher_id,
+                                  'branches': sorted(per_branch)})
+            for day, day_branches in daily[teacher_id].items():
+                if len(day_branches) > 1 and sum(day_branches.values()) > teacher.max_hours_per_day:
+                    conflicts.append({'type': 'teacher_daily_cap', 'teacher_id': teacher_id, 'time': (day, None),
+                                      'branches': sorted(day_branches)})
+        return conflicts
+
+    def run(self) -> Dict:
+        """
+        Partition, solve all branches in parallel, then negotiate and repair.
+        Returns the merged sessions plus per-branch status.
+        """
+        start = time.perf_counter()
+        if not self.branch_data:
+            self.partition()
+
+        results = self._solve_all([self._task(bid, data) for bid, data in self.branch_data.items()])
+        repaired = set()
+
+        # Negotiation: branches that could not fit their share get the capacity others left unused
+        for branch_id in sorted(bid for bid, result in results.items() if result['status'] not in SOLVED):
+            logger.info(f"Branch {branch_id} failed inside its partition ({results[branch_id]['status']}), "
+                        f"re-solving against released capacity")
+            results[branch_id] = solve_branch(self._task(branch_id, self._released_data(branch_id, results)))
+            repaired.add(branch_id)
+
+        conflicts = self._find_conflicts(results)
+        for round_number in range(self.repair_rounds):
+            if not conflicts:
+                break
+            # Re-solve the later branch of every conflicting pair around everyone else's sessions
+            offenders = sorted({max(conflict['branches']) for conflict in conflicts})
+            logger.info(f"Repair round {round_number + 1}: {len(conflicts)} conflicts, re-solving branches {offenders}")
+            for branch_id in offenders:
+                results[branch_id] = solve_branch(self._task(branch_id, self._released_data(branch_id, results)))
+                repaired.add(branch_id)
+            conflicts = self._find_conflicts(results)
+
+        statuses = [result['status'] for result in results.values()]
+        if not results or not any(status in SOLVED for status in statuses):
+            status = 'failed'
+        elif conflicts or any(status not in SOLVED for status in statuses):
+            status = 'partial'
+        elif all(status == 'optimal' for status in statuses):
+            status = 'optimal'
+        else:
+            status = 'feasible'
+
+        sessions = [session for bid in sorted(results) for session in results[bid]['sessions']]
+        elapsed = time.perf_counter() - start
+        logger.info(f"Branch decomposition finished: {status}, {len(sessions)} sessions from "
+                    f"{len(results)} branches in {elapsed:.2f}s ({self.max_workers} workers)")
+        return {
+            'status': status,
+            'sessions': sessions,
+            'branches': [{
+                'branch_id': bid,
+                'status': results[bid]['status'],
+                'sessions': len(results[bid]['sessions']),
+                'variables': results[bid]['variables'],
+                'time': results[bid]['time'],
+                'repaired': bid in repaired,
+            } for bid in sorted(results)],
+            'branch_sessions': {bid: results[bid]['sessions'] for bid in sorted(results)},
+            'shared_resources': self.shared_resources(),
+            'conflicts': conflicts,
+            'statistics': {
+                'total_sessions': len(sessions),
+                'solve_time': elapsed,
+                'workers': self.max_workers,
+                'solver_workers': self.solver_workers,
+            },
+        }
@@ -0,0 +1,200 @@
+"""
+Model size estimation and engine selection, computed from the scheduling
+data's cardinalities before any CP-SAT variable is created
+"""
+
+import logging
+import os
+from collections import defaultdict
+from dataclasses import dataclass, asdict, field
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from .feasibility import FeasibilityAnalyzer
+
+logger = logging.getLogger(__name__)
+
+ENGINES = ('monolithic', 'prepass', 'decomposed')
+
+# Calibrated on the synthetic scaling ladder (see benchmark_scheduler)
+BUILD_KB_PER_VARIABLE = 0.7
+SOLVER_KB_PER_VARIABLE_PER_WORKER = 0.4
+BUILD_SECONDS_PER_VARIABLE = 30e-6
+
+DEFAULT_THRESHOLDS = {
+    'monolithic_max_variables': 50000,
+    'prepass_max_variables': 150000,
+    'max_memory_mb': 4096,
+    'decompose_min_branches': 2,
+    'max_workers': 8,
+}
+
+
+def engine_thresholds() -> Dict:
+    """
+    DEFAULT_THRESHOLDS overridden by settings.SCHEDULER_ENGINE_THRESHOLDS
+    """
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    thresholds.update(getattr(settings, 'SCHEDULER_ENGINE_THRESHOLDS', {}) or {})
+    return thresholds
+
+
+def estimate_memory_mb(variables: int, workers: int) -> float:
+    return variables * (BUILD_KB_PER_VARIABLE + SOLVER_KB_PER_VARIABLE_PER_WORKER * workers) / 1024
+
+
+@dataclass
+class ModelEstimate:
+    """Predicted size of the timing model for each engine"""
+    subjects: int
+    teachers: int
+    rooms: int
+    class_groups: int
+    time_slots: int
+    branches: int
+    demands: int
+    demand_hours: int
+    variables: int  # full model: every eligible teacher for every subject and fitting room
+    constraints: int
+    prepass_variables: int  # one teacher per demand (teacher_assignment_prepass)
+    largest_branch_variables: int  # biggest subproblem of BranchDecomposer
+    build_seconds: float
+    branch_variables: Dict[int, int] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+def estimate_model(data) -> ModelEstimate:
+    """
+    Count the variables and constraints create_variables()/add_constraints()
+    would produce without building them. The variable count is exact for the
+    full model; the constraint count covers the hard constraint families.
+    """
+    analyzer = FeasibilityAnalyzer(data)
+    demands = analyzer.demands()
+    slots = len(data.time_slots)
+    days = len({day for day, _, _ in data.time_slots})
+
+    teacher_ids = {teacher.id for teacher in data.teachers}
+    room_capacities = [room.capacity for room in data.rooms]
+    fitting_rooms = {
+        class_group.id: sum(1 for capacity in room_capacities if capacity >= class_group.strength)
+        for class_group in data.class_groups
+    }
+    all_fitting = sum(fitting_rooms.values())
+
+    eligible = {
+        subject.id: [tid for tid in data.subject_teachers.get(subject.id, ()) if tid in teacher_ids]
+        for subject in data.subjects
+    }
+    variables = sum(len(teachers) for teachers in eligible.values()) * all_fitting * slots
+
+    branch_of_class = {class_group.id: class_group.branch_id for class_group in data.class_groups}
+    branch_variables = defaultdict(int)
+    for (subject_id, class_id), _ in demands.items():
+        if eligible.get(subject_id):
+            branch_variables[branch_of_class[class_id]] += fitting_rooms[class_id] * slots
+    prepass_variables = sum(branch_variables.values())
+
+    # Hard families: subject hours (one or two rules per demand), teacher
+    # conflict/daily/weekly caps, room and class conflicts per slot
+    weekly_rule = data.constraints.get('subject_weekly_hours', True)
+    subject_years = {subject.id: subject.year for subject in data.subjects}
+    class_years = {class_group.id: class_group.year for class_group in data.class_groups}
+    requirement_constraints = sum(
+        int(subject_years[subject_id] == class_years[class_id]) + int(bool(weekly_rule))
+        for subject_id, class_id in demands
+    )
+    active_teachers = len({tid for teachers in eligible.values() for tid in teachers})
+    constraints = (
+        requirement_constraints
+        + active_teachers * (slots + days + 1)
+        + len(data.rooms) * slots
+        + len(data.class_groups) * slots
+    )
+
+    return ModelEstimate(
+        subjects=len(data.subjects),
+        teachers=len(data.teachers),
+        rooms=len(data.rooms),
+        class_groups=len(data.class_groups),
+        time_slots=slots,
+        branches=len({class_group.branch_id for class_group in data.class_groups}),
+        demands=len(demands),
+        demand_hours=sum(demands.values()),
+        variables=variables,
+        constraints=constraints,
+        prepass_variables=prepass_variables,
+        largest_branch_variables=max(branch_variables.values(), default=0),
+        build_seconds=round(variables * BUILD_SECONDS_PER_VARIABLE, 3),
+        branch_variables=dict(branch_variables),
+    )
+
+
+def select_engine(estimate: ModelEstimate, thresholds: Optional[Dict] = None,
+                  engine: str = 'auto', time_limit: Optional[float] = None) -> Dict:
+    """
+    Pick an engine and solver parameters for an estimate. ``engine`` other
+    than 'auto' forces that engine; the estimate is still reported.
+    """
+    thresholds = thresholds or engine_thresholds()
+    max_memory = thresholds['max_memory_mb']
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(thresholds['max_workers'], cpus))
+    warnings: List[str] = []
+
+    sizes = {
+        'monolithic': estimate.variables,
+        'prepass': estimate.prepass_variables,
+        'decomposed': estimate.largest_branch_variables,
+    }
+
+    if engine != 'auto':
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}' (expected one of: auto, {', '.join(ENGINES)})")
+        chosen, reason = engine, 'requested'
+    elif (estimate.variables <= thresholds['monolithic_max_variables'] and
+          estimate_memory_mb(estimate.variables, workers) <= max_memory):
+        chosen, reason = 'monolithic', 'full model is within monolithic_max_variables'
+    elif (estimate.prepass_variables <= thresholds['prepass_max_variables'] and
+          estimate_memory_mb(estimate.prepass_variables, workers) <= max_memory):
+        chosen, reason = 'prepass', 'teacher pre-pass brings the model within prepass_max_variables'
+    elif estimate.branches >= thresholds['decompose_min_branches']:
+        chosen, reason = 'decomposed', 'model exceeds single-model thresholds; solving branches separately'
+    else:
+        chosen, reason = 'prepass', 'model exceeds all thresholds and cannot be decomposed by branch'
+        warnings.append("Model exceeds the configured size thresholds; generation may be slow")
+
+    variables = sizes[chosen]
+    if chosen == 'decomposed':
+        # Branch subproblems share the CPUs; each gets a slice of the workers
+        parallel_branches = max(1, min(estimate.branches, workers))
+        workers = max(1, workers // parallel_branches)
+        memory_mb = estimate_memory_mb(variables, workers) * parallel_branches
+    else:
+        memory_mb = estimate_memory_mb(variables, workers)
+        # Fewer CP-SAT workers when each model copy would overflow the memory budget
+        while workers > 1 and memory_mb > max_memory:
+            workers -= 1
+            memory_mb = estimate_memory_mb(variables, workers)
+    if memory_mb > max_memory:
+        warnings.append(f"Estimated memory {memory_mb:.0f} MB exceeds max_memory_mb ({max_memory} MB)")
+
+    plan = {
+        'engine': chosen,
+        'reason': reason,
+        'variables': variables,
+        'memory_mb': round(memory_mb, 1),
+        'solver': {
+            'time_limit': time_limit or getattr(settings, 'SCHEDULER_TIMEOUT', 300),
+            'num_workers': workers,
+        },
+        'warnings': warnings,
+        'thresholds': thresholds,
+        'estimate': estimate.as_dict(),
+    }
+    logger.info(f"Engine plan: {chosen} ({reason}); {variables} variables, ~{memory_mb:.0f} MB, "
+                f"{workers} workers")
+    return plan
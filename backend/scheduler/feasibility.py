@@ -0,0 +1,326 @@
+"""
+Pre-solve feasibility analysis based on bipartite flow bounds
+"""
+
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from ortools.graph.python import max_flow
+
+logger = logging.getLogger(__name__)
+
+
+class FeasibilityAnalyzer:
+    """
+    Proves infeasibility (or bounds the schedulable hours) of a scheduling
+    instance before CP-SAT starts.
+
+    Three relaxations of the timetabling model are checked, all built in
+    memory from ``SchedulingData`` without touching the database:
+
+    * demands -> teachers, limited by eligibility and weekly/daily hour caps
+    * demands -> rooms, limited by capacity, lab rule and slots per room
+    * per class group slot budgets
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.constraints = data.constraints or {}
+        self.slots = self._usable_slots()
+        self.slots_per_day = defaultdict(int)
+        for day, _, _ in self.slots:
+            self.slots_per_day[day] += 1
+
+    def analyze(self) -> Dict:
+        """
+        Run all flow checks and return a validation result
+        """
+        start = time.perf_counter()
+        result = {
+            'is_valid': True,
+            'errors': [],
+            'warnings': [],
+            'suggestions': [],
+            'constraint_details': {},
+            'bottlenecks': {
+                'subjects': [],
+                'teachers': [],
+                'rooms': [],
+                'class_groups': [],
+            },
+            'bounds': {},
+        }
+
+        demands = self._build_demands(result)
+        required_hours = sum(demands.values())
+        result['bounds']['required_hours'] = required_hours
+
+        if not self.slots:
+            result['errors'].append("No usable time slots in the weekly calendar")
+
+        self._check_class_budgets(demands, result)
+        self._check_teacher_flow(demands, result)
+        self._check_room_flow(demands, result)
+
+        result['is_valid'] = len(result['errors']) == 0
+        result['analysis_time'] = time.perf_counter() - start
+
+        logger.info(f"Feasibility analysis completed in {result['analysis_time'] * 1000:.1f} ms: "
+                    f"{'FEASIBLE BOUNDS' if result['is_valid'] else 'INFEASIBLE'}")
+        return result
+
+    def _usable_slots(self) -> List[Tuple[int, object, object]]:
+        """
+        Time slots the model can actually use after the lunch rule
+        """
+        slots = list(self.data.time_slots)
+        if self.constraints.get('lunch_break_mandatory', True):
+            lunch_start = self.data.institution.lunch_break_start
+            lunch_end = self.data.institution.lunch_break_end
+            slots = [
+                (day, start, end) for day, start, end in slots
+                if not (lunch_start <= start < lunch_end or lunch_start < end <= lunch_end)
+            ]
+        return slots
+
+    def _build_demands(self, result: Dict) -> Dict[Tuple[int, int], int]:
+        """
+        Required weekly hours per (subject, class group), mirroring the
+        subject-hour constraints of the CP-SAT model
+        """
+        classes_by_branch = defaultdict(list)
+        for class_group in self.data.class_groups:
+            classes_by_branch[class_group.branch_id].append(class_group)
+
+        weekly_rule = self.constraints.get('subject_weekly_hours', True)
+        demands = {}
+        conflicting = []
+
+        for subject in self.data.subjects:
+            for class_group in classes_by_branch[subject.branch_id]:
+                required = set()
+                if class_group.year == subject.year:
+                    required.add(subject.total_hours)
+                if weekly_rule:
+                    required.add(subject.weekly_hours)
+                if not required:
+                    continue
+                if len(required) > 1:
+                    conflicting.append({
+                        'subject': subject.name,
+                        'class_group_id': class_group.id,
+                        'total_hours': subject.total_hours,
+                        'weekly_hours': subject.weekly_hours,
+                    })
+                demands[(subject.id, class_group.id)] = max(required)
+
+        if conflicting:
+            subjects = sorted({item['subject'] for item in conflicting})
+            result['errors'].append(
+                f"{len(subjects)} subjects require both total_hours and weekly_hours sessions "
+                f"with different values: {', '.join(subjects[:10])}"
+            )
+            result['suggestions'].append("Align theory/practical/tutorial hours with weekly_hours")
+            result['bottlenecks']['subjects'].extend(subjects)
+        result['constraint_details']['conflicting_hour_requirements'] = conflicting
+
+        return demands
+
+    def _check_class_budgets(self, demands: Dict[Tuple[int, int], int], result: Dict):
+        """
+        A class group can attend at most one session per slot
+        """
+        class_hours = defaultdict(int)
+        for (_, class_id), hours in demands.items():
+            class_hours[class_id] += hours
+
+        budget = len(self.slots)
+        overloaded = []
+        for class_group in self.data.class_groups:
+            hours = class_hours.get(class_group.id, 0)
+            if hours > budget:
+                overloaded.append({
+                    'class_group': class_group.name,
+                    'class_group_id': class_group.id,
+                    'required_hours': hours,
+                    'available_slots': budget,
+                    'excess': hours - budget,
+                })
+                result['errors'].append(
+                    f"Class group {class_group.name} needs {hours} sessions but only {budget} slots exist"
+                )
+
+        if overloaded:
+            result['suggestions'].append("Consider adding more time slots or reducing subject hours")
+            result['bottlenecks']['class_groups'].extend(item['class_group_id'] for item in overloaded)
+
+        result['bounds']['max_class_schedulable_hours'] = sum(
+            min(hours, budget) for hours in class_hours.values()
+        )
+        result['constraint_details']['class_budgets'] = overloaded
+
+    def demands(self) -> Dict[Tuple[int, int], int]:
+        """
+        Required weekly hours per (subject, class group)
+        """
+        return self._build_demands({'errors': [], 'suggestions': [], 'bottlenecks': {'subjects': []},
+                                    'constraint_details': {}})
+
+    def teacher_capacity(self, teacher) -> int:
+        """
+        Upper bound on the sessions a teacher can take in a week
+        """
+        capacity = sum(min(teacher.max_hours_per_day, count) for count in self.slots_per_day.values())
+        if self.constraints.get('max_teacher_hours_per_week', True):
+            capacity = min(capacity, teacher.max_hours_per_week)
+        return max(0, capacity)
+
+    def _check_teacher_flow(self, demands: Dict[Tuple[int, int], int], result: Dict):
+        """
+        Max-flow from subject demand to eligible teachers
+        """
+        subject_hours = defaultdict(int)
+        for (subject_id, _), hours in demands.items():
+            subject_hours[subject_id] += hours
+
+        subject_names = {subject.id: subject.name for subject in self.data.subjects}
+        teachers = {teacher.id: teacher for teacher in self.data.teachers}
+        eligibility = self.data.subject_teachers
+
+        unassigned = [
+            subject_names[subject_id] for subject_id in subject_hours
+            if not any(t in teachers for t in eligibility.get(subject_id, ()))
+        ]
+        for name in unassigned:
+            result['errors'].append(f"Subject {name} has no assigned teachers")
+        result['constraint_details']['unassigned_subjects'] = unassigned
+
+        subject_ids = list(subject_hours)
+        teacher_ids = list(teachers)
+        source, sink = 0, 1
+        subject_node = {sid: 2 + i for i, sid in enumerate(subject_ids)}
+        teacher_node = {tid: 2 + len(subject_ids) + i for i, tid in enumerate(teacher_ids)}
+
+        flow = max_flow.SimpleMaxFlow()
+        for subject_id, hours in subject_hours.items():
+            flow.add_arc_with_capacity(source, subject_node[subject_id], hours)
+            for teacher_id in eligibility.get(subject_id, ()):
+                if teacher_id in teacher_node:
+                    flow.add_arc_with_capacity(subject_node[subject_id], teacher_node[teacher_id], hours)
+        capacities = {}
+        for teacher_id, teacher in teachers.items():
+            capacities[teacher_id] = self.teacher_capacity(teacher)
+            flow.add_arc_with_capacity(teacher_node[teacher_id], sink, capacities[teacher_id])
+
+        required = sum(subject_hours.values())
+        assignable = self._solve(flow, source, sink)
+        result['bounds']['max_teacher_assignable_hours'] = assignable
+
+        workload_issues = []
+        if assignable < required:
+            source_side = set(flow.get_source_side_min_cut())
+            saturated = [tid for tid in teacher_ids if teacher_node[tid] in source_side]
+            starved = [sid for sid in subject_ids if subject_node[sid] in source_side]
+            for teacher_id in saturated:
+                workload_issues.append({
+                    'teacher_id': teacher_id,
+                    'employee_id': teachers[teacher_id].employee_id,
+                    'capacity_hours': capacities[teacher_id],
+                })
+            result['errors'].append(
+                f"Teachers can cover at most {assignable} of {required} required hours "
+                f"(short by {required - assignable})"
+            )
+            result['suggestions'].append("Consider hiring more teachers or reducing subject hours")
+            result['bottlenecks']['teachers'].extend(saturated)
+            result['bottlenecks']['subjects'].extend(
+                subject_names[sid] for sid in starved
+                if subject_names[sid] not in result['bottlenecks']['subjects']
+            )
+        result['constraint_details']['teacher_workload'] = workload_issues
+
+    def _check_room_flow(self, demands: Dict[Tuple[int, int], int], result: Dict):
+        """
+        Max-flow from demand to rooms, aggregated by (strength, lab) and
+        (capacity, lab) equivalence classes so arc count stays small
+        """
+        lab_rule = self.constraints.get('lab_subjects_in_lab_rooms', True)
+        subjects = {subject.id: subject for subject in self.data.subjects}
+        strengths = {cg.id: cg.strength for cg in self.data.class_groups}
+
+        demand_keys = defaultdict(int)
+        for (subject_id, class_id), hours in demands.items():
+            needs_lab = lab_rule and subjects[subject_id].type == 'lab'
+            demand_keys[(strengths[class_id], needs_lab)] += hours
+
+        room_keys = defaultdict(int)
+        slots_per_room = len(self.slots)
+        for room in self.data.rooms:
+            room_keys[(room.capacity, room.is_lab)] += slots_per_room
+
+        demand_list = list(demand_keys)
+        room_list = list(room_keys)
+        source, sink = 0, 1
+        demand_node = {key: 2 + i for i, key in enumerate(demand_list)}
+        room_node = {key: 2 + len(demand_list) + i for i, key in enumerate(room_list)}
+
+        capacity_issues = []
+        flow = max_flow.SimpleMaxFlow()
+        for key, hours in demand_keys.items():
+            strength, needs_lab = key
+            flow.add_arc_with_capacity(source, demand_node[key], hours)
+            eligible = [
+                room_key for room_key in room_list
+                if room_key[0] >= strength and (room_key[1] or not needs_lab)
+            ]
+            if not eligible:
+                capacity_issues.append({
+                    'strength': strength,
+                    'needs_lab': needs_lab,
+                    'issue': 'No lab room with sufficient capacity' if needs_lab
+                             else 'No room with sufficient capacity',
+                })
+            for room_key in eligible:
+                flow.add_arc_with_capacity(demand_node[key], room_node[room_key], hours)
+        for room_key, capacity in room_keys.items():
+            flow.add_arc_with_capacity(room_node[room_key], sink, capacity)
+
+        required = sum(demand_keys.values())
+        assignable = self._solve(flow, source, sink)
+        result['bounds']['max_room_assignable_hours'] = assignable
+
+        for issue in capacity_issues:
+            kind = 'lab room' if issue['needs_lab'] else 'room'
+            result['errors'].append(f"No {kind} can seat a class of {issue['strength']} students")
+
+        if assignable < required:
+            source_side = set(flow.get_source_side_min_cut())
+            saturated_keys = {key for key in room_list if room_node[key] in source_side}
+            saturated_rooms = [
+                room.id for room in self.data.rooms
+                if (room.capacity, room.is_lab) in saturated_keys
+            ]
+            result['errors'].append(
+                f"Rooms can host at most {assignable} of {required} required sessions "
+                f"(short by {required - assignable})"
+            )
+            result['bottlenecks']['rooms'].extend(saturated_rooms)
+
+        if capacity_issues or assignable < required:
+            result['suggestions'].append("Add larger rooms or more lab rooms, or reduce class sizes")
+        result['constraint_details']['room_capacity'] = capacity_issues
+
+    @staticmethod
+    def _solve(flow, source: int, sink: int) -> int:
+        """
+        Solve a max-flow network, treating an empty network as zero flow
+        """
+        if flow.num_arcs() == 0:
+            return 0
+        status = flow.solve(source, sink)
+        if status != flow.OPTIMAL:
+            logger.warning(f"Max-flow solve returned status {status}")
+            return 0
+        return flow.optimal_flow()
@@ -0,0 +1,264 @@
+"""
+Offline scheduling instances: export SchedulingData to a versioned,
+anonymized JSON document and load it back without the Django database
+"""
+
+import gzip
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime, time
+from typing import Dict, List
+
+from .ortools_scheduler import SchedulingData
+
+logger = logging.getLogger(__name__)
+
+FORMAT_NAME = 'timetable-scheduling-instance'
+FORMAT_VERSION = 1
+# Files carry working days as numbers (Mon=0); Institution.working_days
+# and the working_days_only constraint use these names
+DAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+@dataclass
+class InstanceInstitution:
+    """Calendar settings of an offline instance"""
+    name: str
+    academic_year: str
+    start_time: time
+    end_time: time
+    slot_duration: int
+    lunch_break_start: time
+    lunch_break_end: time
+    working_days: List[str]
+    max_teacher_hours_per_week: int
+
+
+@dataclass
+class InstanceSubject:
+    id: int
+    code: str
+    name: str
+    branch_id: int
+    year: int
+    type: str
+    weekly_hours: int
+    total_hours: int
+
+
+@dataclass
+class InstanceTeacher:
+    id: int
+    employee_id: str
+    department_id: int
+    max_hours_per_day: int
+    max_hours_per_week: int
+    max_consecutive_hours: int
+
+
+@dataclass
+class InstanceRoom:
+    id: int
+    code: str
+    capacity: int
+    is_lab: bool
+
+
+@dataclass
+class InstanceClassGroup:
+    id: int
+    name: str
+    branch_id: int
+    year: int
+    strength: int
+
+
+def _format_time(value: time) -> str:
+    return value.strftime('%H:%M')
+
+
+def _parse_time(value: str) -> time:
+    return datetime.strptime(value, '%H:%M').time()
+
+
+def _open(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def export_instance(data: SchedulingData, anonymize: bool = True) -> Dict:
+    """
+    Serialize SchedulingData to a plain dict. With ``anonymize`` all ids are
+    renumbered densely and names, codes and employee ids are replaced by
+    generated labels, so the file carries no institutional data.
+    """
+    id_maps = {'branch': {}, 'subject': {}, 'teacher': {}, 'room': {}, 'class_group': {}}
+
+    def ident(kind: str, value: int) -> int:
+        if not anonymize:
+            return value
+        return id_maps[kind].setdefault(value, len(id_maps[kind]) + 1)
+
+    def label(kind: str, prefix: str, value: int, original: str) -> str:
+        return f"{prefix}{ident(kind, value)}" if anonymize else original
+
+    institution = data.institution
+    working_days = sorted(DAY_NAMES.index(day) for day in institution.working_days or [] if day in DAY_NAMES)
+    if not working_days:
+        working_days = sorted({day for day, _, _ in data.time_slots})
+
+    subjects = [{
+        'id': ident('subject', subject.id),
+        'code': label('subject', 'SUB', subject.id, subject.code),
+        'name': label('subject', 'Subject ', subject.id, subject.name),
+        'branch_id': ident('branch', subject.branch_id),
+        'year': subject.year,
+        'type': subject.type,
+        'weekly_hours': subject.weekly_hours,
+        'total_hours': subject.total_hours,
+    } for subject in data.subjects]
+
+    teachers = [{
+        'id': ident('teacher', teacher.id),
+        'employee_id': label('teacher', 'T', teacher.id, teacher.employee_id),
+        'department_id': ident('branch', teacher.department_id),
+        'max_hours_per_day': teacher.max_hours_per_day,
+        'max_hours_per_week': teacher.max_hours_per_week,
+        'max_consecutive_hours': teacher.max_consecutive_hours,
+    } for teacher in data.teachers]
+
+    rooms = [{
+        'id': ident('room', room.id),
+        'code': label('room', 'R', room.id, room.code),
+        'capacity': room.capacity,
+        'is_lab': bool(room.is_lab),
+    } for room in data.rooms]
+
+    class_groups = [{
+        'id': ident('class_group', class_group.id),
+        'name': label('class_group', 'CG', class_group.id, class_group.name),
+        'branch_id': ident('branch', class_group.branch_id),
+        'year': class_group.year,
+        'strength': class_group.strength,
+    } for class_group in data.class_groups]
+
+    subject_ids = {subject.id for subject in data.subjects}
+    eligibility = {
+        str(ident('subject', subject_id)): sorted(ident('teacher', teacher_id) for teacher_id in teacher_ids)
+        for subject_id, teacher_ids in data.subject_teachers.items()
+        if subject_id in subject_ids
+    }
+    teacher_ids = {teacher.id for teacher in data.teachers}
+    preferences = sorted(
+        [ident('subject', subject_id), ident('teacher', teacher_id), level]
+        for (subject_id, teacher_id), level in data.teacher_preferences.items()
+        if subject_id in subject_ids and teacher_id in teacher_ids
+    )
+    teacher_branches = {
+        str(ident('teacher', teacher_id)): sorted(ident('branch', branch_id) for branch_id in branch_ids)
+        for teacher_id, branch_ids in data.teacher_branches.items()
+        if teacher_id in teacher_ids
+    }
+
+    return {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'anonymized': anonymize,
+        'institution': {
+            'name': 'Anonymized institution' if anonymize else institution.name,
+            'academic_year': institution.academic_year,
+            'start_time': _format_time(institution.start_time),
+            'end_time': _format_time(institution.end_time),
+            'slot_duration': institution.slot_duration,
+            'lunch_break_start': _format_time(institution.lunch_break_start),
+            'lunch_break_end': _format_time(institution.lunch_break_end),
+            'working_days': working_days,
+            'max_teacher_hours_per_week': institution.max_teacher_hours_per_week,
+        },
+        'time_slots': [
+            [day, _format_time(start_time), _format_time(end_time)]
+            for day, start_time, end_time in data.time_slots
+        ],
+        'constraints': data.constraints,
+        'subjects': subjects,
+        'teachers': teachers,
+        'rooms': rooms,
+        'class_groups': class_groups,
+        'subject_teachers': eligibility,
+        'teacher_preferences': preferences,
+        'teacher_branches': teacher_branches,
+    }
+
+
+def write_instance(data: SchedulingData, path: str, anonymize: bool = True, model=None) -> Dict:
+    """
+    Write an instance file (gzip-compressed when ``path`` ends in .gz) and,
+    when a CpModel is given, its CpModelProto next to it as ``<path>.pb``
+    """
+    document = export_instance(data, anonymize=anonymize)
+    with _open(path, 'w') as handle:
+        json.dump(document, handle, separators=(',', ':'))
+
+    if model is not None:
+        model.ExportToFile(f"{path}.pb")
+
+    logger.info(f"Wrote scheduling instance to {path}: {len(document['subjects'])} subjects, "
+                f"{len(document['teachers'])} teachers, {len(document['rooms'])} rooms, "
+                f"{len(document['class_groups'])} class groups, {len(document['time_slots'])} time slots")
+    return document
+
+
+def load_instance(source) -> SchedulingData:
+    """
+    Build SchedulingData from an instance file path or an already parsed dict
+    """
+    if isinstance(source, dict):
+        document = source
+    else:
+        with _open(source, 'r') as handle:
+            document = json.load(handle)
+
+    if document.get('format') != FORMAT_NAME:
+        raise ValueError("Not a scheduling instance file")
+    if document.get('version', 0) > FORMAT_VERSION:
+        raise ValueError(f"Unsupported instance version {document['version']} (max {FORMAT_VERSION})")
+
+    settings = document['institution']
+    institution = InstanceInstitution(
+        name=settings['name'],
+        academic_year=settings['academic_year'],
+        start_time=_parse_time(settings['start_time']),
+        end_time=_parse_time(settings['end_time']),
+        slot_duration=settings['slot_duration'],
+        lunch_break_start=_parse_time(settings['lunch_break_start']),
+        lunch_break_end=_parse_time(settings['lunch_break_end']),
+        working_days=[DAY_NAMES[day] for day in settings['working_days']],
+        max_teacher_hours_per_week=settings['max_teacher_hours_per_week'],
+    )
+
+    return SchedulingData(
+        institution=institution,
+        subjects=[InstanceSubject(**item) for item in document['subjects']],
+        teachers=[InstanceTeacher(**item) for item in document['teachers']],
+        rooms=[InstanceRoom(**item) for item in document['rooms']],
+        class_groups=[InstanceClassGroup(**item) for item in document['class_groups']],
+        time_slots=[
+            (day, _parse_time(start_time), _parse_time(end_time))
+            for day, start_time, end_time in document['time_slots']
+        ],
+        constraints=dict(document.get('constraints') or {}),
+        subject_teachers={
+            int(subject_id): list(teacher_ids)
+            for subject_id, teacher_ids in document['subject_teachers'].items()
+        },
+        teacher_preferences={
+            (subject_id, teacher_id): level
+            for subject_id, teacher_id, level in document.get('teacher_preferences', [])
+        },
+        teacher_branches={
+            int(teacher_id): list(branch_ids)
+            for teacher_id, branch_ids in document.get('teacher_branches', {}).items()
+        },
+    )
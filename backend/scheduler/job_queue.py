@@ -0,0 +1,363 @@
+"""
+Database-backed generation job queue shared by run_generation_worker processes
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+
+from timetable.models import GenerationJob, Institution, Subject, Teacher, TeacherSubject, Room, ClassGroup
+from .estimator import engine_thresholds
+
+logger = logging.getLogger(__name__)
+
+# How many queued candidates a worker tries per claim when it cannot skip locks
+CLAIM_CANDIDATES = 5
+COALESCE_POLICIES = ('queue', 'reject')
+IN_FLIGHT = (GenerationJob.Status.QUEUED, GenerationJob.Status.RUNNING)
+FINISHED = (GenerationJob.Status.SUCCEEDED, GenerationJob.Status.FAILED)
+
+
+class GenerationInFlight(Exception):
+    """
+    Raised under the 'reject' coalescing policy when the institution already
+    has a generation with different inputs or parameters in flight
+    """
+
+    def __init__(self, job: GenerationJob):
+        self.job = job
+        super().__init__(f"Generation job {job.id} for this institution is already {job.status} "
+                         f"with different inputs or parameters")
+
+
+def stale_after() -> timedelta:
+    return timedelta(seconds=getattr(settings, 'SCHEDULER_JOB_STALE_SECONDS', 120))
+
+
+def default_cpu_budget() -> int:
+    """
+    CPU budget of a job that does not set num_workers: the worker count
+    select_engine would give its solve
+    """
+    return max(1, min(engine_thresholds()['max_workers'], os.cpu_count() or 1))
+
+
+def coalesce_policy() -> str:
+    policy = getattr(settings, 'SCHEDULER_COALESCE_POLICY', 'queue')
+    if policy not in COALESCE_POLICIES:
+        raise ValueError(f"Unknown SCHEDULER_COALESCE_POLICY '{policy}' "
+                         f"(expected one of: {', '.join(COALESCE_POLICIES)})")
+    return policy
+
+
+def input_fingerprint(institution_id: int) -> str:
+    """
+    Cheap digest of everything prepare_data() reads for an institution:
+    row counts, id sums and last modification per table. Any edit, insert or
+    delete of scheduling input changes it.
+    """
+    def summary(queryset, *fields):
+        aggregates = {'count': Count('id'), 'ids': Sum('id')}
+        aggregates.update({field: (Max if field == 'updated_at' else Sum)(field) for field in fields})
+        return queryset.aggregate(**aggregates)
+
+    assignments = Teacher.classes_assigned.through.objects.filter(teacher__department__institution_id=institution_id)
+    inputs = {
+        'institution': Institution.objects.filter(id=institution_id).values_list('updated_at', flat=True).first(),
+        'subjects': summary(Subject.objects.filter(branch__institution_id=institution_id), 'updated_at'),
+        'teachers': summary(Teacher.objects.filter(department__institution_id=institution_id), 'updated_at'),
+        'rooms': summary(Room.objects.filter(institution_id=institution_id), 'updated_at'),
+        'class_groups': summary(ClassGroup.objects.filter(branch__institution_id=institution_id), 'updated_at'),
+        'teacher_subjects': summary(
+            TeacherSubject.objects.filter(subject__branch__institution_id=institution_id), 'preference_level'
+        ),
+        'classes_assigned': summary(assignments, 'branch_id'),
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def request_key(institution_id: int, parameters: Dict, kind: str = GenerationJob.Kind.GENERATE) -> str:
+    """
+    Coalescing key: institution, input fingerprint, kind and parameters. The
+    timetable name is not part of it, so a retried request still matches.
+    """
+    payload = {
+        'institution': institution_id,
+        'inputs': input_fingerprint(institution_id),
+        'kind': kind,
+        'parameters': parameters,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def enqueue_generation(institution_id: int, name: str, requested_by=None, parameters: Optional[Dict] = None,
+                       kind: str = GenerationJob.Kind.GENERATE, priority: int = 5, key: str = '',
+                       worker: Optional[str] = None) -> GenerationJob:
+    """
+    Queue a generation for the next worker with enough free CPU budget.
+    ``parameters['num_workers']`` sets the job's CPU budget and caps its
+    solve; otherwise the budget is default_cpu_budget(). With ``worker``
+    the job is created already claimed by that worker (see run_job_inline).
+    """
+    parameters = parameters or {}
+    claim = {}
+    if worker:
+        now = timezone.now()
+        claim = {'status': GenerationJob.Status.RUNNING, 'worker': worker, 'attempts': 1,
+                 'claimed_at': now, 'heartbeat_at': now}
+    return GenerationJob.objects.create(
+        institution_id=institution_id,
+        requested_by=requested_by,
+        kind=kind,
+        name=name,
+        parameters=parameters,
+        priority=priority,
+        cpu_budget=max(1, int(parameters.get('num_workers') or default_cpu_budget())),
+        request_key=key,
+        **claim,
+    )
+
+
+def submit_generation(institution_id: int, name: str, requested_by=None, parameters: Optional[Dict] = None,
+                      kind: str = GenerationJob.Kind.GENERATE, priority: int = 5,
+                      run_inline_as: Optional[str] = None, policy: Optional[str] = None) -> Tuple[GenerationJob, bool]:
+    """
+    Single-flight entry point for generation requests. Returns (job, coalesced).
+
+    A request whose key matches a queued or running job of the institution
+    attaches to it instead of starting another solve. Otherwise, if a
+    different generation is in flight, ``policy`` ('queue' or 'reject',
+    default settings.SCHEDULER_COALESCE_POLICY) either queues the new job
+    behind it or raises GenerationInFlight. With ``run_inline_as`` and nothing
+    in flight the new job is claimed by that caller, who must run it with
+    run_job_inline().
+    """
+    parameters = parameters or {}
+    policy = policy or coalesce_policy()
+    key = request_key(institution_id, parameters, kind)
+    # A crashed web request or worker must not hold the institution's slot
+    # when no run_generation_worker is around to reclaim it
+    reclaim_stale_jobs()
+
+    with transaction.atomic():
+        # Serializes submissions per institution where row locks exist
+        Institution.objects.select_for_update().filter(id=institution_id).first()
+        in_flight = list(GenerationJob.objects.filter(institution_id=institution_id, status__in=IN_FLIGHT)
+                         .order_by('created_at'))
+        for job in in_flight:
+            if job.request_key == key:
+                GenerationJob.objects.filter(id=job.id).update(attached_requests=F('attached_requests') + 1)
+                logger.info(f"Coalesced generation request into job {job.id} ({job.status})")
+                return job, True
+        if in_flight and policy == 'reject':
+            raise GenerationInFlight(in_flight[0])
+
+        job = enqueue_generation(institution_id, name, requested_by=requested_by, parameters=parameters,
+                                 kind=kind, priority=priority, key=key,
+                                 worker=None if in_flight else run_inline_as)
+    return job, False
+
+
+def _claimable(max_cpu: int):
+    # Jobs queue behind a running generation of the same institution
+    busy = GenerationJob.objects.filter(status=GenerationJob.Status.RUNNING).values('institution_id')
+    return (GenerationJob.objects
+            .filter(status=GenerationJob.Status.QUEUED, cpu_budget__lte=max_cpu)
+            .exclude(institution_id__in=busy)
+            .order_by('-priority', 'created_at'))
+
+
+def claim_job(worker: str, max_cpu: int) -> Optional[GenerationJob]:
+    """
+    Atomically take the highest-priority queued job that fits ``max_cpu``.
+
+    Uses SELECT ... FOR UPDATE SKIP LOCKED where the database supports it, so
+    concurrent workers never block on or double-claim a row. Elsewhere
+    (SQLite) a conditional status flip decides the race: only the worker
+    whose UPDATE still sees the job queued gets it.
+    """
+    now = timezone.now()
+    claim = {
+        'status': GenerationJob.Status.RUNNING,
+        'worker': worker,
+        'claimed_at': now,
+        'heartbeat_at': now,
+        'attempts': F('attempts') + 1,
+    }
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = _claimable(max_cpu).select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            GenerationJob.objects.filter(id=job.id).update(**claim)
+    else:
+        job = None
+        for candidate_id in _claimable(max_cpu).values_list('id', flat=True)[:CLAIM_CANDIDATES]:
+            if GenerationJob.objects.filter(id=candidate_id, status=GenerationJob.Status.QUEUED).update(**claim):
+                job = GenerationJob(id=candidate_id)
+                break
+        if job is None:
+            return None
+
+    job.refresh_from_db()
+    logger.info(f"Worker {worker} claimed generation job {job.id} (attempt {job.attempts}, "
+                f"{job.cpu_budget} CPU)")
+    return job
+
+
+def heartbeat(worker: str, job_ids: List[int]) -> int:
+    """
+    Mark the worker's running jobs alive. Returns how many it still owns;
+    a job reclaimed by reclaim_stale_jobs no longer counts.
+    """
+    if not job_ids:
+        return 0
+    return GenerationJob.objects.filter(
+        id__in=job_ids, worker=worker, status=GenerationJob.Status.RUNNING
+    ).update(heartbeat_at=timezone.now())
+
+
+def reclaim_stale_jobs() -> Dict[str, int]:
+    """
+    Requeue running jobs whose worker stopped sending heartbeats, or fail
+    them once they used up max_attempts
+    """
+    cutoff = timezone.now() - stale_after()
+    stale = GenerationJob.objects.filter(status=GenerationJob.Status.RUNNING, heartbeat_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=GenerationJob.Status.FAILED,
+        error='Worker stopped responding and the job has no attempts left',
+        finished_at=timezone.now(),
+    )
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+        status=GenerationJob.Status.QUEUED, worker='', claimed_at=None, heartbeat_at=None
+    )
+    if failed or requeued:
+        logger.warning(f"Reclaimed stale generation jobs: {requeued} requeued, {failed} failed")
+    return {'requeued': requeued, 'failed': failed}
+
+
+def _finish(job_id: int, worker: str, **fields) -> bool:
+    # Only the current owner may finish a job; a late result from a worker
+    # whose claim was reclaimed is dropped
+    updated = GenerationJob.objects.filter(
+        id=job_id, worker=worker, status=GenerationJob.Status.RUNNING
+    ).update(finished_at=timezone.now(), **fields)
+    if not updated:
+        logger.warning(f"Worker {worker} no longer owns generation job {job_id}; result discarded")
+    return bool(updated)
+
+
+def complete_job(job_id: int, worker: str, result: Dict) -> bool:
+    status = GenerationJob.Status.SUCCEEDED if result.get('success') else GenerationJob.Status.FAILED
+    return _finish(job_id, worker, status=status, result=result, timetable_id=result.get('timetable_id'),
+                   error=result.get('error', ''))
+
+
+def fail_job(job_id: int, worker: str, error: str, retry: bool = False) -> bool:
+    """
+    Record a failure; with ``retry`` the job goes back to the queue while it
+    has attempts left
+    """
+    if retry:
+        requeued = GenerationJob.objects.filter(
+            id=job_id, worker=worker, status=GenerationJob.Status.RUNNING, attempts__lt=F('max_attempts')
+        ).update(status=GenerationJob.Status.QUEUED, worker='', claimed_at=None, heartbeat_at=None, error=error)
+        if requeued:
+            return True
+    return _finish(job_id, worker, status=GenerationJob.Status.FAILED, error=error)
+
+
+def wait_for_job(job_id: int, timeout: float) -> Optional[GenerationJob]:
+    """
+    Poll until the job finishes; None if it is still in flight after ``timeout``
+    """
+    poll = getattr(settings, 'SCHEDULER_JOB_POLL_SECONDS', 2)
+    deadline = time.monotonic() + timeout
+    while True:
+        job = GenerationJob.objects.get(id=job_id)
+        if job.status in FINISHED:
+            return job
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(min(poll, max(0.0, deadline - time.monotonic())))
+
+
+def claim_when_free(job_id: int, worker: str, timeout: float) -> bool:
+    """
+    Wait until no other generation of the job's institution is running and
+    claim the queued job for ``worker`` (e.g. a synchronous API request
+    queued behind another generation). False if a worker took it first, it
+    finished, or ``timeout`` passed.
+    """
+    poll = getattr(settings, 'SCHEDULER_JOB_POLL_SECONDS', 2)
+    deadline = time.monotonic() + timeout
+    while True:
+        reclaim_stale_jobs()
+        with transaction.atomic():
+            job = GenerationJob.objects.get(id=job_id)
+            if job.status != GenerationJob.Status.QUEUED:
+                return False
+            # Serializes claims per institution where row locks exist
+            Institution.objects.select_for_update().filter(id=job.institution_id).first()
+            busy = GenerationJob.objects.filter(
+                institution_id=job.institution_id, status=GenerationJob.Status.RUNNING
+            ).exists()
+            if not busy:
+                now = timezone.now()
+                claimed = GenerationJob.objects.filter(id=job_id, status=GenerationJob.Status.QUEUED).update(
+                    status=GenerationJob.Status.RUNNING, worker=worker, claimed_at=now, heartbeat_at=now,
+                    attempts=F('attempts') + 1,
+                )
+                if claimed:
+                    logger.info(f"{worker} claimed generation job {job_id} after waiting")
+                    return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(min(poll, max(0.0, deadline - time.monotonic())))
+
+
+def _heartbeat_loop(stop: threading.Event, worker: str, job_id: int, interval: float):
+    try:
+        while not stop.wait(interval):
+            heartbeat(worker, [job_id])
+    finally:
+        connection.close()
+
+
+def run_job_inline(job_id: int, worker: str) -> Dict:
+    """
+    Run a job claimed by the calling process (e.g. a synchronous API request)
+    while a background thread keeps its heartbeat, then record the result so
+    coalesced requests waiting on the job receive it
+    """
+    from .job_worker import run_job
+
+    stop = threading.Event()
+    beat = threading.Thread(
+        target=_heartbeat_loop,
+        args=(stop, worker, job_id, getattr(settings, 'SCHEDULER_JOB_HEARTBEAT_SECONDS', 15)),
+        daemon=True,
+    )
+    beat.start()
+    try:
+        result = run_job(job_id)
+    except Exception as e:
+        fail_job(job_id, worker, str(e))
+        raise
+    finally:
+        stop.set()
+        beat.join()
+    complete_job(job_id, worker, result)
+    return result
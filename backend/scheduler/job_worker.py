@@ -0,0 +1,65 @@
+"""
+Code that runs inside run_generation_worker's solver processes. Importable
+before Django is set up, so spawned processes can unpickle these functions.
+"""
+
+import signal
+from typing import Dict
+
+from .decomposition import init_worker
+
+
+def init_job_worker():
+    """
+    Process-pool initializer for job processes: leave Ctrl-C to the parent,
+    which stops claiming and lets running jobs finish
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    init_worker()
+
+
+def run_job(job_id: int) -> Dict:
+    """
+    Run one claimed job and return its result summary. Executes in a worker
+    process; the parent records the result so heartbeats and ownership stay
+    in one place.
+    """
+    from timetable.models import GenerationJob
+    from .ortools_scheduler import TimetableScheduler
+
+    job = GenerationJob.objects.select_related('requested_by').get(id=job_id)
+    parameters = dict(job.parameters)
+    if parameters.get('num_workers'):
+        # The requested CPU budget caps the solve; otherwise the plan decides
+        parameters['num_workers'] = job.cpu_budget
+    scheduler = TimetableScheduler(job.institution_id, parameters=parameters)
+
+    if job.kind == GenerationJob.Kind.VARIANTS:
+        from timetable.variants import store_variants
+
+        variants = scheduler.generate_multiple_variants(
+            name=job.name, generated_by_user=job.requested_by, num_variants=parameters.get('num_variants', 3)
+        )
+        variants = store_variants(scheduler.institution, job.requested_by, job.name, variants)
+        variant_ids = [variant['id'] for variant in variants if 'id' in variant]
+        return {
+            'success': bool(variant_ids),
+            'variants': len(variants),
+            'variant_ids': variant_ids,
+            'error': '' if variant_ids else 'No variants could be generated',
+        }
+
+    timetable = scheduler.generate_timetable(name=job.name, generated_by_user=job.requested_by)
+    if timetable is None:
+        return {
+            'success': False,
+            'error': 'Failed to generate timetable. No feasible solution found.',
+            'plan': scheduler.plan,
+        }
+    return {
+        'success': True,
+        'timetable_id': timetable.id,
+        'total_sessions': timetable.total_sessions,
+        'optimization_score': timetable.optimization_score,
+        'plan': scheduler.plan,
+    }
@@ -0,0 +1,187 @@
+"""
+Django management command to benchmark the scheduler over a scaling ladder
+"""
+
+import json
+import platform
+import statistics
+import time
+
+import ortools
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from scheduler.ortools_scheduler import TimetableScheduler
+from scheduler.synthetic import SCALING_LADDER, generate_instance, materialize_instance
+
+PHASES = [
+    'prepare_data', 'create_variables', 'add_constraints', 'feasibility_analysis',
+    'solver', 'extract_solution', 'persistence',
+]
+RESULTS_FORMAT_VERSION = 1
+
+
+def compare_results(current: dict, baseline: dict, tolerance: float, min_delta: float) -> list:
+    """
+    Phase-by-phase comparison of two results files. A phase regresses when it
+    is both ``tolerance`` (relative) and ``min_delta`` seconds slower.
+    """
+    baseline_runs = {run['size']: run for run in baseline.get('results', [])}
+    rows = []
+    for run in current['results']:
+        reference = baseline_runs.get(run['size'])
+        if not reference:
+            continue
+        for phase in PHASES + ['total']:
+            now = run['phases'].get(phase) if phase != 'total' else run['total']
+            before = reference['phases'].get(phase) if phase != 'total' else reference['total']
+            if now is None or before is None:
+                continue
+            ratio = now / before if before else None
+            if ratio is not None and ratio > 1 + tolerance and now - before > min_delta:
+                verdict = 'regression'
+            elif ratio is not None and ratio < 1 - tolerance and before - now > min_delta:
+                verdict = 'speedup'
+            else:
+                verdict = 'same'
+            rows.append({
+                'size': run['size'], 'phase': phase, 'baseline': before, 'current': now,
+                'ratio': ratio, 'verdict': verdict,
+            })
+    return rows
+
+
+class Command(BaseCommand):
+    help = 'Benchmark scheduler phases on synthetic instances and compare against a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='tiny,small,medium',
+            help=f"Comma separated ladder steps ({', '.join(SCALING_LADDER)})",
+        )
+        parser.add_argument('--repeat', type=int, default=1, help='Runs per size; the median is reported')
+        parser.add_argument('--time-limit', type=float, default=60, help='Solver time limit per run')
+        parser.add_argument('--workers', type=int, default=8, help='CP-SAT search workers')
+        parser.add_argument(
+            '--offline', action='store_true',
+            help='Solve from the instance document only (skips prepare_data and persistence)',
+        )
+        parser.add_argument('--output', default='benchmark_results.json', help='Results file to write')
+        parser.add_argument('--baseline', help='Results file to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Relative change considered significant')
+        parser.add_argument('--min-delta', type=float, default=0.05, help='Ignore changes below this many seconds')
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Exit with an error if any phase regresses against the baseline',
+        )
+
+    def handle(self, *args, **options):
+        sizes = [size.strip() for size in options['sizes'].split(',') if size.strip()]
+        unknown = [size for size in sizes if size not in SCALING_LADDER]
+        if unknown:
+            raise CommandError(f"Unknown sizes: {', '.join(unknown)}")
+
+        results = {
+            'format_version': RESULTS_FORMAT_VERSION,
+            'created_at': timezone.now().isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'ortools': ortools.__version__,
+                'machine': platform.machine(),
+            },
+            'mode': 'offline' if options['offline'] else 'database',
+            'time_limit': options['time_limit'],
+            'workers': options['workers'],
+            'results': [],
+        }
+
+        for size in sizes:
+            runs = [self._run(size, options) for _ in range(options['repeat'])]
+            summary = runs[-1]
+            summary['phases'] = {
+                phase: statistics.median(run['phases'][phase] for run in runs)
+                if all(run['phases'].get(phase) is not None for run in runs) else None
+                for phase in PHASES
+            }
+            summary['total'] = statistics.median(run['total'] for run in runs)
+            results['results'].append(summary)
+            self.stdout.write(
+                f"{size:<8} vars={summary['variables']:<9} status={summary['status']:<18} "
+                f"total={summary['total']:.2f}s " +
+                ' '.join(f"{phase}={value:.2f}" for phase, value in summary['phases'].items()
+                         if value is not None)
+            )
+
+        with open(options['output'], 'w') as handle:
+            json.dump(results, handle, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}"))
+
+        if options['baseline']:
+            with open(options['baseline']) as handle:
+                baseline = json.load(handle)
+            rows = compare_results(results, baseline, options['tolerance'], options['min_delta'])
+            self._report(rows)
+            regressions = [row for row in rows if row['verdict'] == 'regression']
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{len(regressions)} phase(s) regressed against {options['baseline']}")
+
+    def _run(self, size: str, options) -> dict:
+        config = SCALING_LADDER[size]
+        document = generate_instance(config)
+        phases = dict.fromkeys(PHASES)
+        start = time.perf_counter()
+
+        with transaction.atomic():
+            if options['offline']:
+                scheduler = TimetableScheduler.from_instance(document)
+            else:
+                institution, admin = materialize_instance(document)
+                scheduler = TimetableScheduler(institution.id)
+                phase_start = time.perf_counter()
+                scheduler.prepare_data()
+                phases['prepare_data'] = time.perf_counter() - phase_start
+
+            phase_start = time.perf_counter()
+            scheduler.create_variables()
+            phases['create_variables'] = time.perf_counter() - phase_start
+
+            phase_start = time.perf_counter()
+            scheduler.add_constraints()
+            phases['add_constraints'] = time.perf_counter() - phase_start
+
+            solution = scheduler.solve(time_limit=options['time_limit'], num_workers=options['workers'])
+            for phase in ('feasibility_analysis', 'solver', 'extract_solution'):
+                phases[phase] = scheduler.timings.get(phase)
+
+            status = (solution.get('solver_status') or solution.get('status')) if solution else 'no_solution'
+            sessions = solution.get('statistics', {}).get('total_sessions', 0) if solution else 0
+
+            if not options['offline'] and solution and 'sessions' in solution:
+                scheduler._save_solution(f"Benchmark {size}", admin, solution, None, [])
+                phases['persistence'] = scheduler.timings.get('persistence')
+
+            transaction.set_rollback(True)
+
+        return {
+            'size': size,
+            'config': document['synthetic'],
+            'variables': len(scheduler.variables),
+            'status': status,
+            'sessions': sessions,
+            'phases': phases,
+            'total': time.perf_counter() - start,
+        }
+
+    def _report(self, rows: list):
+        self.stdout.write('')
+        self.stdout.write(f"{'size':<8} {'phase':<22} {'baseline':>10} {'current':>10} {'ratio':>7}  verdict")
+        for row in rows:
+            ratio = f"{row['ratio']:.2f}" if row['ratio'] is not None else '-'
+            line = (f"{row['size']:<8} {row['phase']:<22} {row['baseline']:>10.3f} "
+                    f"{row['current']:>10.3f} {ratio:>7}  {row['verdict']}")
+            if row['verdict'] == 'regression':
+                line = self.style.ERROR(line)
+            elif row['verdict'] == 'speedup':
+                line = self.style.SUCCESS(line)
+            self.stdout.write(line)
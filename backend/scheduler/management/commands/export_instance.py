@@ -0,0 +1,50 @@
+"""
+Django management command to export a scheduling instance for offline benchmarking
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from timetable.models import Institution
+from scheduler.instance_io import write_instance
+from scheduler.ortools_scheduler import TimetableScheduler
+
+
+class Command(BaseCommand):
+    help = 'Export the scheduling instance of an institution to an anonymized JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('institution_id', type=int, help='Institution to export')
+        parser.add_argument('output', help='Output path (.json or .json.gz)')
+        parser.add_argument(
+            '--keep-names',
+            action='store_true',
+            help='Keep original ids, names and codes instead of anonymizing them',
+        )
+        parser.add_argument(
+            '--with-model',
+            action='store_true',
+            help='Also build the CP-SAT model and write its CpModelProto to <output>.pb',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            scheduler = TimetableScheduler(options['institution_id'])
+        except Institution.DoesNotExist:
+            raise CommandError(f"Institution {options['institution_id']} does not exist")
+
+        data = scheduler.prepare_data()
+        model = None
+        if options['with_model']:
+            scheduler.create_variables()
+            scheduler.add_constraints()
+            model = scheduler.model
+
+        document = write_instance(
+            data, options['output'], anonymize=not options['keep_names'], model=model
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported instance v{document['version']} to {options['output']}: "
+            f"{len(document['subjects'])} subjects, {len(document['teachers'])} teachers, "
+            f"{len(document['rooms'])} rooms, {len(document['class_groups'])} class groups"
+        ))
@@ -0,0 +1,119 @@
+"""
+Django management command that runs queued timetable generations
+"""
+
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from scheduler.job_queue import claim_job, complete_job, fail_job, heartbeat, reclaim_stale_jobs
+from scheduler.job_worker import init_job_worker, run_job
+
+
+class Command(BaseCommand):
+    help = 'Claim generation jobs from the database queue and solve them in worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cpus', type=int, default=None,
+                            help='CPU budget of this worker; jobs run while their cpu_budget fits (default: all cores)')
+        parser.add_argument('--name', default=None, help='Worker name recorded on claimed jobs (default: host:pid)')
+        parser.add_argument('--poll', type=float, default=None, help='Seconds between queue polls when idle')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty and all jobs are done')
+        parser.add_argument('--max-jobs', type=int, default=None, help='Exit after claiming this many jobs')
+
+    def handle(self, *args, **options):
+        self.worker = options['name'] or f"{socket.gethostname()}:{os.getpid()}"
+        self.cpus = options['cpus'] or os.cpu_count() or 1
+        poll = options['poll'] or getattr(settings, 'SCHEDULER_JOB_POLL_SECONDS', 2)
+        beat = getattr(settings, 'SCHEDULER_JOB_HEARTBEAT_SECONDS', 15)
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        self.stdout.write(f"Generation worker {self.worker} started with {self.cpus} CPU")
+        running = {}  # future -> (job_id, cpu_budget)
+        claimed = 0
+        pool = self._pool()
+        last_beat = 0.0
+
+        try:
+            while True:
+                close_old_connections()
+                now = time.monotonic()
+                if now - last_beat >= beat:
+                    heartbeat(self.worker, [job_id for job_id, _ in running.values()])
+                    reclaim_stale_jobs()
+                    last_beat = now
+
+                # Claim while CPU budget remains
+                free = self.cpus - sum(cpu for _, cpu in running.values())
+                while (not self.stopping and free > 0 and
+                       (options['max_jobs'] is None or claimed < options['max_jobs'])):
+                    job = claim_job(self.worker, free)
+                    if job is None:
+                        break
+                    claimed += 1
+                    running[pool.submit(run_job, job.id)] = (job.id, job.cpu_budget)
+                    free -= job.cpu_budget
+                    self.stdout.write(f"Job {job.id} started ({job.cpu_budget} CPU, {free} free)")
+
+                idle = not running
+                exhausted = options['max_jobs'] is not None and claimed >= options['max_jobs']
+                if idle and (self.stopping or options['burst'] or exhausted):
+                    break
+
+                if running:
+                    done, _ = wait(running, timeout=min(poll, beat), return_when=FIRST_COMPLETED)
+                    broken = False
+                    for future in done:
+                        job_id, _ = running.pop(future)
+                        broken |= self._record(future, job_id)
+                    if broken:
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        for future, (job_id, _) in running.items():
+                            fail_job(job_id, self.worker, 'Worker process pool broke', retry=True)
+                        running.clear()
+                        pool = self._pool()
+                else:
+                    time.sleep(poll)
+        finally:
+            pool.shutdown(wait=True)
+
+        self.stdout.write(f"Generation worker {self.worker} stopped after {claimed} jobs")
+
+    def _pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.cpus, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=init_job_worker)
+
+    def _record(self, future, job_id: int) -> bool:
+        """
+        Push a finished job's outcome back to the queue. Returns True when
+        the process pool died and must be replaced.
+        """
+        try:
+            result = future.result()
+        except BrokenProcessPool:
+            fail_job(job_id, self.worker, 'Solver process exited unexpectedly', retry=True)
+            self.stderr.write(f"Job {job_id}: solver process exited unexpectedly, requeued")
+            return True
+        except Exception as e:
+            fail_job(job_id, self.worker, str(e))
+            self.stderr.write(f"Job {job_id} failed: {e}")
+            return False
+
+        complete_job(job_id, self.worker, result)
+        self.stdout.write(f"Job {job_id} {'succeeded' if result.get('success') else 'failed'}")
+        return False
+
+    def _stop(self, signum, frame):
+        # Finish running jobs, claim nothing new
+        self.stopping = True
+        self.stdout.write(f"Generation worker {self.worker} stopping after running jobs finish")
@@ -0,0 +1,51 @@
+"""
+Django management command to solve an offline scheduling instance
+"""
+
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler.ortools_scheduler import TimetableScheduler
+
+
+class Command(BaseCommand):
+    help = 'Solve a scheduling instance file without reading the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('instance', help='Instance file written by export_instance')
+        parser.add_argument('--time-limit', type=float, default=None, help='Solver time limit in seconds')
+        parser.add_argument('--workers', type=int, default=None, help='Number of CP-SAT search workers')
+        parser.add_argument(
+            '--parameters',
+            default='{}',
+            help='JSON object of constraint flags to override, e.g. \'{"lexicographic_objectives": true}\'',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            parameters = json.loads(options['parameters'])
+            scheduler = TimetableScheduler.from_instance(options['instance'], parameters=parameters)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot load instance: {e}")
+
+        start = time.perf_counter()
+        scheduler.create_variables()
+        scheduler.add_constraints()
+        build_time = time.perf_counter() - start
+
+        solution = scheduler.solve(
+            time_limit=options['time_limit'], num_workers=options['workers']
+        )
+        total_time = time.perf_counter() - start
+
+        result = {
+            'instance': options['instance'],
+            'variables': len(scheduler.variables),
+            'build_time': round(build_time, 3),
+            'total_time': round(total_time, 3),
+            'status': (solution.get('solver_status') or solution.get('status')) if solution else 'no_solution',
+            'sessions': solution.get('statistics', {}).get('total_sessions', 0) if solution else 0,
+        }
+        self.stdout.write(json.dumps(result))
@@ -2,19 +2,49 @@
 OR-Tools CP-SAT based timetable scheduler
 """
 
+from ortools.sat import sat_parameters_pb2
 from ortools.sat.python import cp_model
 from datetime import datetime, time, timedelta
 import logging
+import math
 import os
-from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass
+import time as time_module
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple, Optional
+from dataclasses import dataclass, field
+import numpy as np
+from django.conf import settings
+from django.db import transaction
 from timetable.models import (
     Institution, Branch, Subject, Teacher, Room, ClassGroup,
-    Timetable, TimetableSession
+    Timetable, TimetableSession, GenerationRun
 )
+from timetable.reference_cache import get_reference_bundle
+from .decomposition import BranchDecomposer
+from .estimator import engine_thresholds, estimate_model, select_engine
+from .feasibility import FeasibilityAnalyzer
+from .teacher_assignment import TeacherAssigner
+from .tracing import GenerationTrace
+from .variable_index import SessionVariableIndex
 
 logger = logging.getLogger(__name__)
 
+# Default share of sessions each solution-pool variant must move
+POOL_MIN_CHANGED = 0.2
+
+# Objective reward per session kept where a reference timetable had it;
+# above what moving one session can gain in the soft objective
+STABILITY_WEIGHT = 100
+
+# Lexicographic objective stages, highest priority first: (name, share of solve time)
+OBJECTIVE_STAGES = [
+    ('hard_requirements', 0.4),
+    ('teacher_daily_balance', 0.2),
+    ('class_gaps', 0.2),
+    ('morning_preference', 0.1),
+    ('room_preference', 0.1),
+]
+
 
 @dataclass
 class SchedulingData:
@@ -26,6 +56,12 @@ class SchedulingData:
     class_groups: List[ClassGroup]
     time_slots: List[Tuple[int, time, time]]  # (day, start_time, end_time)
     constraints: Dict
+    subject_teachers: Dict[int, List[int]] = field(default_factory=dict)  # subject_id -> eligible teacher ids
+    teacher_preferences: Dict[Tuple[int, int], int] = field(default_factory=dict)  # (subject_id, teacher_id) -> 1-5
+    teacher_branches: Dict[int, List[int]] = field(default_factory=dict)  # teacher_id -> classes_assigned branch ids
+    blocked_slots: Dict[Tuple[str, int], Set[int]] = field(default_factory=dict)  # ('teacher'|'room', id) -> slot indices
+    # (subject_id, class_group_id) -> teacher_id fixed by the caller (decomposition); skips the pre-pass
+    teacher_assignment: Optional[Dict[Tuple[int, int], int]] = None
 
 
 class TimetableScheduler:
@@ -33,11 +69,45 @@ class TimetableScheduler:
     OR-Tools CP-SAT based timetable scheduler
     """
     
-    def __init__(self, institution_id: int):
-        self.institution = Institution.objects.get(id=institution_id)
+    def __init__(self, institution_id: int, parameters: Optional[Dict] = None):
+        self._setup(Institution.objects.get(id=institution_id), parameters)
+
+    @classmethod
+    def from_instance(cls, source, parameters: Optional[Dict] = None) -> 'TimetableScheduler':
+        """
+        Create a scheduler from an offline instance file (see instance_io)
+        without touching the database. Call create_variables(),
+        add_constraints() and solve() on the result.
+        """
+        from .instance_io import load_instance
+
+        data = load_instance(source)
+        scheduler = cls.__new__(cls)
+        scheduler._setup(data.institution, parameters)
+        if not data.constraints:
+            data.constraints = scheduler._prepare_constraints()
+        data.constraints.update({
+            key: value for key, value in scheduler.parameters.items() if key in data.constraints
+        })
+        scheduler.data = data
+        return scheduler
+
+    def _setup(self, institution, parameters: Optional[Dict]):
+        self.institution = institution
+        self.parameters = parameters or {}
         self.model = cp_model.CpModel()
         self.solver = cp_model.CpSolver()
         self.variables = {}
+        self.variable_index = SessionVariableIndex()  # structured view of self.variables
+        self.assumption_literals = {}  # (family, entities) -> enforcement literal
+        self.assumption_info = {}  # literal index -> named constraint description
+        self.teacher_assignment = None  # (subject_id, class_group_id) -> teacher_id from the pre-pass
+        self.objective_terms = []  # soft objective terms of the weighted objective
+        self.plan = None  # engine plan chosen by plan_generation()
+        self.trace = GenerationTrace(
+            model_getter=lambda: self.model,
+            track_allocations=bool(self.parameters.get('trace_allocations', False))
+        )
         self.data = None
         
         # Configure solver with optimized parameters
@@ -48,24 +118,36 @@ class TimetableScheduler:
         self.solver.parameters.symmetry_level = 2  # Enhanced symmetry breaking
         self.solver.parameters.linearization_level = 2  # Better linearization
         
+    @property
+    def timings(self) -> Dict[str, float]:
+        """
+        Wall time per traced phase, in seconds
+        """
+        return self.trace.timings()
+
     def prepare_data(self) -> SchedulingData:
         """
         Prepare all data needed for scheduling
         """
         logger.info(f"Preparing scheduling data for {self.institution.name}")
         
-        # Get all related data
-        subjects = list(Subject.objects.filter(branch__institution=self.institution))
-        teachers = list(Teacher.objects.filter(department__institution=self.institution))
-        rooms = list(Room.objects.filter(institution=self.institution, is_active=True))
-        class_groups = list(ClassGroup.objects.filter(branch__institution=self.institution))
+        # Reference rows come from the read-through cache (one query when current)
+        bundle = get_reference_bundle(self.institution.id)
+        subjects = list(bundle.subjects)
+        teachers = list(bundle.teachers)
+        rooms = [room for room in bundle.rooms if room.is_active]
+        class_groups = list(bundle.class_groups)
         
         # Generate time slots
         time_slots = self._generate_time_slots()
         
-        # Prepare constraints
+        # Prepare constraints, letting request parameters override known flags
         constraints = self._prepare_constraints()
+        constraints.update({
+            key: value for key, value in self.parameters.items() if key in constraints
+        })
         
+        subject_teachers, teacher_preferences = self._load_teacher_subjects(bundle, teachers)
         self.data = SchedulingData(
             institution=self.institution,
             subjects=subjects,
@@ -73,7 +155,13 @@ class TimetableScheduler:
             rooms=rooms,
             class_groups=class_groups,
             time_slots=time_slots,
-            constraints=constraints
+            constraints=constraints,
+            subject_teachers=subject_teachers,
+            teacher_preferences=teacher_preferences,
+            teacher_branches={
+                teacher.id: bundle.teacher_branches[teacher.id]
+                for teacher in teachers if teacher.id in bundle.teacher_branches
+            }
         )
         
         logger.info(f"Data prepared: {len(subjects)} subjects, {len(teachers)} teachers, "
@@ -81,7 +169,23 @@ class TimetableScheduler:
                    f"{len(time_slots)} time slots")
         
         return self.data
+
+    def _load_teacher_subjects(self, bundle, teachers: List[Teacher]) -> Tuple[Dict[int, List[int]], Dict[Tuple[int, int], int]]:
+        """
+        Teacher eligibility and preference level per subject from the reference bundle
+        """
+        teacher_ids = {teacher.id for teacher in teachers}
+        subject_teachers = defaultdict(list)
+        preferences = {}
+        for subject_id, teacher_id, preference_level in bundle.teacher_subjects:
+            if teacher_id in teacher_ids:
+                subject_teachers[subject_id].append(teacher_id)
+                preferences[(subject_id, teacher_id)] = preference_level
+        return dict(subject_teachers), preferences
     
+    def _can_teach(self, teacher, subject) -> bool:
+        return teacher.id in self.data.subject_teachers.get(subject.id, ())
+
     def _generate_time_slots(self) -> List[Tuple[int, time, time]]:
         """
         Generate all possible time slots based on institution settings
@@ -149,33 +253,112 @@ class TimetableScheduler:
             'spread_teacher_load': False,
             'avoid_excessive_consecutive': False,
             'balance_subject_distribution': False,
+
+            # Guard hard constraint families with assumption literals so an
+            # INFEASIBLE result can name the conflicting constraints
+            'explain_infeasibility': True,
+
+            # Optimize soft goals one at a time in priority order
+            # (see OBJECTIVE_STAGES) instead of one weighted sum
+            'lexicographic_objectives': False,
+
+            # Fix one teacher per (subject, class group) with a small
+            # assignment model first, so the timing model only picks
+            # slots and rooms (see TeacherAssigner)
+            'teacher_assignment_prepass': False,
         }
     
+    def plan_generation(self) -> Dict:
+        """
+        Estimate the model size from the prepared data and choose an engine
+        ('monolithic', 'prepass' or 'decomposed') with solver parameters.
+        The 'engine' and 'time_limit' request parameters override the choice;
+        'num_workers' caps the CPU cores the plan may use.
+        """
+        estimate = estimate_model(self.data)
+        thresholds = engine_thresholds()
+        if self.parameters.get('num_workers'):
+            # CPU budget of a queued job (see job_queue)
+            thresholds['max_workers'] = int(self.parameters['num_workers'])
+        self.plan = select_engine(
+            estimate,
+            thresholds=thresholds,
+            engine=self.parameters.get('engine', 'auto'),
+            time_limit=self.parameters.get('time_limit'),
+        )
+        if self.plan['engine'] == 'prepass':
+            self.data.constraints['teacher_assignment_prepass'] = True
+        return self.plan
+
+    def _solve_decomposed(self) -> Optional[Dict]:
+        """
+        Solve branch by branch with BranchDecomposer and return a solution in
+        the same shape as solve()
+        """
+        start_time = datetime.now()
+        with self.trace.span('solver'):
+            result = BranchDecomposer(
+                self.data,
+                time_limit=self.plan['solver']['time_limit'],
+                solver_workers=self.plan['solver']['num_workers'],
+                max_workers=self.parameters.get('num_workers'),
+            ).run()
+        if result['status'] == 'failed':
+            logger.error("No branch could be scheduled by the decomposed engine")
+            return None
+
+        with self.trace.span('extract_solution'):
+            solution = self._build_solution(result['sessions'])
+        solution['solver_status'] = result['status']
+        solution['solving_time'] = (datetime.now() - start_time).total_seconds()
+        solution['decomposition'] = {key: result[key] for key in ('branches', 'shared_resources', 'conflicts')}
+        return solution
+
     def create_variables(self):
         """
         Create CP-SAT variables for the scheduling problem
         """
         logger.info("Creating CP-SAT variables")
+
+        self.teacher_assignment = self.data.teacher_assignment
+        if self.teacher_assignment is None and self.data.constraints.get('teacher_assignment_prepass', False):
+            with self.trace.span('teacher_assignment'):
+                self.teacher_assignment = TeacherAssigner(self.data).assign()
+            if self.teacher_assignment is None:
+                logger.warning("Teacher assignment pre-pass failed, falling back to the full model")
         
         # Main scheduling variables: session[s, t, r, c, d, slot] = 1 if subject s is taught by teacher t
         # in room r to class c on day d at time slot
+        slot_ids = list(range(len(self.data.time_slots)))
+        blocked = self.data.blocked_slots
         for subject in self.data.subjects:
             for teacher in self.data.teachers:
                 # Check if teacher can teach this subject
-                if not teacher.subjects.filter(id=subject.id).exists():
+                if not self._can_teach(teacher, subject):
                     continue
                     
                 for room in self.data.rooms:
+                    # Slots reserved for other branches (see BranchDecomposer)
+                    unavailable = blocked.get(('teacher', teacher.id), set()) | blocked.get(('room', room.id), set())
+                    slots = [slot for slot in slot_ids if slot not in unavailable] if unavailable else slot_ids
                     # Check room capacity vs class strength
                     for class_group in self.data.class_groups:
                         if room.capacity < class_group.strength:
                             continue
+                        if (self.teacher_assignment is not None and
+                                self.teacher_assignment.get((subject.id, class_group.id)) != teacher.id):
+                            continue
                             
-                        for day, start_time, end_time in self.data.time_slots:
+                        block = []
+                        for slot in slots:
+                            day, start_time, end_time = self.data.time_slots[slot]
                             # Convert time to string without colons to avoid parsing issues
                             time_str = start_time.strftime('%H%M')
                             var_name = f"session_{subject.id}_{teacher.id}_{room.id}_{class_group.id}_{day}_{time_str}"
-                            self.variables[var_name] = self.model.NewBoolVar(var_name)
+                            var = self.model.NewBoolVar(var_name)
+                            self.variables[var_name] = var
+                            block.append(var)
+                        self.variable_index.add_block(block, subject.id, teacher.id, room.id, class_group.id, slots)
         
         logger.info(f"Created {len(self.variables)} scheduling variables")
     
@@ -185,15 +368,56 @@ class TimetableScheduler:
         """
         logger.info("Adding scheduling constraints")
         
-        self._add_subject_requirements_constraints()
-        self._add_teacher_constraints()
-        self._add_room_constraints()
-        self._add_class_constraints()
-        self._add_availability_constraints()
-        self._add_nep2020_constraints()  # NEP-2020 specific constraints
-        self._add_optimization_objectives()
+        with self.trace.span('constraints.subject_requirements'):
+            self._add_subject_requirements_constraints()
+        with self.trace.span('constraints.teacher'):
+            self._add_teacher_constraints()
+        with self.trace.span('constraints.room'):
+            self._add_room_constraints()
+        with self.trace.span('constraints.class'):
+            self._add_class_constraints()
+        with self.trace.span('constraints.availability'):
+            self._add_availability_constraints()
+        with self.trace.span('constraints.nep2020'):
+            self._add_nep2020_constraints()  # NEP-2020 specific constraints
+        with self.trace.span('objectives'):
+            self._add_optimization_objectives()
 
         logger.info("All constraints and objectives added")
+
+    def _enforce(self, constraint, family: str, **entities):
+        """
+        Guard a constraint with the enforcement literal of its family/entity.
+        Literals are fixed true, so presolve removes them from normal solves;
+        an infeasible result releases them as assumptions to find the named
+        constraints responsible (see _explain_infeasibility).
+        """
+        if not self.data.constraints.get('explain_infeasibility', True):
+            return constraint
+
+        key = (family, tuple(sorted(entities.items())))
+        literal = self.assumption_literals.get(key)
+        if literal is None:
+            suffix = '_'.join(f"{name}{value}" for name, value in sorted(entities.items()))
+            literal = self.model.NewBoolVar(f"assume_{family}_{suffix}" if suffix else f"assume_{family}")
+            self.assumption_literals[key] = literal
+            self.assumption_info[literal.Index()] = {'constraint': family, **entities}
+            # Assumptions force CP-SAT into single-threaded search, so they
+            # are only added once a solve has proven infeasibility
+            self.model.Proto().variables[literal.Index()].domain[0] = 1
+        return constraint.OnlyEnforceIf(literal)
+
+    def _release_assumptions(self, released: bool):
+        """
+        Free the enforcement literals and add them as assumptions, or fix
+        them true again and drop the assumptions
+        """
+        variables = self.model.Proto().variables
+        for literal in self.assumption_literals.values():
+            variables[literal.Index()].domain[0] = 0 if released else 1
+        self.model.ClearAssumptions()
+        if released:
+            self.model.AddAssumptions(list(self.assumption_literals.values()))
     
     def _add_subject_requirements_constraints(self):
         """
@@ -202,13 +426,13 @@ class TimetableScheduler:
         for subject in self.data.subjects:
             for class_group in self.data.class_groups:
                 # Check if this subject is for this class group
-                if subject.branch != class_group.branch or subject.year != class_group.year:
+                if subject.branch_id != class_group.branch_id or subject.year != class_group.year:
                     continue
                 
                 # Sum all sessions for this subject-class combination
                 subject_sessions = []
                 for teacher in self.data.teachers:
-                    if not teacher.subjects.filter(id=subject.id).exists():
+                    if not self._can_teach(teacher, subject):
                         continue
                         
                     for room in self.data.rooms:
@@ -224,7 +448,10 @@ class TimetableScheduler:
                 if subject_sessions:
                     # Each subject should have exactly the required number of sessions
                     required_sessions = subject.total_hours
-                    self.model.Add(sum(subject_sessions) == required_sessions)
+                    self._enforce(
+                        self.model.Add(sum(subject_sessions) == required_sessions),
+                        'subject_total_hours', subject=subject.id, class_group=class_group.id
+                    )
     
     def _add_teacher_constraints(self):
         """
@@ -236,7 +463,7 @@ class TimetableScheduler:
                 teacher_sessions_at_slot = []
                 
                 for subject in self.data.subjects:
-                    if not teacher.subjects.filter(id=subject.id).exists():
+                    if not self._can_teach(teacher, subject):
                         continue
                         
                     for room in self.data.rooms:
@@ -251,13 +478,16 @@ class TimetableScheduler:
                 
                 if teacher_sessions_at_slot:
                     # Teacher can teach at most one session per time slot
-                    self.model.Add(sum(teacher_sessions_at_slot) <= 1)
+                    self._enforce(
+                        self.model.Add(sum(teacher_sessions_at_slot) <= 1),
+                        'teacher_conflict', teacher=teacher.id
+                    )
             
             # Daily hour limits
             for day in range(7):
                 daily_sessions = []
                 for subject in self.data.subjects:
-                    if not teacher.subjects.filter(id=subject.id).exists():
+                    if not self._can_teach(teacher, subject):
                         continue
                         
                     for room in self.data.rooms:
@@ -275,7 +505,10 @@ class TimetableScheduler:
                 if daily_sessions:
                     # Respect teacher's daily hour limit
                     max_daily_hours = teacher.max_hours_per_day
-                    self.model.Add(sum(daily_sessions) <= max_daily_hours)
+                    self._enforce(
+                        self.model.Add(sum(daily_sessions) <= max_daily_hours),
+                        'teacher_daily_cap', teacher=teacher.id
+                    )
     
     def _add_room_constraints(self):
         """
@@ -288,7 +521,7 @@ class TimetableScheduler:
                 
                 for subject in self.data.subjects:
                     for teacher in self.data.teachers:
-                        if not teacher.subjects.filter(id=subject.id).exists():
+                        if not self._can_teach(teacher, subject):
                             continue
                             
                         for class_group in self.data.class_groups:
@@ -302,7 +535,10 @@ class TimetableScheduler:
                 
                 if room_sessions_at_slot:
                     # Room can host at most one session per time slot
-                    self.model.Add(sum(room_sessions_at_slot) <= 1)
+                    self._enforce(
+                        self.model.Add(sum(room_sessions_at_slot) <= 1),
+                        'room_conflict', room=room.id
+                    )
     
     def _add_class_constraints(self):
         """
@@ -314,11 +550,11 @@ class TimetableScheduler:
                 class_sessions_at_slot = []
                 
                 for subject in self.data.subjects:
-                    if subject.branch != class_group.branch or subject.year != class_group.year:
+                    if subject.branch_id != class_group.branch_id or subject.year != class_group.year:
                         continue
                         
                     for teacher in self.data.teachers:
-                        if not teacher.subjects.filter(id=subject.id).exists():
+                        if not self._can_teach(teacher, subject):
                             continue
                             
                         for room in self.data.rooms:
@@ -332,7 +568,10 @@ class TimetableScheduler:
                 
                 if class_sessions_at_slot:
                     # Class can have at most one session per time slot
-                    self.model.Add(sum(class_sessions_at_slot) <= 1)
+                    self._enforce(
+                        self.model.Add(sum(class_sessions_at_slot) <= 1),
+                        'class_conflict', class_group=class_group.id
+                    )
     
     def _add_availability_constraints(self):
         """
@@ -353,7 +592,7 @@ class TimetableScheduler:
             for teacher in self.data.teachers:
                 teacher_sessions = []
                 for subject in self.data.subjects:
-                    if not teacher.subjects.filter(id=subject.id).exists():
+                    if not self._can_teach(teacher, subject):
                         continue
                     for room in self.data.rooms:
                         for class_group in self.data.class_groups:
@@ -366,7 +605,10 @@ class TimetableScheduler:
                 if teacher_sessions:
                     # Use individual teacher max hours or institution default
                     max_hours = getattr(teacher, 'max_hours_per_week', self.institution.max_teacher_hours_per_week)
-                    self.model.Add(sum(teacher_sessions) <= max_hours)
+                    self._enforce(
+                        self.model.Add(sum(teacher_sessions) <= max_hours),
+                        'teacher_weekly_cap', teacher=teacher.id
+                    )
                     logger.debug(f"Added max hours constraint for teacher {teacher.id}: {max_hours} hours")
 
         # Constraint 2: Working days only
@@ -382,7 +624,7 @@ class TimetableScheduler:
                         # Disable all sessions on non-working days
                         for var_name, var in self.variables.items():
                             if f"_{day}_" in var_name:
-                                self.model.Add(var == 0)
+                                self._enforce(self.model.Add(var == 0), 'working_days')
 
         # Constraint 3: Lab subjects in lab rooms only
         if self.data.constraints.get('lab_subjects_in_lab_rooms', True):
@@ -397,7 +639,10 @@ class TimetableScheduler:
                                         var_name = f"session_{subject.id}_{teacher.id}_{room.id}_{class_group.id}_{day}_{time_str}"
                                         if var_name in self.variables:
                                             # Lab subjects cannot be scheduled in non-lab rooms
-                                            self.model.Add(self.variables[var_name] == 0)
+                                            self._enforce(
+                                                self.model.Add(self.variables[var_name] == 0),
+                                                'lab_room', subject=subject.id
+                                            )
 
         # Constraint 4: Exclude lunch break slots
         if self.data.constraints.get('lunch_break_mandatory', True):
@@ -411,19 +656,19 @@ class TimetableScheduler:
                     time_str = start_time.strftime('%H%M')
                     for var_name, var in self.variables.items():
                         if f"_{day}_{time_str}" in var_name:
-                            self.model.Add(var == 0)
+                            self._enforce(self.model.Add(var == 0), 'lunch_break')
 
         # Constraint 5: Subject weekly hours compliance
         if self.data.constraints.get('subject_weekly_hours', True):
             for subject in self.data.subjects:
                 for class_group in self.data.class_groups:
-                    if subject.branch != class_group.branch:
+                    if subject.branch_id != class_group.branch_id:
                         continue
 
                     subject_sessions = []
                     for teacher in self.data.teachers:
                         # Only consider teachers who can teach this subject
-                        if not teacher.subjects.filter(id=subject.id).exists():
+                        if not self._can_teach(teacher, subject):
                             continue
                         for room in self.data.rooms:
                             for day, start_time, end_time in self.data.time_slots:
@@ -434,134 +679,19 @@ class TimetableScheduler:
 
                     if subject_sessions and hasattr(subject, 'weekly_hours'):
                         # Subject should have exactly the specified weekly hours
-                        self.model.Add(sum(subject_sessions) == subject.weekly_hours)
+                        self._enforce(
+                            self.model.Add(sum(subject_sessions) == subject.weekly_hours),
+                            'subject_weekly_hours', subject=subject.id, class_group=class_group.id
+                        )
 
         logger.info("NEP-2020 constraints added successfully")
 
     def validate_constraints(self) -> Dict:
         """
         Validate NEP-2020 constraints and provide detailed feedback
+        (see FeasibilityAnalyzer)
         """
-        logger.info("Validating NEP-2020 constraints")
-        validation_result = {
-            'is_valid': True,
-            'errors': [],
-            'warnings': [],
-            'suggestions': [],
-            'constraint_details': {}
-        }
-
-        # Validation 1: Teacher workload constraints
-        teacher_workload_issues = []
-        for teacher in self.data.teachers:
-            max_hours = getattr(teacher, 'max_hours_per_week', self.institution.max_teacher_hours_per_week)
-            assigned_subjects = teacher.subjects.all()
-
-            total_required_hours = 0
-            for subject in assigned_subjects:
-                # Calculate hours needed for all classes this teacher teaches this subject to
-                for class_group in self.data.class_groups:
-                    if (subject.branch == class_group.branch and
-                        teacher.classes_assigned.filter(id=class_group.id).exists()):
-                        total_required_hours += getattr(subject, 'weekly_hours', subject.total_hours)
-
-            if total_required_hours > max_hours:
-                teacher_workload_issues.append({
-                    'teacher': teacher.name,
-                    'required_hours': total_required_hours,
-                    'max_hours': max_hours,
-                    'excess': total_required_hours - max_hours
-                })
-                validation_result['errors'].append(
-                    f"Teacher {teacher.name} assigned {total_required_hours} hours but max is {max_hours}"
-                )
-
-        validation_result['constraint_details']['teacher_workload'] = teacher_workload_issues
-
-        # Validation 2: Lab subject and room compatibility
-        lab_room_issues = []
-        lab_subjects = [s for s in self.data.subjects if s.type == 'lab']
-        lab_rooms = [r for r in self.data.rooms if r.is_lab]
-
-        if lab_subjects and not lab_rooms:
-            validation_result['errors'].append("Lab subjects exist but no lab rooms available")
-            lab_room_issues.append("No lab rooms available for lab subjects")
-
-        for subject in lab_subjects:
-            suitable_rooms = [r for r in lab_rooms if r.capacity >= max(cg.strength for cg in self.data.class_groups if cg.branch == subject.branch)]
-            if not suitable_rooms:
-                lab_room_issues.append({
-                    'subject': subject.name,
-                    'issue': 'No lab room with sufficient capacity'
-                })
-                validation_result['errors'].append(f"Lab subject {subject.name} has no suitable lab room")
-
-        validation_result['constraint_details']['lab_rooms'] = lab_room_issues
-
-        # Validation 3: Working days configuration
-        working_days = getattr(self.institution, 'working_days', [])
-        if not working_days:
-            validation_result['warnings'].append("No working days specified, defaulting to Mon-Fri")
-        elif len(working_days) < 5:
-            validation_result['warnings'].append(f"Only {len(working_days)} working days may limit scheduling options")
-
-        # Validation 4: Time slot sufficiency
-        total_required_sessions = sum(
-            getattr(subject, 'weekly_hours', subject.total_hours) *
-            len([cg for cg in self.data.class_groups if cg.branch == subject.branch])
-            for subject in self.data.subjects
-        )
-
-        available_slots_per_week = len(self.data.time_slots) * len(working_days) if working_days else len(self.data.time_slots) * 5
-        total_class_slot_capacity = available_slots_per_week * len(self.data.class_groups)
-
-        if total_required_sessions > total_class_slot_capacity:
-            validation_result['errors'].append(
-                f"Required sessions ({total_required_sessions}) exceed available capacity ({total_class_slot_capacity})"
-            )
-            validation_result['suggestions'].append("Consider adding more time slots or reducing subject hours")
-
-        # Validation 5: Teacher-subject assignments
-        unassigned_subjects = []
-        for subject in self.data.subjects:
-            assigned_teachers = [t for t in self.data.teachers if t.subjects.filter(id=subject.id).exists()]
-            if not assigned_teachers:
-                unassigned_subjects.append(subject.name)
-                validation_result['errors'].append(f"Subject {subject.name} has no assigned teachers")
-
-        validation_result['constraint_details']['unassigned_subjects'] = unassigned_subjects
-
-        # Validation 6: Room capacity vs class strength
-        capacity_issues = []
-        for class_group in self.data.class_groups:
-            suitable_rooms = [r for r in self.data.rooms if r.capacity >= class_group.strength]
-            if not suitable_rooms:
-                capacity_issues.append({
-                    'class_group': f"{class_group.branch}-{class_group.year}",
-                    'strength': class_group.strength,
-                    'issue': 'No room with sufficient capacity'
-                })
-                validation_result['errors'].append(
-                    f"Class {class_group.branch}-{class_group.year} ({class_group.strength} students) has no suitable room"
-                )
-
-        validation_result['constraint_details']['room_capacity'] = capacity_issues
-
-        # Set overall validation status
-        validation_result['is_valid'] = len(validation_result['errors']) == 0
-
-        # Add suggestions based on issues found
-        if teacher_workload_issues:
-            validation_result['suggestions'].append("Consider hiring more teachers or reducing subject hours")
-        if lab_room_issues:
-            validation_result['suggestions'].append("Add more lab rooms or reduce lab subject requirements")
-        if capacity_issues:
-            validation_result['suggestions'].append("Add larger rooms or reduce class sizes")
-
-        logger.info(f"Constraint validation completed: {'VALID' if validation_result['is_valid'] else 'INVALID'}")
-        logger.info(f"Found {len(validation_result['errors'])} errors, {len(validation_result['warnings'])} warnings")
-
-        return validation_result
+        return FeasibilityAnalyzer(self.data).analyze()
 
     def _add_optimization_objectives(self):
         """
@@ -633,7 +763,7 @@ class TimetableScheduler:
                 for day in range(1, 8):
                     daily_loads[day] = []
                     for subject in self.data.subjects:
-                        if not teacher.subjects.filter(id=subject.id).exists():
+                        if not self._can_teach(teacher, subject):
                             continue
                         for room in self.data.rooms:
                             for class_group in self.data.class_groups:
@@ -681,7 +811,7 @@ class TimetableScheduler:
         if self.data.constraints.get('balance_subject_distribution', True):
             for subject in self.data.subjects:
                 for class_group in self.data.class_groups:
-                    if subject.branch != class_group.branch:
+                    if subject.branch_id != class_group.branch_id:
                         continue
 
                     daily_subject_sessions = {}
@@ -707,11 +837,58 @@ class TimetableScheduler:
                             objective_terms.append(-clustering_penalty)
 
         # Set the objective to maximize the sum of all objective terms
+        self.objective_terms = objective_terms
         if objective_terms:
             self.model.Maximize(sum(objective_terms))
             logger.info(f"Added {len(objective_terms)} optimization objective terms")
+
+    def add_stability_objective(self, kept: List, weight: int = STABILITY_WEIGHT):
+        """
+        Reward each of the ``kept`` placement variables that stays 1 on top of
+        the soft objective, so a re-solve only moves the sessions it has to.
+        Applies to the weighted objective, not to lexicographic stages.
+        """
+        if kept:
+            self.model.Maximize(sum(self.objective_terms) + weight * sum(kept))
+
+    def soft_goal_values(self) -> Dict[str, int]:
+        """
+        The lexicographic soft goals (see _build_objective_stages) evaluated on
+        the last solution, all lower-is-better. Needs no objective in the model.
+        """
+        slot_positions = {}
+        slots_by_day = defaultdict(list)
+        for slot in sorted(range(len(self.data.time_slots)), key=lambda index: self.data.time_slots[index]):
+            day = self.data.time_slots[slot][0]
+            slot_positions[slot] = (day, len(slots_by_day[day]))
+            slots_by_day[day].append(slot)
+        room_capacity = {room.id: room.capacity for room in self.data.rooms}
+        class_strength = {class_group.id: class_group.strength for class_group in self.data.class_groups}
+
+        teacher_day = defaultdict(int)
+        class_positions = defaultdict(set)
+        goals = dict.fromkeys(('teacher_daily_balance', 'class_gaps', 'morning_preference', 'room_preference'), 0)
+        selected = self.variable_index.selected(self.solver)
+        for teacher_id, room_id, class_id, slot in zip(
+            selected['teacher'].tolist(), selected['room'].tolist(),
+            selected['class_group'].tolist(), selected['slot'].tolist()
+        ):
+            day, position = slot_positions[slot]
+            teacher_day[(teacher_id, day)] += 1
+            class_positions[(class_id, day)].add(position)
+            goals['morning_preference'] += position
+            goals['room_preference'] += max(0, room_capacity[room_id] - class_strength[class_id])
+
+        peaks = defaultdict(int)
+        for (teacher_id, _), sessions in teacher_day.items():
+            peaks[teacher_id] = max(peaks[teacher_id], sessions)
+        goals['teacher_daily_balance'] = sum(peaks.values())
+        # Empty slots between a class's first and last session of the day
+        goals['class_gaps'] = sum(max(positions) - min(positions) + 1 - len(positions)
+                                  for positions in class_positions.values())
+        return goals
     
-    def solve(self) -> Optional[Dict]:
+    def solve(self, time_limit: Optional[float] = None, num_workers: Optional[int] = None) -> Optional[Dict]:
         """
         Solve the scheduling problem with enhanced error handling
         """
@@ -719,8 +896,8 @@ class TimetableScheduler:
         start_time = datetime.now()
 
         # Set optimized solver parameters for NEP-2020 constraints
-        self.solver.parameters.max_time_in_seconds = 600  # 10 minutes for complex NEP-2020 constraints
-        self.solver.parameters.num_search_workers = min(8, os.cpu_count() or 4)  # Use available cores
+        self.solver.parameters.max_time_in_seconds = time_limit or 600  # 10 minutes for complex NEP-2020 constraints
+        self.solver.parameters.num_search_workers = num_workers or min(8, os.cpu_count() or 4)  # Use available cores
         self.solver.parameters.log_search_progress = True
 
         # Advanced parameters for better constraint satisfaction
@@ -734,13 +911,18 @@ class TimetableScheduler:
         # Note: preferred_variable_order removed as IN_ORDER is not available in this OR-Tools version
 
         # Restart and learning parameters
-        self.solver.parameters.restart_algorithms = [cp_model.LUBY_RESTART, cp_model.DL_MOVING_AVERAGE_RESTART]
+        if not self.solver.parameters.restart_algorithms:
+            self.solver.parameters.restart_algorithms.extend([
+                sat_parameters_pb2.SatParameters.LUBY_RESTART,
+                sat_parameters_pb2.SatParameters.DL_MOVING_AVERAGE_RESTART,
+            ])
         self.solver.parameters.clause_cleanup_period = 10000
 
         logger.info(f"Solver configured with {self.solver.parameters.num_search_workers} workers, {self.solver.parameters.max_time_in_seconds}s timeout")
 
-        # Pre-solve constraint validation
-        validation_result = self.validate_constraints()
+        # Pre-solve feasibility analysis (flow bounds, no database access)
+        with self.trace.span('feasibility_analysis'):
+            validation_result = FeasibilityAnalyzer(self.data).analyze()
         if not validation_result['is_valid']:
             logger.error("Constraint validation failed before solving")
             return {
@@ -751,7 +933,12 @@ class TimetableScheduler:
             }
 
         try:
-            status = self.solver.Solve(self.model)
+            stages = None
+            with self.trace.span('solver'):
+                if self.data.constraints.get('lexicographic_objectives', False):
+                    status, stages = self._solve_lexicographic()
+                else:
+                    status = self.solver.Solve(self.model)
 
             end_time = datetime.now()
             solving_time = end_time - start_time
@@ -770,16 +957,22 @@ class TimetableScheduler:
 
             if status == cp_model.OPTIMAL:
                 logger.info("Found optimal solution")
-                solution = self._extract_solution()
+                with self.trace.span('extract_solution'):
+                    solution = self._extract_solution()
                 solution['solver_status'] = 'optimal'
                 solution['solving_time'] = solving_time.total_seconds()
+                if stages is not None:
+                    solution['objective_stages'] = stages
                 return solution
 
             elif status == cp_model.FEASIBLE:
                 logger.info("Found feasible solution (may not be optimal)")
-                solution = self._extract_solution()
+                with self.trace.span('extract_solution'):
+                    solution = self._extract_solution()
                 solution['solver_status'] = 'feasible'
                 solution['solving_time'] = solving_time.total_seconds()
+                if stages is not None:
+                    solution['objective_stages'] = stages
                 return solution
 
             elif status == cp_model.INFEASIBLE:
@@ -792,7 +985,8 @@ class TimetableScheduler:
                 if self.solver.NumBooleans() > 0:
                     logger.info("Attempting to extract partial solution")
                     try:
-                        partial_solution = self._extract_solution()
+                        with self.trace.span('extract_solution'):
+                            partial_solution = self._extract_solution()
                         partial_solution['solver_status'] = 'partial'
                         partial_solution['solving_time'] = solving_time.total_seconds()
                         return partial_solution
@@ -808,56 +1002,213 @@ class TimetableScheduler:
             logger.error(f"Exception during solving: {str(e)}")
             return None
 
+    def _solve_lexicographic(self) -> Tuple[int, List[Dict]]:
+        """
+        Optimize objectives one stage at a time in priority order. Each stage
+        gets a slice of the time budget, its optimum is fixed as a constraint
+        and the incumbent is hinted to the next stage.
+        """
+        total_time = self.solver.parameters.max_time_in_seconds
+        with self.trace.span('objectives.lexicographic'):
+            objectives = self._build_objective_stages()
+        stages = []
+        best_solver = None
+        best_status = cp_model.UNKNOWN
+
+        for stage_name, share in OBJECTIVE_STAGES:
+            objective = objectives.get(stage_name)
+            if stage_name != 'hard_requirements' and objective is None:
+                continue
+
+            stage_solver = cp_model.CpSolver()
+            # protobuf message on older OR-Tools, pybind wrapper on newer releases
+            copy_parameters = getattr(stage_solver.parameters, 'CopyFrom', None) or stage_solver.parameters.copy_from
+            copy_parameters(self.solver.parameters)
+            stage_solver.parameters.max_time_in_seconds = max(1.0, total_time * share)
+            if best_solver is not None:
+                # Start from the hinted incumbent: a fixed search order ignores
+                # it, and symmetry detection and probing eat a short stage's budget
+                stage_solver.parameters.search_branching = cp_model.AUTOMATIC_SEARCH
+                stage_solver.parameters.symmetry_level = 0
+                stage_solver.parameters.cp_model_probing_level = 0
+
+            if objective is None:
+                self.model.ClearObjective()
+            else:
+                self.model.Minimize(objective)
+
+            status = stage_solver.Solve(self.model)
+            stage = {
+                'stage': stage_name,
+                'time_limit': stage_solver.parameters.max_time_in_seconds,
+                'wall_time': stage_solver.WallTime(),
+                'status': stage_solver.StatusName(status),
+                'objective_value': None,
+                'skipped': False,
+            }
+            stages.append(stage)
+
+            if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                if best_solver is None:
+                    logger.warning(f"Stage {stage_name} ended with {stage['status']} after "
+                                   f"{stage['wall_time']:.2f}s without an incumbent")
+                    # The infeasibility explanation starts from the solver that
+                    # failed, with the whole budget rather than the stage's share
+                    self.solver = stage_solver
+                    self.solver.parameters.max_time_in_seconds = total_time
+                    best_status = status
+                    break
+                # Out of time for this goal: leave it unlocked, keep the
+                # incumbent's hints and move on to lower priorities
+                stage['skipped'] = True
+                logger.warning(f"Stage {stage_name} ended with {stage['status']} after "
+                               f"{stage['wall_time']:.2f}s, skipped with the previous incumbent")
+                continue
+
+            best_solver, best_status = stage_solver, status
+            if objective is not None:
+                stage['objective_value'] = stage_solver.ObjectiveValue()
+                # Lock in this stage's optimum before moving to lower priorities
+                self.model.Add(objective <= int(round(stage_solver.ObjectiveValue())))
+
+            # Hint the whole incumbent, objective auxiliaries included, so the
+            # next stage starts from a complete feasible assignment
+            self.model.ClearHints()
+            hint = self.model.Proto().solution_hint
+            solution = stage_solver.ResponseProto().solution
+            hint.vars.extend(range(len(solution)))
+            hint.values.extend(solution)
+
+            logger.info(f"Stage {stage_name}: {stage['status']} objective={stage['objective_value']} "
+                        f"in {stage['wall_time']:.2f}s (limit {stage['time_limit']:.0f}s)")
+
+        if best_solver is not None:
+            self.solver = best_solver
+            # Later stages only tighten soft goals; hard constraints are satisfied
+            # by every incumbent, so report feasibility unless all stages were optimal
+            all_optimal = all(stage['status'] == 'OPTIMAL' for stage in stages)
+            best_status = cp_model.OPTIMAL if all_optimal else cp_model.FEASIBLE
+
+        return best_status, stages
+
+    def _build_objective_stages(self) -> Dict:
+        """
+        Build one linear expression per soft goal, all to be minimized
+        """
+        slot_positions = {}
+        slots_by_day = defaultdict(list)
+        for slot in sorted(range(len(self.data.time_slots)), key=lambda index: self.data.time_slots[index]):
+            day = self.data.time_slots[slot][0]
+            slot_positions[slot] = (day, len(slots_by_day[day]))
+            slots_by_day[day].append(slot)
+
+        room_capacity = {room.id: room.capacity for room in self.data.rooms}
+        class_strength = {class_group.id: class_group.strength for class_group in self.data.class_groups}
+
+        teacher_day = defaultdict(list)
+        class_slot = defaultdict(list)
+        morning_terms = []
+        room_terms = []
+
+        columns = self.variable_index.arrays()
+        for var, teacher_id, room_id, class_id, slot in zip(
+            self.variable_index.variables, columns['teacher'].tolist(), columns['room'].tolist(),
+            columns['class_group'].tolist(), columns['slot'].tolist()
+        ):
+            day, position = slot_positions[slot]
+
+            teacher_day[(teacher_id, day)].append(var)
+            class_slot[(class_id, day, position)].append(var)
+            if position:
+                morning_terms.append(position * var)
+            waste = room_capacity[room_id] - class_strength[class_id]
+            if waste > 0:
+                room_terms.append(waste * var)
+
+        objectives = {}
+
+        # Teacher daily balance: minimize each teacher's busiest day
+        max_slots_per_day = max((len(day_slots) for day_slots in slots_by_day.values()), default=0)
+        peaks = []
+        teacher_days = defaultdict(list)
+        for (teacher_id, day), sessions in teacher_day.items():
+            teacher_days[teacher_id].append(sessions)
+        for teacher_id, day_sessions in teacher_days.items():
+            peak = self.model.NewIntVar(0, max_slots_per_day, f"teacher_peak_{teacher_id}")
+            for sessions in day_sessions:
+                self.model.Add(sum(sessions) <= peak)
+            peaks.append(peak)
+        if peaks:
+            objectives['teacher_daily_balance'] = sum(peaks)
+
+        # Class gaps: an empty slot with sessions both before and after it
+        gaps = []
+        class_ids = {class_id for class_id, _, _ in class_slot}
+        for class_id in class_ids:
+            for day, day_slots in slots_by_day.items():
+                occupied = [sum(class_slot.get((class_id, day, k), [])) for k in range(len(day_slots))]
+                if len(occupied) < 3:
+                    continue
+                before = [self.model.NewBoolVar(f"before_{class_id}_{day}_{k}") for k in range(len(occupied))]
+                after = [self.model.NewBoolVar(f"after_{class_id}_{day}_{k}") for k in range(len(occupied))]
+                for k in range(1, len(occupied)):
+                    self.model.Add(before[k] >= before[k - 1])
+                    self.model.Add(before[k] >= occupied[k - 1])
+                for k in range(len(occupied) - 2, -1, -1):
+                    self.model.Add(after[k] >= after[k + 1])
+                    self.model.Add(after[k] >= occupied[k + 1])
+                for k in range(1, len(occupied) - 1):
+                    gap = self.model.NewBoolVar(f"gap_{class_id}_{day}_{k}")
+                    self.model.Add(gap >= before[k] + after[k] - occupied[k] - 1)
+                    gaps.append(gap)
+        if gaps:
+            objectives['class_gaps'] = sum(gaps)
+
+        if morning_terms:
+            objectives['morning_preference'] = sum(morning_terms)
+        if room_terms:
+            objectives['room_preference'] = sum(room_terms)
+
+        logger.info(f"Built lexicographic objectives: {', '.join(objectives) or 'none'}")
+        return objectives
+
     def _handle_infeasible_problem(self) -> Optional[Dict]:
         """
-        Handle infeasible problems by analyzing constraints and suggesting relaxations
+        Handle infeasible problems by explaining which named constraints conflict
         """
         logger.info("Analyzing infeasible problem...")
 
-        # Collect constraint violation information
         infeasibility_info = {
             'status': 'infeasible',
             'suggestions': [],
             'constraint_analysis': {}
         }
 
-        # Analyze potential causes of infeasibility
+        explanation = self._explain_infeasibility()
+        infeasibility_info['constraint_analysis'] = explanation
+
+        family_suggestions = {
+            'subject_total_hours': "Reduce theory/practical/tutorial hours of the listed subjects",
+            'subject_weekly_hours': "Reduce weekly_hours of the listed subjects",
+            'teacher_weekly_cap': "Raise max_hours_per_week or add teachers for the listed subjects",
+            'teacher_daily_cap': "Raise max_hours_per_day of the listed teachers",
+            'teacher_conflict': "Assign additional teachers to the listed subjects",
+            'room_conflict': "Add rooms or free up the listed rooms",
+            'class_conflict': "Add time slots or reduce the load of the listed class groups",
+            'lab_room': "Add lab rooms with sufficient capacity",
+            'lunch_break': "Shorten the lunch break or extend working hours",
+            'working_days': "Add working days",
+        }
         suggestions = []
-
-        # Check if we have enough rooms
-        total_room_capacity = sum(room.capacity for room in self.data.rooms)
-        total_student_capacity_needed = sum(cg.strength for cg in self.data.class_groups)
-
-        if total_room_capacity < total_student_capacity_needed:
-            suggestions.append("Insufficient room capacity for all class groups")
-
-        # Check if we have enough teachers
-        total_teaching_hours_needed = sum(
-            subject.total_hours * len([cg for cg in self.data.class_groups
-                                     if cg.branch == subject.branch and cg.year == subject.year])
-            for subject in self.data.subjects
-        )
-
-        total_teacher_capacity = sum(teacher.max_hours_per_week for teacher in self.data.teachers)
-
-        if total_teaching_hours_needed > total_teacher_capacity:
-            suggestions.append("Insufficient teacher capacity for all required hours")
-
-        # Check time slot availability
-        available_slots_per_week = len(self.data.time_slots)
-        if total_teaching_hours_needed > available_slots_per_week * len(self.data.class_groups):
-            suggestions.append("Insufficient time slots for all required sessions")
-
-        # Check teacher-subject assignments
-        unassigned_subjects = []
-        for subject in self.data.subjects:
-            has_teacher = any(
-                teacher.subjects.filter(id=subject.id).exists()
-                for teacher in self.data.teachers
-            )
-            if not has_teacher:
-                unassigned_subjects.append(subject.code)
-
+        for item in explanation['conflicting_constraints']:
+            suggestion = family_suggestions.get(item['constraint'])
+            if suggestion and suggestion not in suggestions:
+                suggestions.append(suggestion)
+
+        unassigned_subjects = [
+            subject.code for subject in self.data.subjects
+            if not self.data.subject_teachers.get(subject.id)
+        ]
         if unassigned_subjects:
             suggestions.append(f"Subjects without assigned teachers: {', '.join(unassigned_subjects)}")
 
@@ -866,11 +1217,124 @@ class TimetableScheduler:
         logger.warning(f"Infeasibility analysis complete. Suggestions: {'; '.join(suggestions)}")
 
         return infeasibility_info
+
+    def _explain_infeasibility(self, time_budget: Optional[float] = None) -> Dict:
+        """
+        Re-solve with the enforcement literals as assumptions and shrink the
+        sufficient assumption set to a minimal conflicting set of named
+        constraints. The single-threaded re-solve and the minimization share
+        ``time_budget`` (default settings.SCHEDULER_EXPLAIN_SECONDS); when it
+        runs out the core found so far is reported as not minimal, or no core
+        when the re-solve itself did not finish.
+        """
+        if time_budget is None:
+            time_budget = getattr(settings, 'SCHEDULER_EXPLAIN_SECONDS', 30)
+        start = time_module.monotonic()
+        literals = {literal.Index(): literal for literal in self.assumption_literals.values()}
+        core = []
+        is_complete = False
+        if literals:
+            self._release_assumptions(True)
+            solver = cp_model.CpSolver()
+            copy_parameters = getattr(solver.parameters, 'CopyFrom', None) or solver.parameters.copy_from
+            copy_parameters(self.solver.parameters)
+            solver.parameters.max_time_in_seconds = time_budget
+            solver.parameters.log_search_progress = False
+            status = solver.Solve(self.model)
+            if status == cp_model.INFEASIBLE:
+                core = [index for index in solver.SufficientAssumptionsForInfeasibility() if index in literals]
+                is_complete = True
+            logger.info(f"Assumption re-solve ended {solver.StatusName(status)} with {len(core)} constraints "
+                        f"in {solver.WallTime():.2f} seconds")
+
+        # Deletion-based minimization: a literal whose removal keeps the model
+        # infeasible is dropped; one whose removal makes it feasible stays.
+        position = 0
+        while position < len(core):
+            remaining = time_budget - (time_module.monotonic() - start)
+            if remaining <= 0:
+                break
+
+            candidate = core[:position] + core[position + 1:]
+            probe = cp_model.CpSolver()
+            probe.parameters.max_time_in_seconds = min(remaining, 2.0)
+            probe.parameters.stop_after_first_solution = True
+            self.model.ClearAssumptions()
+            self.model.AddAssumptions([literals[index] for index in candidate])
+            status = probe.Solve(self.model)
+
+            if status == cp_model.INFEASIBLE:
+                reduced = set(probe.SufficientAssumptionsForInfeasibility()) or set(candidate)
+                core = core[:position] + [index for index in candidate[position:] if index in reduced]
+            else:
+                position += 1
+
+        # Later solves run without assumptions again
+        if literals:
+            self._release_assumptions(False)
+
+        names = {
+            'subject': {subject.id: subject.code for subject in self.data.subjects},
+            'teacher': {teacher.id: teacher.employee_id for teacher in self.data.teachers},
+            'room': {room.id: room.code for room in self.data.rooms},
+            'class_group': {class_group.id: class_group.name for class_group in self.data.class_groups},
+        }
+        conflicting = []
+        for index in core:
+            item = dict(self.assumption_info[index])
+            item['entities'] = {
+                kind: names[kind].get(item[kind], item[kind])
+                for kind in ('subject', 'teacher', 'room', 'class_group') if kind in item
+            }
+            conflicting.append(item)
+
+        explanation_time = time_module.monotonic() - start
+        logger.info(f"Infeasibility core: {len(conflicting)} constraints "
+                    f"({'minimal' if is_complete and position >= len(core) else 'not fully minimized'}) "
+                    f"in {explanation_time:.2f} seconds")
+
+        return {
+            'conflicting_constraints': conflicting,
+            'is_minimal': bool(core) and position >= len(core),
+            # False when the budget ran out before infeasibility was re-proved
+            'is_complete': is_complete,
+            'explanation_time': explanation_time,
+        }
     
     def _extract_solution(self) -> Dict:
         """
         Extract the solution from the solved model with enhanced validation
         """
+        # Extract sessions from the structured variable index in one pass;
+        # records already have the TimetableSession column layout
+        selected = self.variable_index.selected(self.solver)
+        slot_times = [
+            (day, start_time.strftime('%H:%M:%S'), end_time.strftime('%H:%M:%S'))
+            for day, start_time, end_time in self.data.time_slots
+        ]
+        extracted_sessions = []
+        for subject_id, teacher_id, room_id, class_group_id, slot in zip(
+            selected['subject'].tolist(), selected['teacher'].tolist(), selected['room'].tolist(),
+            selected['class_group'].tolist(), selected['slot'].tolist()
+        ):
+            day, start_time, end_time = slot_times[slot]
+            extracted_sessions.append({
+                'subject_id': subject_id,
+                'teacher_id': teacher_id,
+                'room_id': room_id,
+                'class_group_id': class_group_id,
+                'day_of_week': day,
+                'start_time': start_time,
+                'end_time': end_time,
+                'session_type': 'theory'  # Default, can be enhanced
+            })
+
+        return self._build_solution(extracted_sessions)
+
+    def _build_solution(self, extracted_sessions: List[Dict]) -> Dict:
+        """
+        Validate session records and compute the solution statistics
+        """
         solution = {
             'sessions': [],
             'statistics': {
@@ -888,39 +1352,6 @@ class TimetableScheduler:
             }
         }
 
-        # Extract sessions from variables
-        extracted_sessions = []
-        for var_name, var in self.variables.items():
-            if self.solver.Value(var) == 1:
-                try:
-                    # Parse variable name to extract session details
-                    parts = var_name.split('_')
-                    if len(parts) >= 7:
-                        subject_id = int(parts[1])
-                        teacher_id = int(parts[2])
-                        room_id = int(parts[3])
-                        class_group_id = int(parts[4])
-                        day = int(parts[5])
-                        time_str = parts[6]  # Now in HHMM format
-                        # Convert HHMM back to time string
-                        start_time_str = f"{time_str[:2]}:{time_str[2:]}:00"
-
-                        session = {
-                            'subject_id': subject_id,
-                            'teacher_id': teacher_id,
-                            'room_id': room_id,
-                            'class_group_id': class_group_id,
-                            'day_of_week': day,
-                            'start_time': start_time_str,
-                            'session_type': 'theory'  # Default, can be enhanced
-                        }
-
-                        extracted_sessions.append(session)
-
-                except (ValueError, IndexError) as e:
-                    logger.warning(f"Failed to parse variable {var_name}: {e}")
-                    solution['validation']['warnings'].append(f"Failed to parse variable {var_name}")
-
         # Validate extracted sessions for conflicts
         validated_sessions, conflicts = self._validate_extracted_sessions(extracted_sessions)
 
@@ -1152,7 +1583,8 @@ class TimetableScheduler:
             # Step 1: Prepare and validate data
             logger.info("Step 1: Preparing scheduling data...")
             try:
-                self.prepare_data()
+                with self.trace.span('prepare_data'):
+                    self.prepare_data()
                 logger.info(f"Data prepared successfully: {len(self.data.subjects)} subjects, "
                            f"{len(self.data.teachers)} teachers, {len(self.data.rooms)} rooms, "
                            f"{len(self.data.class_groups)} class groups")
@@ -1162,50 +1594,144 @@ class TimetableScheduler:
 
             # Step 2: Validate data consistency
             logger.info("Step 2: Validating data consistency...")
-            validation_errors = self._validate_data_consistency()
+            with self.trace.span('validation'):
+                validation_errors = self._validate_data_consistency()
             if validation_errors:
                 logger.warning(f"Data validation warnings: {'; '.join(validation_errors)}")
 
-            # Step 3: Create variables
-            logger.info("Step 3: Creating optimization variables...")
-            try:
-                self.create_variables()
-                if not self.variables:
-                    raise Exception("No variables created - check data assignments")
-                logger.info(f"Created {len(self.variables)} optimization variables")
-            except Exception as e:
-                logger.error(f"Failed to create variables: {str(e)}")
-                raise Exception(f"Variable creation failed: {str(e)}")
+            # Estimate the model size and pick an engine before building anything
+            with self.trace.span('plan'):
+                plan = self.plan_generation()
+            for warning in plan['warnings']:
+                logger.warning(f"Engine plan: {warning}")
 
-            # Step 4: Add constraints
-            logger.info("Step 4: Adding scheduling constraints...")
-            try:
-                self.add_constraints()
-                logger.info("Constraints added successfully")
-            except Exception as e:
-                logger.error(f"Failed to add constraints: {str(e)}")
-                raise Exception(f"Constraint addition failed: {str(e)}")
+            if plan['engine'] == 'decomposed':
+                logger.info("Steps 3-5: Solving branches with the decomposed engine...")
+                with self.trace.span('solve'):
+                    solution = self._solve_decomposed()
+            else:
+                # Step 3: Create variables
+                logger.info("Step 3: Creating optimization variables...")
+                try:
+                    with self.trace.span('create_variables'):
+                        self.create_variables()
+                    if not self.variables:
+                        raise Exception("No variables created - check data assignments")
+                    logger.info(f"Created {len(self.variables)} optimization variables")
+                except Exception as e:
+                    logger.error(f"Failed to create variables: {str(e)}")
+                    raise Exception(f"Variable creation failed: {str(e)}")
 
-            # Step 5: Solve the optimization problem
-            logger.info("Step 5: Solving optimization problem...")
-            solution = self.solve()
+                # Step 4: Add constraints
+                logger.info("Step 4: Adding scheduling constraints...")
+                try:
+                    with self.trace.span('add_constraints'):
+                        self.add_constraints()
+                    logger.info("Constraints added successfully")
+                except Exception as e:
+                    logger.error(f"Failed to add constraints: {str(e)}")
+                    raise Exception(f"Constraint addition failed: {str(e)}")
+
+                # Step 5: Solve the optimization problem
+                logger.info("Step 5: Solving optimization problem...")
+                with self.trace.span('solve'):
+                    solution = self.solve(time_limit=plan['solver']['time_limit'],
+                                          num_workers=plan['solver']['num_workers'])
 
             if not solution:
                 logger.error("No solution found by the optimizer")
+                self._record_generation_run(GenerationRun.Status.FAILED, generated_by_user,
+                                            error="No solution found by the optimizer")
                 return None
 
             # Step 6: Handle different solution types
+            if solution.get('status') == 'validation_failed':
+                errors = solution['validation_result']['errors']
+                logger.error(f"Pre-solve analysis proved the instance infeasible: {'; '.join(errors)}")
+                self._record_generation_run(GenerationRun.Status.INFEASIBLE, generated_by_user,
+                                            details=solution['validation_result'])
+                return None
+
             if solution.get('status') == 'infeasible':
                 logger.error("Problem is infeasible with current constraints")
+                logger.info("Conflicting constraints:")
+                for item in solution['constraint_analysis'].get('conflicting_constraints', []):
+                    logger.info(f"  - {item['constraint']} {item['entities']}")
                 logger.info("Suggestions for fixing infeasibility:")
                 for suggestion in solution.get('suggestions', []):
                     logger.info(f"  - {suggestion}")
+                self._record_generation_run(GenerationRun.Status.INFEASIBLE, generated_by_user,
+                                            details=solution['constraint_analysis'])
                 return None
 
-            # Step 7: Create timetable instance
+            # Step 7: Create timetable instance and sessions
             logger.info("Step 6: Creating timetable instance...")
             generation_time = datetime.now() - generation_start_time
+            timetable, sessions_created, sessions_failed = self._save_solution(
+                name, generated_by_user, solution, generation_time, validation_errors
+            )
+
+            # Step 9: Final validation
+            logger.info("Step 8: Performing final validation...")
+            with self.trace.span('final_validation'):
+                final_conflicts = self._validate_final_timetable(timetable)
+
+            if final_conflicts:
+                logger.warning(f"Final timetable has {len(final_conflicts)} conflicts")
+                timetable.conflicts_resolved = len(final_conflicts)
+
+            timetable.generation_parameters['trace'] = self.trace.as_dict()
+            timetable.generation_parameters['plan'] = plan
+            timetable.save()
+            self._record_generation_run(GenerationRun.Status.SUCCESS, generated_by_user, timetable=timetable)
+
+            # Log generation summary
+            logger.info(f"Timetable generation completed successfully!")
+            logger.info(f"  - Name: {timetable.name}")
+            logger.info(f"  - Sessions created: {sessions_created}")
+            logger.info(f"  - Sessions failed: {sessions_failed}")
+            logger.info(f"  - Final conflicts: {len(final_conflicts) if final_conflicts else 0}")
+            logger.info(f"  - Optimization score: {timetable.optimization_score:.2f}")
+            logger.info(f"  - Total generation time: {generation_time.total_seconds():.2f} seconds")
+
+            return timetable
+
+        except Exception as e:
+            logger.error(f"Critical error in timetable generation: {str(e)}")
+            logger.error(f"Generation failed after {(datetime.now() - generation_start_time).total_seconds():.2f} seconds")
+            self._record_generation_run(GenerationRun.Status.FAILED, generated_by_user, error=str(e))
+            return None
 
+    def _record_generation_run(self, status: str, generated_by_user, timetable: Optional[Timetable] = None,
+                               error: str = '', details: Optional[Dict] = None) -> Optional[GenerationRun]:
+        """
+        Store the generation trace; failures here must never break generation
+        """
+        self.trace.stop()
+        trace = self.trace.as_dict()
+        try:
+            return GenerationRun.objects.create(
+                institution=self.institution,
+                timetable=timetable,
+                started_by=generated_by_user if getattr(generated_by_user, 'pk', None) else None,
+                status=status,
+                parameters=self.parameters,
+                total_time=timedelta(seconds=trace['summary']['wall_time']),
+                summary=trace['summary'],
+                spans=trace['spans'],
+                error=error,
+                details=dict(details or {}, plan=self.plan) if self.plan else details or {},
+            )
+        except Exception as e:
+            logger.warning(f"Failed to record generation run: {str(e)}")
+            return None
+
+    def _save_solution(self, name: str, generated_by_user, solution: Dict, generation_time: timedelta,
+                       validation_errors: List[str]) -> Tuple[Timetable, int, int]:
+        """
+        Persist a solved timetable and its sessions atomically
+        """
+        with self.trace.span('persistence'), transaction.atomic():
             try:
                 timetable = Timetable.objects.create(
                     institution=self.institution,
@@ -1221,7 +1747,8 @@ class TimetableScheduler:
                         'solver_status': solution.get('solver_status', 'unknown'),
                         'solving_time': solution.get('solving_time', 0),
                         'total_variables': len(self.variables),
-                        'validation_warnings': validation_errors
+                        'validation_warnings': validation_errors,
+                        'objective_stages': solution.get('objective_stages', [])
                     }
                 )
 
@@ -1231,83 +1758,31 @@ class TimetableScheduler:
                 logger.error(f"Failed to create timetable instance: {str(e)}")
                 raise Exception(f"Timetable creation failed: {str(e)}")
 
-            # Step 8: Create sessions with validation
+            # Create sessions with validation
             logger.info("Step 7: Creating timetable sessions...")
-            sessions_created = 0
-            sessions_failed = 0
-
+            session_fields = (
+                'subject_id', 'teacher_id', 'room_id', 'class_group_id',
+                'day_of_week', 'start_time', 'end_time', 'session_type'
+            )
+            sessions = []
             for session_data in solution['sessions']:
-                try:
-                    # Get the actual time from time slots
-                    day = session_data['day_of_week']
-                    start_time_str = session_data['start_time']
-
-                    # Find matching time slot
-                    matching_slot = None
-                    for d, start_time, end_time in self.data.time_slots:
-                        if d == day and str(start_time) == start_time_str:
-                            matching_slot = (start_time, end_time)
-                            break
-
-                    if not matching_slot:
-                        logger.warning(f"No matching time slot found for {day}, {start_time_str}")
-                        sessions_failed += 1
-                        continue
-
-                    # Validate session data
-                    if not self._validate_session_data(session_data):
-                        logger.warning(f"Invalid session data: {session_data}")
-                        sessions_failed += 1
-                        continue
-
-                    # Create session
-                    session = TimetableSession.objects.create(
-                        timetable=timetable,
-                        subject_id=session_data['subject_id'],
-                        teacher_id=session_data['teacher_id'],
-                        room_id=session_data['room_id'],
-                        class_group_id=session_data['class_group_id'],
-                        day_of_week=session_data['day_of_week'],
-                        start_time=matching_slot[0],
-                        end_time=matching_slot[1],
-                        session_type=session_data.get('session_type', 'theory')
-                    )
-
-                    sessions_created += 1
-
-                except Exception as e:
-                    logger.warning(f"Failed to create session: {str(e)}")
-                    sessions_failed += 1
+                if not self._validate_session_data(session_data):
+                    logger.warning(f"Invalid session data: {session_data}")
                     continue
+                sessions.append(TimetableSession(
+                    timetable=timetable,
+                    **{field: session_data[field] for field in session_fields if field in session_data}
+                ))
+
+            TimetableSession.objects.bulk_create(sessions, batch_size=1000)
+            sessions_created = len(sessions)
+            sessions_failed = len(solution['sessions']) - sessions_created
 
             # Update timetable with actual session count
             timetable.total_sessions = sessions_created
             timetable.save()
 
-            # Step 9: Final validation
-            logger.info("Step 8: Performing final validation...")
-            final_conflicts = self._validate_final_timetable(timetable)
-
-            if final_conflicts:
-                logger.warning(f"Final timetable has {len(final_conflicts)} conflicts")
-                timetable.conflicts_resolved = len(final_conflicts)
-                timetable.save()
-
-            # Log generation summary
-            logger.info(f"Timetable generation completed successfully!")
-            logger.info(f"  - Name: {timetable.name}")
-            logger.info(f"  - Sessions created: {sessions_created}")
-            logger.info(f"  - Sessions failed: {sessions_failed}")
-            logger.info(f"  - Final conflicts: {len(final_conflicts) if final_conflicts else 0}")
-            logger.info(f"  - Optimization score: {timetable.optimization_score:.2f}")
-            logger.info(f"  - Total generation time: {generation_time.total_seconds():.2f} seconds")
-
-            return timetable
-
-        except Exception as e:
-            logger.error(f"Critical error in timetable generation: {str(e)}")
-            logger.error(f"Generation failed after {(datetime.now() - generation_start_time).total_seconds():.2f} seconds")
-            return None
+        return timetable, sessions_created, sessions_failed
 
     def _validate_data_consistency(self):
         """Validate data consistency before optimization"""
@@ -1340,7 +1815,8 @@ class TimetableScheduler:
 
     def _validate_session_data(self, session_data):
         """Validate individual session data"""
-        required_fields = ['subject_id', 'teacher_id', 'room_id', 'class_group_id', 'day_of_week']
+        required_fields = ['subject_id', 'teacher_id', 'room_id', 'class_group_id', 'day_of_week',
+                           'start_time', 'end_time']
 
         for field in required_fields:
             if field not in session_data or session_data[field] is None:
@@ -1387,140 +1863,58 @@ class TimetableScheduler:
 
     def generate_branch_specific_timetables(self, name: str, generated_by_user, num_variants: int = 3) -> List[Dict]:
         """
-        Generate separate timetables for each branch with multiple variants per branch
+        Generate separate timetables for each branch with multiple variants per branch.
+        Branches are solved in parallel by BranchDecomposer, which partitions the
+        teachers and rooms they share so variants never double-book across branches.
         """
         logger.info(f"Generating branch-specific timetables with {num_variants} variants each")
 
-        # Get all branches for this institution
-        branches = list(Branch.objects.filter(institution=self.institution))
-        logger.info(f"Found {len(branches)} branches: {[b.name for b in branches]}")
-
-        all_timetables = []
-
-        for branch in branches:
-            logger.info(f"Generating timetables for branch: {branch.name}")
-
-            # Create branch-specific scheduler
-            branch_scheduler = TimetableScheduler(self.institution)
-            branch_variants = branch_scheduler._generate_branch_variants(branch, name, generated_by_user, num_variants)
+        if self.data is None:
+            self.prepare_data()
 
-            # Add branch info to each variant
-            for variant in branch_variants:
-                variant['branch_id'] = branch.id
-                variant['branch_name'] = branch.name
-                all_timetables.append(variant)
+        branches = {branch.id: branch for branch in Branch.objects.filter(institution=self.institution)}
+        logger.info(f"Found {len(branches)} branches: {[b.name for b in branches.values()]}")
 
-        return all_timetables
-
-    def _prepare_branch_data(self, branch):
-        """
-        Prepare scheduling data for a specific branch
-        """
-        logger.info(f"Preparing scheduling data for branch {branch.name}")
-
-        # Get branch-specific data
-        subjects = list(Subject.objects.filter(branch=branch))
-        teachers = list(Teacher.objects.filter(department__institution=self.institution, subjects__branch=branch).distinct())
-        rooms = list(Room.objects.filter(institution=self.institution, is_active=True))
-        class_groups = list(ClassGroup.objects.filter(branch=branch))
-
-        # Generate time slots
-        time_slots = self._generate_time_slots()
-
-        # Create scheduling data
-        self.data = SchedulingData(
-            subjects=subjects,
-            teachers=teachers,
-            rooms=rooms,
-            class_groups=class_groups,
-            time_slots=time_slots,
-            constraints=self._get_default_constraints()
+        decomposer = BranchDecomposer(
+            self.data,
+            max_workers=self.parameters.get('branch_workers'),
+            time_limit=self.parameters.get('branch_time_limit', 120),
         )
+        decomposer.partition()
 
-        logger.info(f"Branch {branch.name} data: {len(subjects)} subjects, {len(teachers)} teachers, {len(rooms)} rooms, {len(class_groups)} classes, {len(time_slots)} time slots")
-
-    def _generate_branch_variants(self, branch, name: str, generated_by_user, num_variants: int = 3) -> List[Dict]:
-        """
-        Generate multiple variants for a specific branch
-        """
-        logger.info(f"Generating {num_variants} variants for branch {branch.name}")
-        variants = []
-
-        # Prepare branch-specific data
-        self._prepare_branch_data(branch)
-
-        # Skip if no data for this branch
-        if not self.data.subjects or not self.data.class_groups:
-            logger.warning(f"No subjects or classes found for branch {branch.name}, skipping")
-            return variants
-
+        all_timetables = []
         for variant_idx in range(num_variants):
-            logger.info(f"Generating variant {variant_idx + 1}/{num_variants} for branch {branch.name}")
-
-            # Create new model and solver for each variant
-            self.model = cp_model.CpModel()
-            self.solver = cp_model.CpSolver()
-            self.variables = {}
-
-            # Configure solver with different parameters for each variant
-            self.solver.parameters.max_time_in_seconds = 120
-            self.solver.parameters.num_search_workers = 4
-
-            # Use different strategies for each variant
-            if variant_idx == 0:
-                self.solver.parameters.random_seed = 12345 + hash(branch.name) % 1000
-                self.solver.parameters.search_branching = cp_model.AUTOMATIC_SEARCH
-                self.solver.parameters.cp_model_presolve = True
-            elif variant_idx == 1:
-                self.solver.parameters.random_seed = 67890 + hash(branch.name) % 1000
-                self.solver.parameters.search_branching = cp_model.FIXED_SEARCH
-                self.solver.parameters.cp_model_presolve = False
-            else:
-                self.solver.parameters.random_seed = variant_idx * 1337 + hash(branch.name) % 1000
-                self.solver.parameters.search_branching = cp_model.PORTFOLIO_SEARCH
-                self.solver.parameters.cp_model_presolve = True
-
-            # Create variables and constraints
-            self.create_variables()
-            self.add_constraints()
-
-            # Add variant-specific objectives
-            self._add_variant_specific_objectives(variant_idx)
-
-            # Solve
-            status = self.solver.Solve(self.model)
-
-            if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-                # Extract solution
-                solution_data = self._extract_solution()
-
-                # Calculate metrics
-                metrics = self._calculate_variant_metrics(solution_data.get('sessions', []))
-
-                variants.append({
+            logger.info(f"Generating coordinated variant {variant_idx + 1}/{num_variants}")
+            decomposer.seed = 12345 + variant_idx * 1337
+            result = decomposer.run()
+
+            for branch_result in result['branches']:
+                branch_id = branch_result['branch_id']
+                sessions = result['branch_sessions'][branch_id]
+                solved = branch_result['status'] in ('optimal', 'feasible')
+                if not solved:
+                    logger.warning(f"Branch {branch_id} variant {variant_idx + 1} generation failed "
+                                   f"with status: {branch_result['status']}")
+                all_timetables.append({
                     'variant_id': variant_idx + 1,
-                    'status': 'feasible' if status == cp_model.FEASIBLE else 'optimal',
-                    'solution': solution_data,
-                    'metrics': metrics,
+                    'status': branch_result['status'] if solved else 'failed',
+                    'solution': {'sessions': sessions},
+                    'metrics': self._calculate_variant_metrics(sessions) if solved else None,
                     'solver_stats': {
-                        'solve_time': self.solver.WallTime(),
-                        'objective_value': self.solver.ObjectiveValue() if self.solver.ObjectiveValue() else 0,
-                        'num_conflicts': self.solver.NumConflicts(),
-                        'num_branches': self.solver.NumBranches()
-                    }
-                })
-
-                logger.info(f"Branch {branch.name} variant {variant_idx + 1} generated successfully")
-            else:
-                logger.warning(f"Branch {branch.name} variant {variant_idx + 1} generation failed with status: {status}")
-                variants.append({
-                    'variant_id': variant_idx + 1,
-                    'status': 'failed',
-                    'solution': {'sessions': []},
-                    'metrics': None
+                        'solve_time': branch_result['time'],
+                        'num_variables': branch_result['variables'],
+                        'repaired': branch_result['repaired'],
+                    },
+                    'coordination': {
+                        'status': result['status'],
+                        'shared_resources': result['shared_resources'],
+                        'conflicts': len(result['conflicts']),
+                    },
+                    'branch_id': branch_id,
+                    'branch_name': branches[branch_id].name if branch_id in branches else str(branch_id),
                 })
 
-        return variants
+        return all_timetables
 
     def generate_multiple_variants_working(self, name: str, generated_by_user, num_variants: int = 3) -> List[Dict]:
         """
@@ -1640,119 +2034,110 @@ class TimetableScheduler:
 
     def generate_multiple_variants(self, name: str, generated_by_user, num_variants: int = 3) -> List[Dict]:
         """
-        Generate multiple timetable variants with different optimization seeds (original method)
+        Generate multiple timetable variants (see generate_solution_pool)
         """
         logger.info(f"Generating {num_variants} timetable variants")
-        variants = []
-
-        # Prepare data once
         self.prepare_data()
+        return self.generate_solution_pool(num_variants)
 
-        for variant_idx in range(num_variants):
-            logger.info(f"Generating variant {variant_idx + 1}/{num_variants}")
-
-            # Create new model and solver for each variant
-            self.model = cp_model.CpModel()
-            self.solver = cp_model.CpSolver()
-            self.variables = {}
-
-            # Configure solver with different parameters for each variant
-            self.solver.parameters.max_time_in_seconds = 120  # 2 minutes per variant
-            self.solver.parameters.num_search_workers = 4
-
-            # Use different strategies for each variant to ensure diversity
-            if variant_idx == 0:
-                # Variant 1: Focus on room utilization
-                self.solver.parameters.random_seed = 12345
-                self.solver.parameters.search_branching = cp_model.AUTOMATIC_SEARCH
-                self.solver.parameters.cp_model_presolve = True
-            elif variant_idx == 1:
-                # Variant 2: Focus on teacher load balance
-                self.solver.parameters.random_seed = 67890
-                self.solver.parameters.search_branching = cp_model.FIXED_SEARCH
-                self.solver.parameters.cp_model_presolve = False
-            else:
-                # Variant 3+: Random exploration
-                self.solver.parameters.random_seed = variant_idx * 1337 + 9999
-                self.solver.parameters.search_branching = cp_model.PORTFOLIO_SEARCH
-                self.solver.parameters.cp_model_presolve = True
-
-            # Create variables and constraints
-            self.create_variables()
-            self.add_constraints()
-
-            # Add variant-specific objectives
-            self._add_variant_specific_objectives(variant_idx)
-
-            # Solve
-            status = self.solver.Solve(self.model)
-
-            if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-                # Extract solution
-                solution_data = self._extract_solution()
-
-                # Calculate metrics
-                metrics = self._calculate_variant_metrics(solution_data.get('sessions', []))
-
-                variants.append({
-                    'variant_id': variant_idx + 1,
-                    'status': 'feasible' if status == cp_model.FEASIBLE else 'optimal',
-                    'solution': solution_data,
-                    'metrics': metrics,
-                    'solver_stats': {
-                        'solve_time': self.solver.WallTime(),
-                        'objective_value': self.solver.ObjectiveValue() if self.solver.ObjectiveValue() else 0,
-                        'num_conflicts': self.solver.NumConflicts(),
-                        'num_branches': self.solver.NumBranches()
-                    }
-                })
-
-                logger.info(f"Variant {variant_idx + 1} generated successfully")
-            else:
-                logger.warning(f"Variant {variant_idx + 1} failed: {self.solver.StatusName(status)}")
-                variants.append({
-                    'variant_id': variant_idx + 1,
-                    'status': 'failed',
-                    'error': self.solver.StatusName(status),
-                    'solution': None,
-                    'metrics': None
-                })
-
-        return variants
-
-    def _add_variant_specific_objectives(self, variant_idx: int):
+    def generate_solution_pool(self, num_variants: int = 3, min_changed: Optional[float] = None,
+                               variant_time_limit: Optional[float] = None) -> List[Dict]:
         """
-        Add different optimization objectives for each variant to ensure diversity
+        Generate measurably different variants from a single model.
+
+        The first variant is a regular solve. Every following one is hinted
+        with the previous solution and must move at least ``min_changed`` (a
+        fraction) of the sessions of every variant found so far, solved under
+        a short ``variant_time_limit``. Each variant reports a diversity
+        score: the smallest share of its sessions that differs from any
+        other variant in the pool.
         """
-        objective_terms = []
-
-        if variant_idx == 0:
-            # Variant 1: Prioritize room utilization and minimize gaps
-            logger.info("Adding room utilization focused objectives")
-            room_weights = {1: 3, 2: 2, 3: 2, 4: 1, 5: 1, 6: 1}  # Prefer certain rooms
-        elif variant_idx == 1:
-            # Variant 2: Prioritize teacher load balance
-            logger.info("Adding teacher load balance focused objectives")
-            room_weights = {1: 1, 2: 3, 3: 2, 4: 2, 5: 1, 6: 1}  # Different room preferences
-        else:
-            # Variant 3+: Balanced approach with randomization
-            logger.info("Adding balanced objectives with randomization")
-            import random
-            random.seed(variant_idx * 777)
-            room_weights = {i: random.randint(1, 3) for i in range(1, 7)}
-
-        # Apply room preference weights
-        for var_name, var in self.variables.items():
-            if 'session_' in var_name:
-                parts = var_name.split('_')
-                if len(parts) >= 4:
-                    room_id = int(parts[3])
-                    weight = room_weights.get(room_id, 1)
-                    objective_terms.append(var * weight)
-
-        if objective_terms:
-            self.model.Maximize(sum(objective_terms))
-            logger.info(f"Added {len(objective_terms)} variant-specific objective terms")
+        if self.data is None:
+            self.prepare_data()
+        min_changed = min_changed if min_changed is not None else self.parameters.get(
+            'pool_min_changed', POOL_MIN_CHANGED)
+        variant_time_limit = variant_time_limit or self.parameters.get('pool_variant_time_limit')
+
+        plan = self.plan_generation()
+        if plan['engine'] == 'decomposed':
+            # The pool constrains one model; the pre-pass keeps it as small as possible
+            logger.info("Solution pool needs a single model; using the teacher pre-pass engine")
+            self.data.constraints['teacher_assignment_prepass'] = True
+
+        self.create_variables()
+        self.add_constraints()
+
+        start = time_module.perf_counter()
+        first = self.solve(time_limit=plan['solver']['time_limit'], num_workers=plan['solver']['num_workers'])
+        first_time = time_module.perf_counter() - start
+        if not first or first.get('solver_status') not in ('optimal', 'feasible'):
+            status = (first.get('solver_status') or first.get('status')) if first else 'failed'
+            logger.warning(f"Solution pool: first solve failed ({status})")
+            return [{'variant_id': 1, 'status': 'failed', 'error': status, 'solution': None, 'metrics': None}]
+
+        pool = [(first, first['solver_status'], first_time)]
+        variables = self.variable_index.variables
+        values = self.variable_index.values(self.solver)
+
+        # Later variants only need to escape the previous ones from a good hint,
+        # not to prove optimality: skip the expensive presolve/LP machinery
+        variant_time_limit = variant_time_limit or max(5.0, first_time * 0.25)
+        self.solver.parameters.max_time_in_seconds = variant_time_limit
+        self.solver.parameters.cp_model_probing_level = 0
+        self.solver.parameters.symmetry_level = 0
+        self.solver.parameters.linearization_level = 0
+        self.solver.parameters.search_branching = cp_model.AUTOMATIC_SEARCH
+
+        for variant_id in range(2, num_variants + 1):
+            # Keeping at most (1 - min_changed) of the previous placements is the
+            # same as a minimum Hamming distance when the session count is fixed
+            placed = [variables[i] for i in np.flatnonzero(values == 1)]
+            required = max(1, math.ceil(min_changed * len(placed)))
+            self.model.Add(sum(placed) <= len(placed) - required)
+
+            self.model.ClearHints()
+            for var, value in zip(variables, values.tolist()):
+                self.model.AddHint(var, value)
+
+            start = time_module.perf_counter()
+            status = self.solver.Solve(self.model)
+            elapsed = time_module.perf_counter() - start
+            if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                logger.warning(f"Solution pool: no variant at distance {required} after {elapsed:.2f}s "
+                               f"({self.solver.StatusName(status)}); stopping at {len(pool)} variants")
+                break
+
+            solution = self._extract_solution()
+            pool.append((solution, 'optimal' if status == cp_model.OPTIMAL else 'feasible', elapsed))
+            values = self.variable_index.values(self.solver)
+
+        placements = [
+            {(s['subject_id'], s['teacher_id'], s['room_id'], s['class_group_id'], s['day_of_week'], s['start_time'])
+             for s in solution['sessions']}
+            for solution, _, _ in pool
+        ]
+        variants = []
+        for index, (solution, status, elapsed) in enumerate(pool):
+            distances = [
+                len(placements[index] - other) for other_index, other in enumerate(placements) if other_index != index
+            ]
+            changed = min(distances) if distances else 0
+            variants.append({
+                'variant_id': index + 1,
+                'status': status,
+                'solution': solution,
+                'metrics': self._calculate_variant_metrics(solution['sessions']),
+                'diversity': {
+                    'score': round(changed / len(placements[index]), 3) if placements[index] else 0.0,
+                    'min_changed_sessions': changed,
+                },
+                'solver_stats': {'solve_time': elapsed},
+            })
+
+        logger.info(f"Solution pool: {len(variants)} variants in "
+                    f"{sum(elapsed for _, _, elapsed in pool):.2f}s, diversity "
+                    f"{[variant['diversity']['score'] for variant in variants]}")
+        return variants
 
     def _calculate_variant_metrics(self, solution_data: List[Dict]) -> Dict:
         """
@@ -0,0 +1,313 @@
+"""
+What-if scenario evaluation: perturb the prepared scheduling data of an
+institution and compare feasibility and quality against the base timetable
+"""
+
+import copy
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from typing import Dict, List, Optional, Set, Tuple
+
+from .decomposition import SOLVED, init_worker
+from .feasibility import FeasibilityAnalyzer
+from .instance_io import InstanceRoom, InstanceTeacher
+
+logger = logging.getLogger(__name__)
+
+DAY_NUMBERS = {'Mon': 0, 'Tue': 1, 'Wed': 2, 'Thu': 3, 'Fri': 4, 'Sat': 5, 'Sun': 6}
+BOUND_KEYS = ('required_hours', 'max_teacher_assignable_hours', 'max_room_assignable_hours',
+              'max_class_schedulable_hours')
+
+
+def _day(spec: Dict) -> int:
+    day = spec.get('day')
+    if isinstance(day, str):
+        day = DAY_NUMBERS.get(day[:3].title())
+    if not isinstance(day, int) or not 0 <= day <= 6:
+        raise ValueError(f"Invalid day {spec.get('day')!r}; use 0-6 or Mon-Sun")
+    return day
+
+
+def _new_ids(existing, count: int) -> List[int]:
+    # Negative ids never collide with database rows
+    start = min([0] + [item.id for item in existing]) - 1
+    return [start - offset for offset in range(count)]
+
+
+def _remove_room(data, spec: Dict):
+    room_ids = set(spec.get('room_ids') or [spec.get('room_id')])
+    rooms = [room for room in data.rooms if room.id not in room_ids]
+    if len(rooms) == len(data.rooms):
+        raise ValueError(f"remove_room: no room with id {sorted(room_ids, key=str)}")
+    return replace(data, rooms=rooms)
+
+
+def _add_rooms(data, spec: Dict):
+    if not spec.get('capacity'):
+        raise ValueError("add_rooms requires 'capacity'")
+    count = int(spec.get('count', 1))
+    rooms = [
+        InstanceRoom(id=room_id, code=f"NEW{-room_id}", capacity=int(spec['capacity']),
+                     is_lab=bool(spec.get('is_lab', False)))
+        for room_id in _new_ids(data.rooms, count)
+    ]
+    return replace(data, rooms=data.rooms + rooms)
+
+
+def _remove_teacher(data, spec: Dict):
+    teacher_ids = set(spec.get('teacher_ids') or [spec.get('teacher_id')])
+    teachers = [teacher for teacher in data.teachers if teacher.id not in teacher_ids]
+    if len(teachers) == len(data.teachers):
+        raise ValueError(f"remove_teacher: no teacher with id {sorted(teacher_ids, key=str)}")
+    subject_teachers = {
+        subject_id: [tid for tid in tids if tid not in teacher_ids]
+        for subject_id, tids in data.subject_teachers.items()
+    }
+    return replace(data, teachers=teachers, subject_teachers=subject_teachers)
+
+
+def _add_teachers(data, spec: Dict):
+    subject_ids = spec.get('subject_ids') or []
+    known = {subject.id for subject in data.subjects}
+    if not subject_ids or not set(subject_ids) <= known:
+        raise ValueError("add_teachers requires 'subject_ids' of existing subjects")
+    count = int(spec.get('count', 1))
+    max_week = int(spec.get('max_hours_per_week', data.institution.max_teacher_hours_per_week))
+    teachers = [
+        InstanceTeacher(id=teacher_id, employee_id=f"NEW{-teacher_id}", department_id=spec.get('branch_id'),
+                        max_hours_per_day=int(spec.get('max_hours_per_day', 6)), max_hours_per_week=max_week,
+                        max_consecutive_hours=int(spec.get('max_consecutive_hours', 3)))
+        for teacher_id in _new_ids(data.teachers, count)
+    ]
+    subject_teachers = {subject_id: list(tids) for subject_id, tids in data.subject_teachers.items()}
+    for subject_id in subject_ids:
+        subject_teachers.setdefault(subject_id, []).extend(teacher.id for teacher in teachers)
+    teacher_branches = dict(data.teacher_branches)
+    if spec.get('branch_id') is not None:
+        teacher_branches.update({teacher.id: [spec['branch_id']] for teacher in teachers})
+    return replace(data, teachers=data.teachers + teachers, subject_teachers=subject_teachers,
+                   teacher_branches=teacher_branches)
+
+
+def _remove_day(data, spec: Dict):
+    day = _day(spec)
+    return replace(data, time_slots=[slot for slot in data.time_slots if slot[0] != day])
+
+
+def _limit_day(data, spec: Dict):
+    day = _day(spec)
+    if spec.get('max_slots') is None:
+        raise ValueError("limit_day requires 'max_slots' (e.g. half of the usual slots for a half day)")
+    kept = sorted(slot for slot in data.time_slots if slot[0] == day)[:int(spec['max_slots'])]
+    return replace(data, time_slots=[slot for slot in data.time_slots if slot[0] != day or slot in kept])
+
+
+def _set_teacher_hours(data, spec: Dict):
+    teacher_id = spec.get('teacher_id')
+    teachers = []
+    for teacher in data.teachers:
+        if teacher.id == teacher_id:
+            teacher = copy.copy(teacher)
+            for key in ('max_hours_per_week', 'max_hours_per_day'):
+                if key in spec:
+                    setattr(teacher, key, int(spec[key]))
+        teachers.append(teacher)
+    if not any(teacher.id == teacher_id for teacher in data.teachers):
+        raise ValueError(f"set_teacher_hours: no teacher with id {teacher_id}")
+    return replace(data, teachers=teachers)
+
+
+PERTURBATIONS = {
+    'remove_room': _remove_room,
+    'add_rooms': _add_rooms,
+    'remove_teacher': _remove_teacher,
+    'add_teachers': _add_teachers,
+    'remove_day': _remove_day,
+    'limit_day': _limit_day,
+    'set_teacher_hours': _set_teacher_hours,
+}
+
+
+def apply_perturbations(data, perturbations: List[Dict]):
+    """
+    Return a copy of SchedulingData with the perturbations applied in order.
+    The base data is never modified.
+    """
+    for spec in perturbations:
+        handler = PERTURBATIONS.get(spec.get('type'))
+        if handler is None:
+            raise ValueError(f"Unknown perturbation type {spec.get('type')!r} "
+                             f"(expected one of: {', '.join(PERTURBATIONS)})")
+        data = handler(data, spec)
+    return data
+
+
+def _placements(sessions: List[Dict]) -> Set[Tuple]:
+    return {
+        (s['subject_id'], s['teacher_id'], s['room_id'], s['class_group_id'], s['day_of_week'], s['start_time'])
+        for s in sessions
+    }
+
+
+def evaluate_scenario(task: Dict) -> Dict:
+    """
+    Feasibility bounds first (milliseconds); only scenarios that pass them
+    get a time-capped solve, warm-started from the base timetable's sessions.
+    Runs in a worker process without database access.
+    """
+    from .ortools_scheduler import TimetableScheduler
+
+    start = time.perf_counter()
+    data = task['data']
+    analysis = FeasibilityAnalyzer(data).analyze()
+    result = {
+        'name': task['name'],
+        'feasible': analysis['is_valid'],
+        'feasibility': {
+            'errors': analysis['errors'],
+            'bounds': analysis['bounds'],
+            'bottlenecks': analysis['bottlenecks'],
+        },
+        'status': None,
+        'metrics': None,
+        'placements': None,
+    }
+    if not analysis['is_valid']:
+        result['status'] = 'infeasible'
+        result['time'] = time.perf_counter() - start
+        return result
+
+    scheduler = TimetableScheduler.__new__(TimetableScheduler)
+    scheduler._setup(data.institution, task.get('parameters'))
+    scheduler.data = data
+    scheduler.create_variables()
+    scheduler.add_constraints()
+
+    base = task.get('base_placements')
+    if base:
+        arrays = scheduler.variable_index.arrays()
+        slot_keys = [(day, start_time.strftime('%H:%M:%S')) for day, start_time, _ in data.time_slots]
+        kept = []
+        for var, subject, teacher, room, class_group, slot in zip(
+            scheduler.variable_index.variables, arrays['subject'].tolist(), arrays['teacher'].tolist(),
+            arrays['room'].tolist(), arrays['class_group'].tolist(), arrays['slot'].tolist()
+        ):
+            in_base = (subject, teacher, room, class_group) + slot_keys[slot] in base
+            scheduler.model.AddHint(var, int(in_base))
+            if in_base:
+                kept.append(var)
+        # Sessions the perturbation does not force out stay where they were
+        scheduler.add_stability_objective(kept)
+
+    solution = scheduler.solve(time_limit=task['time_limit'], num_workers=task['num_workers'])
+    status = (solution.get('solver_status') or solution.get('status')) if solution else 'failed'
+    result['status'] = status
+    result['feasible'] = status in SOLVED
+    if status in SOLVED:
+        teacher_util = [item['utilization_percentage']
+                        for item in solution['statistics']['teacher_utilization'].values()]
+        result['metrics'] = {
+            'total_sessions': solution['statistics']['total_sessions'],
+            'optimization_score': solution['statistics']['optimization_score'],
+            'avg_teacher_utilization': sum(teacher_util) / len(teacher_util) if teacher_util else 0.0,
+            **scheduler.soft_goal_values(),
+        }
+        result['placements'] = _placements(solution['sessions'])
+    elif solution and solution.get('constraint_analysis'):
+        result['feasibility']['conflicting_constraints'] = solution['constraint_analysis'].get(
+            'conflicting_constraints', [])
+    result['time'] = time.perf_counter() - start
+    return result
+
+
+class ScenarioEvaluator:
+    """
+    Evaluates what-if scenarios against one base institution.
+
+    The database is read once (the caller's prepared SchedulingData), the
+    base timetable is solved once and its sessions warm-start every scenario,
+    and scenarios run in parallel worker processes.
+    """
+
+    def __init__(self, data, time_limit: float = 20, max_workers: Optional[int] = None,
+                 solver_workers: Optional[int] = None, parameters: Optional[Dict] = None):
+        self.data = data
+        self.parameters = parameters or {}
+        self.time_limit = time_limit
+        cpus = os.cpu_count() or 1
+        self.max_workers = max(1, max_workers or cpus)
+        self.solver_workers = solver_workers or max(1, cpus // self.max_workers)
+
+    def _task(self, name: str, data, base_placements=None) -> Dict:
+        return {
+            'name': name,
+            'data': data,
+            'base_placements': base_placements,
+            'parameters': self.parameters,
+            'time_limit': self.time_limit,
+            'num_workers': self.solver_workers,
+        }
+
+    def _evaluate_all(self, tasks: List[Dict]) -> List[Dict]:
+        if self.max_workers == 1 or len(tasks) == 1:
+            return [evaluate_scenario(task) for task in tasks]
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tasks)), mp_context=context,
+                                 initializer=init_worker) as pool:
+            return list(pool.map(evaluate_scenario, tasks))
+
+    @staticmethod
+    def _deltas(base: Dict, scenario: Dict) -> Dict:
+        deltas = {
+            key: scenario['feasibility']['bounds'].get(key, 0) - base['feasibility']['bounds'].get(key, 0)
+            for key in BOUND_KEYS
+            if key in scenario['feasibility']['bounds'] or key in base['feasibility']['bounds']
+        }
+        if base['metrics'] and scenario['metrics']:
+            for key, value in scenario['metrics'].items():
+                deltas[key] = value - base['metrics'][key]
+            deltas['moved_sessions'] = len(base['placements'] - scenario['placements'])
+        return deltas
+
+    def run(self, scenarios: List[Dict]) -> Dict:
+        """
+        ``scenarios`` is a list of {'name': ..., 'perturbations': [...]}.
+        Invalid perturbations raise ValueError before anything is solved.
+        """
+        start = time.perf_counter()
+        scenario_data = [
+            (scenario.get('name') or f"Scenario {index + 1}",
+             scenario.get('perturbations', []),
+             apply_perturbations(self.data, scenario.get('perturbations', [])))
+            for index, scenario in enumerate(scenarios)
+        ]
+
+        base = evaluate_scenario(self._task('base', self.data))
+        results = self._evaluate_all([
+            self._task(name, data, base['placements']) for name, _, data in scenario_data
+        ])
+
+        evaluated = []
+        for (name, perturbations, _), result in zip(scenario_data, results):
+            result['perturbations'] = perturbations
+            result['deltas'] = self._deltas(base, result)
+            evaluated.append(result)
+        for result in [base] + evaluated:
+            result.pop('placements', None)
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Evaluated {len(evaluated)} scenarios in {elapsed:.2f}s "
+                    f"({sum(1 for r in evaluated if r['feasible'])} feasible)")
+        return {
+            'base': base,
+            'scenarios': evaluated,
+            'statistics': {
+                'total_time': elapsed,
+                'workers': self.max_workers,
+                'time_limit': self.time_limit,
+            },
+        }
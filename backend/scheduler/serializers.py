@@ -10,6 +10,10 @@ class GenerateTimetableSerializer(serializers.Serializer):
     name = serializers.CharField(max_length=200)
     semester = serializers.IntegerField(default=1)
     parameters = serializers.JSONField(required=False, default=dict)
+    run_async = serializers.BooleanField(
+        required=False, default=False, help_text='Queue the generation for run_generation_worker'
+    )
+    priority = serializers.IntegerField(required=False, default=5, min_value=1, max_value=10)
     
     def validate_name(self, value):
         if len(value.strip()) < 3:
@@ -17,6 +21,63 @@ class GenerateTimetableSerializer(serializers.Serializer):
         return value.strip()
 
 
+class EstimateTimetableSerializer(serializers.Serializer):
+    """
+    Serializer for model size estimation requests
+    """
+    institution_id = serializers.IntegerField()
+    parameters = serializers.JSONField(required=False, default=dict)
+
+
+class ScenarioSerializer(serializers.Serializer):
+    """
+    One what-if scenario: a name and the perturbations applied to the base data
+    """
+    name = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    perturbations = serializers.ListField(child=serializers.DictField(), min_length=1)
+
+    def validate_perturbations(self, value):
+        from .scenarios import PERTURBATIONS
+
+        for perturbation in value:
+            if perturbation.get('type') not in PERTURBATIONS:
+                raise serializers.ValidationError(
+                    f"Unknown perturbation type {perturbation.get('type')!r}; "
+                    f"expected one of: {', '.join(PERTURBATIONS)}"
+                )
+        return value
+
+
+class ScenarioEvaluationSerializer(serializers.Serializer):
+    """
+    Serializer for what-if scenario evaluation requests
+    """
+    institution_id = serializers.IntegerField()
+    scenarios = ScenarioSerializer(many=True, allow_empty=False)
+    time_limit = serializers.FloatField(required=False, default=20, min_value=1, max_value=300)
+    parameters = serializers.JSONField(required=False, default=dict)
+
+    def validate_scenarios(self, value):
+        if len(value) > 20:
+            raise serializers.ValidationError("At most 20 scenarios can be evaluated per request")
+        return value
+
+
+class CapacityPlanSerializer(serializers.Serializer):
+    """
+    Serializer for minimum-room capacity planning requests
+    """
+    institution_id = serializers.IntegerField()
+    capacity_bands = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, allow_empty=False
+    )
+    strength_growth = serializers.FloatField(required=False, default=1.0, min_value=0.1, max_value=5)
+    search = serializers.ChoiceField(choices=['minimize', 'probes'], required=False, default='minimize')
+    max_extra_rooms = serializers.IntegerField(required=False, default=3, min_value=0, max_value=20)
+    time_limit = serializers.FloatField(required=False, default=60, min_value=1, max_value=600)
+    parameters = serializers.JSONField(required=False, default=dict)
+
+
 class TimetableConstraintSerializer(serializers.ModelSerializer):
     """
     Serializer for timetable constraints
@@ -0,0 +1,243 @@
+"""
+Parameterized synthetic scheduling instances for benchmarking
+"""
+
+import random
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, asdict
+from datetime import datetime, time, timedelta
+from typing import Dict, Tuple
+
+from .instance_io import DAY_NAMES, FORMAT_NAME, FORMAT_VERSION
+
+
+@dataclass
+class SyntheticConfig:
+    """Shape of a generated instance"""
+    branches: int = 1
+    class_groups_per_branch: int = 2
+    subjects_per_class: int = 4
+    teachers_per_branch: int = 3
+    teachers_per_subject: int = 2
+    rooms: int = 4
+    lab_ratio: float = 0.25
+    hours_per_subject: int = 3
+    class_strength: int = 60
+    days: int = 5
+    slots_per_day: int = 6
+    slot_duration: int = 60
+    seed: int = 42
+
+
+# Scaling ladder used by the benchmark_scheduler command, smallest first
+SCALING_LADDER = {
+    'tiny': SyntheticConfig(),
+    'small': SyntheticConfig(branches=2, class_groups_per_branch=3, subjects_per_class=5,
+                             teachers_per_branch=4, rooms=6, slots_per_day=7),
+    'medium': SyntheticConfig(branches=3, class_groups_per_branch=4, subjects_per_class=6,
+                              teachers_per_branch=6, rooms=10, days=6, slots_per_day=7),
+    'large': SyntheticConfig(branches=4, class_groups_per_branch=6, subjects_per_class=8,
+                             teachers_per_branch=10, rooms=16, days=6, slots_per_day=8),
+}
+
+
+def _slot_grid(config: SyntheticConfig) -> Tuple[time, time, time, time, list]:
+    """
+    Day start/end, a lunch break right after the morning half, and the slots
+    _generate_time_slots() would produce for that calendar
+    """
+    day_start = datetime.combine(datetime.today(), time(9, 0))
+    duration = timedelta(minutes=config.slot_duration)
+    morning = (config.slots_per_day + 1) // 2
+    lunch_start = day_start + morning * duration
+    lunch_end = lunch_start + duration
+    day_end = lunch_end + (config.slots_per_day - morning) * duration
+
+    starts = [day_start + i * duration for i in range(morning)]
+    starts += [lunch_end + i * duration for i in range(config.slots_per_day - morning)]
+    slots = [
+        [day, start.strftime('%H:%M'), (start + duration).strftime('%H:%M')]
+        for day in range(config.days) for start in starts
+    ]
+    return day_start.time(), day_end.time(), lunch_start.time(), lunch_end.time(), slots
+
+
+def generate_instance(config: SyntheticConfig) -> Dict:
+    """
+    Build an instance document (instance_io format) that satisfies the flow
+    bounds by construction as long as teachers and slots are sized sensibly:
+    every class group of a branch takes all subjects of that branch.
+    """
+    rng = random.Random(config.seed)
+    day_start, day_end, lunch_start, lunch_end, slots = _slot_grid(config)
+
+    subjects, teachers, class_groups = [], [], []
+    subject_teachers = {}
+
+    for branch_id in range(1, config.branches + 1):
+        branch_teachers = []
+        for _ in range(config.teachers_per_branch):
+            teacher_id = len(teachers) + 1
+            teachers.append({
+                'id': teacher_id,
+                'employee_id': f"T{teacher_id}",
+                'department_id': branch_id,
+                'max_hours_per_day': 6,
+                'max_hours_per_week': 24,
+                'max_consecutive_hours': 3,
+            })
+            branch_teachers.append(teacher_id)
+
+        for index in range(config.subjects_per_class):
+            subject_id = len(subjects) + 1
+            subjects.append({
+                'id': subject_id,
+                'code': f"SUB{subject_id}",
+                'name': f"Subject {subject_id}",
+                'branch_id': branch_id,
+                'year': 1,
+                'type': 'lab' if rng.random() < config.lab_ratio else 'core',
+                'weekly_hours': config.hours_per_subject,
+                'total_hours': config.hours_per_subject,
+            })
+            eligible = min(config.teachers_per_subject, len(branch_teachers))
+            first = index % len(branch_teachers)
+            subject_teachers[str(subject_id)] = sorted(
+                branch_teachers[(first + k) % len(branch_teachers)] for k in range(eligible)
+            )
+
+        for section in range(config.class_groups_per_branch):
+            class_id = len(class_groups) + 1
+            class_groups.append({
+                'id': class_id,
+                'name': f"B{branch_id}-1{chr(ord('A') + section % 26)}",
+                'branch_id': branch_id,
+                'year': 1,
+                'strength': config.class_strength,
+            })
+
+    lab_rooms = max(1, round(config.rooms * config.lab_ratio)) if config.lab_ratio > 0 else 0
+    rooms = [{
+        'id': room_id,
+        'code': f"R{room_id}",
+        'capacity': config.class_strength + rng.choice([0, 0, 10, 20]),
+        'is_lab': room_id <= lab_rooms,
+    } for room_id in range(1, config.rooms + 1)]
+
+    return {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'anonymized': True,
+        'synthetic': asdict(config),
+        'institution': {
+            'name': 'Synthetic institution',
+            'academic_year': '2024-25',
+            'start_time': day_start.strftime('%H:%M'),
+            'end_time': day_end.strftime('%H:%M'),
+            'slot_duration': config.slot_duration,
+            'lunch_break_start': lunch_start.strftime('%H:%M'),
+            'lunch_break_end': lunch_end.strftime('%H:%M'),
+            'working_days': list(range(config.days)),
+            'max_teacher_hours_per_week': 24,
+        },
+        'time_slots': slots,
+        'constraints': None,
+        'subjects': subjects,
+        'teachers': teachers,
+        'rooms': rooms,
+        'class_groups': class_groups,
+        'subject_teachers': subject_teachers,
+    }
+
+
+def materialize_instance(document: Dict):
+    """
+    Create database rows for an instance document. Returns the institution
+    and an admin user to attribute generated timetables to. Intended to run
+    inside a transaction that the caller rolls back.
+    """
+    from django.contrib.auth import get_user_model
+    from timetable.models import (
+        Institution, Branch, Subject, Teacher, TeacherSubject, Room, ClassGroup
+    )
+
+    User = get_user_model()
+    tag = uuid.uuid4().hex[:6]
+    settings = document['institution']
+
+    institution = Institution.objects.create(
+        name=f"{settings['name']} {tag}",
+        academic_year=settings['academic_year'],
+        start_time=settings['start_time'],
+        end_time=settings['end_time'],
+        slot_duration=settings['slot_duration'],
+        lunch_break_start=settings['lunch_break_start'],
+        lunch_break_end=settings['lunch_break_end'],
+        working_days=[DAY_NAMES[day] for day in settings['working_days']],
+        max_teacher_hours_per_week=settings['max_teacher_hours_per_week'],
+    )
+    admin = User.objects.create(
+        username=f"bench-{tag}", email=f"bench-{tag}@bench.local", role='admin'
+    )
+
+    branch_ids = sorted({item['branch_id'] for item in document['class_groups'] + document['subjects']})
+    branches = {
+        branch_id: Branch.objects.create(institution=institution, name=f"Branch {branch_id}",
+                                         code=f"{tag}{branch_id}")
+        for branch_id in branch_ids
+    }
+
+    subjects = {}
+    for item in document['subjects']:
+        is_lab = item['type'] == 'lab'
+        subjects[item['id']] = Subject.objects.create(
+            branch=branches[item['branch_id']], code=item['code'], name=item['name'],
+            type=item['type'], year=item['year'], weekly_hours=item['weekly_hours'],
+            theory_hours=0 if is_lab else item['total_hours'],
+            practical_hours=item['total_hours'] if is_lab else 0,
+            tutorial_hours=0,
+        )
+
+    users = User.objects.bulk_create([
+        User(username=f"bench-{tag}-{item['id']}", email=f"bench-{tag}-{item['id']}@bench.local",
+             role='faculty')
+        for item in document['teachers']
+    ])
+    teachers = {}
+    for user, item in zip(users, document['teachers']):
+        if user.pk is None:
+            user = User.objects.get(username=user.username)
+        teachers[item['id']] = Teacher.objects.create(
+            user=user, employee_id=f"{tag}-{item['employee_id']}",
+            department=branches[item['department_id']],
+            max_hours_per_day=item['max_hours_per_day'],
+            max_hours_per_week=item['max_hours_per_week'],
+            max_consecutive_hours=item['max_consecutive_hours'],
+        )
+
+    TeacherSubject.objects.bulk_create([
+        TeacherSubject(teacher=teachers[teacher_id], subject=subjects[int(subject_id)])
+        for subject_id, teacher_ids in document['subject_teachers'].items()
+        for teacher_id in teacher_ids
+    ])
+
+    Room.objects.bulk_create([
+        Room(institution=institution, name=item['code'], code=f"{tag}-{item['code']}",
+             capacity=item['capacity'],
+             type=Room.RoomType.LABORATORY if item['is_lab'] else Room.RoomType.CLASSROOM)
+        for item in document['rooms']
+    ])
+
+    sections = defaultdict(int)
+    class_groups = []
+    for item in document['class_groups']:
+        key = (item['branch_id'], item['year'])
+        sections[key] += 1
+        class_groups.append(ClassGroup(
+            branch=branches[item['branch_id']], name=item['name'], year=item['year'],
+            section=str(sections[key]), strength=item['strength'],
+        ))
+    ClassGroup.objects.bulk_create(class_groups)
+
+    return institution, admin
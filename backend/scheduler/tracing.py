@@ -0,0 +1,132 @@
+"""
+Structured per-phase tracing for timetable generation
+"""
+
+import logging
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from django.db import connection
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+def _peak_rss_kb() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class GenerationTrace:
+    """
+    Collects nested spans with wall/CPU time, SQL query count, model growth,
+    peak RSS and (optionally) Python allocations.
+
+    ``model_getter`` returns the current CpModel so spans can report how many
+    variables and constraints they added.
+    """
+
+    def __init__(self, model_getter=None, track_allocations: bool = False):
+        self.model_getter = model_getter
+        self.track_allocations = track_allocations
+        self.spans: List[Dict] = []
+        self._stack: List[str] = []
+        self._started_tracemalloc = False
+        self._origin = time.perf_counter()
+
+    def _model_size(self):
+        model = self.model_getter() if self.model_getter else None
+        if model is None:
+            return 0, 0
+        proto = model.Proto()
+        return len(proto.variables), len(proto.constraints)
+
+    @contextmanager
+    def span(self, name: str):
+        """
+        Time a block of work; spans opened inside it become its children
+        """
+        if self.track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+        record = {
+            'name': name,
+            'parent': self._stack[-1] if self._stack else None,
+            'depth': len(self._stack),
+        }
+        queries = [0]
+
+        def count_queries(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        variables_before, constraints_before = self._model_size()
+        allocated_before = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        record['started_at'] = wall_start - self._origin
+
+        self._stack.append(name)
+        try:
+            with connection.execute_wrapper(count_queries):
+                yield record
+        finally:
+            self._stack.pop()
+            variables_after, constraints_after = self._model_size()
+            record.update({
+                'wall_time': time.perf_counter() - wall_start,
+                'cpu_time': time.process_time() - cpu_start,
+                'queries': queries[0],
+                'variables_added': variables_after - variables_before,
+                'constraints_added': constraints_after - constraints_before,
+                'allocated_kb': (
+                    (tracemalloc.get_traced_memory()[0] - allocated_before) // 1024
+                    if allocated_before is not None and tracemalloc.is_tracing() else None
+                ),
+                'peak_rss_kb': _peak_rss_kb(),
+            })
+            self.spans.append(record)
+            logger.debug(f"span {name}: {record['wall_time']:.3f}s wall, {record['cpu_time']:.3f}s cpu, "
+                         f"{record['queries']} queries, +{record['variables_added']} vars, "
+                         f"+{record['constraints_added']} constraints")
+
+    def stop(self):
+        """
+        Stop allocation tracking if this trace started it
+        """
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def timings(self) -> Dict[str, float]:
+        return {span['name']: span['wall_time'] for span in self.spans}
+
+    def summary(self) -> Dict:
+        top_level = [span for span in self.spans if span['depth'] == 0]
+        return {
+            'wall_time': sum(span['wall_time'] for span in top_level),
+            'cpu_time': sum(span['cpu_time'] for span in top_level),
+            'queries': sum(span['queries'] for span in top_level),
+            'variables': sum(span['variables_added'] for span in top_level),
+            'constraints': sum(span['constraints_added'] for span in top_level),
+            'peak_rss_kb': max((span['peak_rss_kb'] or 0 for span in self.spans), default=None),
+            'slowest_span': max(self.spans, key=lambda span: span['wall_time'])['name'] if self.spans else None,
+        }
+
+    def as_dict(self) -> Dict:
+        # Children close before their parents; report spans in start order
+        return {
+            'summary': self.summary(),
+            'spans': sorted(self.spans, key=lambda span: span['started_at']),
+        }
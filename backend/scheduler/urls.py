@@ -3,6 +3,9 @@ from . import views
 
 urlpatterns = [
     path('generate/', views.GenerateTimetableView.as_view(), name='generate-timetable'),
+    path('estimate/', views.EstimateTimetableView.as_view(), name='estimate-timetable'),
+    path('scenarios/', views.ScenarioEvaluationView.as_view(), name='evaluate-scenarios'),
+    path('capacity-plan/', views.CapacityPlanView.as_view(), name='capacity-plan'),
     path('generate-demo/', views.GenerateDemoTimetableView.as_view(), name='generate-demo-timetable'),
     path('generate-variants/', views.GenerateMultipleVariantsView.as_view(), name='generate-multiple-variants'),
     path('commit-variant/', views.CommitTimetableVariantView.as_view(), name='commit-timetable-variant'),
@@ -0,0 +1,72 @@
+"""
+Structured index of session variables for vectorized solution access
+"""
+
+from typing import Dict, List
+
+import numpy as np
+
+COLUMNS = ('subject', 'teacher', 'room', 'class_group', 'slot')
+
+
+class SessionVariableIndex:
+    """
+    Parallel arrays describing each session BoolVar: ``variables[i]`` schedules
+    ``subject[i]`` taught by ``teacher[i]`` in ``room[i]`` to ``class_group[i]``
+    at ``time_slots[slot[i]]``. Avoids recovering ids from variable names.
+    """
+
+    def __init__(self):
+        self.variables: List = []
+        self._columns: Dict[str, List[int]] = {column: [] for column in COLUMNS}
+        self._proto_indices: List[int] = []
+        self._arrays = None
+
+    def __len__(self) -> int:
+        return len(self.variables)
+
+    def add_block(self, variables: List, subject_id: int, teacher_id: int, room_id: int,
+                  class_group_id: int, slots: List[int]):
+        """
+        Register the variables of one (subject, teacher, room, class group)
+        combination, one per entry of ``slots``
+        """
+        count = len(variables)
+        self.variables.extend(variables)
+        self._proto_indices.extend(var.Index() for var in variables)
+        self._columns['subject'].extend([subject_id] * count)
+        self._columns['teacher'].extend([teacher_id] * count)
+        self._columns['room'].extend([room_id] * count)
+        self._columns['class_group'].extend([class_group_id] * count)
+        self._columns['slot'].extend(slots)
+        self._arrays = None
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Column arrays, built once after variable creation
+        """
+        if self._arrays is None:
+            self._arrays = {
+                column: np.asarray(values, dtype=np.int64) for column, values in self._columns.items()
+            }
+            self._arrays['proto_index'] = np.asarray(self._proto_indices, dtype=np.int64)
+        return self._arrays
+
+    def values(self, solver) -> np.ndarray:
+        """
+        Solution value of every indexed variable, aligned with ``variables``,
+        read from the solver response in a single pass
+        """
+        solution = solver.ResponseProto().solution
+        if not len(solution) or not len(self.variables):
+            return np.zeros(len(self.variables), dtype=np.int64)
+        values = np.fromiter(solution, dtype=np.int64, count=len(solution))
+        return values[self.arrays()['proto_index']]
+
+    def selected(self, solver) -> Dict[str, np.ndarray]:
+        """
+        Columns of the variables set to 1 in the solver's current solution
+        """
+        arrays = self.arrays()
+        mask = self.values(solver) == 1
+        return {column: arrays[column][mask] for column in COLUMNS}
@@ -1,12 +1,26 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError
 from users.permissions import IsAdminUser
-from timetable.models import Institution, Timetable, TimetableConstraint, Subject, Teacher, Room, ClassGroup, TimetableSession
+from timetable.models import GenerationJob, Institution, Timetable, TimetableConstraint, Subject, Teacher, Room, TimetableVariant
+from timetable.archive import timetable_sessions
+from timetable.variants import commit_variant, store_variants
 from .ortools_scheduler import TimetableScheduler
-from .serializers import GenerateTimetableSerializer, TimetableConstraintSerializer
+from .capacity import CapacityPlanner
+from .job_queue import GenerationInFlight, claim_when_free, run_job_inline, submit_generation, wait_for_job
+from .scenarios import ScenarioEvaluator
+from .serializers import (
+    GenerateTimetableSerializer, EstimateTimetableSerializer, ScenarioEvaluationSerializer,
+    CapacityPlanSerializer, TimetableConstraintSerializer
+)
 import logging
+import os
+import socket
+import threading
+from typing import Dict
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -42,30 +56,46 @@ class GenerateTimetableView(generics.CreateAPIView):
                 # Update the institution_id to use the created one
                 institution_id = institution.id
 
-            # Initialize scheduler
-            scheduler = TimetableScheduler(institution_id)
-
-            # Generate timetable
-            timetable = scheduler.generate_timetable(
-                name=timetable_name,
-                generated_by_user=request.user
-            )
-
-            if timetable:
-                return Response({
-                    'success': True,
-                    'message': 'Timetable generated successfully',
-                    'timetable_id': timetable.id,
-                    'total_sessions': timetable.total_sessions,
-                    'optimization_score': timetable.optimization_score
-                }, status=status.HTTP_201_CREATED)
-            else:
+            run_async = serializer.validated_data['run_async']
+            worker = f"web:{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+            try:
+                job, coalesced = submit_generation(
+                    institution_id,
+                    timetable_name,
+                    requested_by=request.user,
+                    parameters=serializer.validated_data.get('parameters', {}),
+                    priority=serializer.validated_data['priority'],
+                    run_inline_as=None if run_async else worker
+                )
+            except GenerationInFlight as e:
                 return Response({
                     'success': False,
-                    'message': 'Failed to generate timetable. No feasible solution found.',
-                    'error': 'INFEASIBLE_SOLUTION'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
+                    'message': 'Another timetable generation for this institution is in progress',
+                    'error': str(e),
+                    'job_id': e.job.id
+                }, status=status.HTTP_409_CONFLICT)
+
+            if not run_async:
+                # A job still queued (behind another generation, or coalesced
+                # into one nobody has claimed) runs here once the institution's
+                # slot is free, as no worker may be around to pick it up; a
+                # running one is shared by waiting for its result
+                wait = getattr(settings, 'SCHEDULER_COALESCE_WAIT_SECONDS', 360)
+                if job.worker == worker or (job.status == GenerationJob.Status.QUEUED and
+                                            claim_when_free(job.id, worker, wait)):
+                    return self._job_response(job.id, run_job_inline(job.id, worker), coalesced)
+                job = wait_for_job(job.id, wait) or job
+                if job.status in (GenerationJob.Status.SUCCEEDED, GenerationJob.Status.FAILED):
+                    return self._job_response(job.id, job.result or {'error': job.error}, coalesced)
+
+            return Response({
+                'success': True,
+                'message': 'Timetable generation queued',
+                'job_id': job.id,
+                'status': job.status,
+                'coalesced': coalesced
+            }, status=status.HTTP_202_ACCEPTED)
+
         except Exception as e:
             logger.error(f"Error generating timetable: {str(e)}")
             return Response({
@@ -75,6 +105,159 @@ class GenerateTimetableView(generics.CreateAPIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+    @staticmethod
+    def _job_response(job_id: int, result: Dict, coalesced: bool) -> Response:
+        if result.get('success'):
+            return Response({
+                'success': True,
+                'message': 'Timetable generated successfully',
+                'timetable_id': result['timetable_id'],
+                'total_sessions': result['total_sessions'],
+                'optimization_score': result['optimization_score'],
+                'plan': result.get('plan'),
+                'job_id': job_id,
+                'coalesced': coalesced
+            }, status=status.HTTP_201_CREATED)
+        return Response({
+            'success': False,
+            'message': 'Failed to generate timetable. No feasible solution found.',
+            'error': 'INFEASIBLE_SOLUTION',
+            'detail': result.get('error', ''),
+            'plan': result.get('plan'),
+            'job_id': job_id,
+            'coalesced': coalesced
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+
+class EstimateTimetableView(generics.GenericAPIView):
+    """
+    Predict the model size and the engine generation would use, without solving
+    """
+    serializer_class = EstimateTimetableSerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            scheduler = TimetableScheduler(
+                serializer.validated_data['institution_id'],
+                parameters=serializer.validated_data.get('parameters', {})
+            )
+            scheduler.prepare_data()
+            plan = scheduler.plan_generation()
+            return Response({'success': True, 'plan': plan})
+
+        except Institution.DoesNotExist:
+            return Response({
+                'success': False,
+                'error': 'Institution not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error estimating timetable model: {str(e)}")
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ScenarioEvaluationView(generics.GenericAPIView):
+    """
+    Evaluate what-if scenarios (removed rooms, new teachers, shortened days, ...)
+    against an institution's base timetable without saving anything
+    """
+    serializer_class = ScenarioEvaluationSerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            parameters = serializer.validated_data.get('parameters', {})
+            scheduler = TimetableScheduler(serializer.validated_data['institution_id'], parameters=parameters)
+            scheduler.prepare_data()
+            scheduler.plan_generation()
+            evaluator = ScenarioEvaluator(
+                scheduler.data,
+                time_limit=serializer.validated_data['time_limit'],
+                max_workers=parameters.get('scenario_workers'),
+                parameters=parameters
+            )
+            result = evaluator.run(serializer.validated_data['scenarios'])
+            return Response({'success': True, **result})
+
+        except Institution.DoesNotExist:
+            return Response({
+                'success': False,
+                'error': 'Institution not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error evaluating scenarios: {str(e)}")
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class CapacityPlanView(generics.GenericAPIView):
+    """
+    Minimum rooms per kind and capacity band for an institution's demand,
+    with a curve of achievable quality for a few extra rooms
+    """
+    serializer_class = CapacityPlanSerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        options = serializer.validated_data
+
+        try:
+            parameters = options.get('parameters', {})
+            scheduler = TimetableScheduler(options['institution_id'], parameters=parameters)
+            scheduler.prepare_data()
+            planner = CapacityPlanner(
+                scheduler.data,
+                capacity_bands=options.get('capacity_bands'),
+                strength_growth=options['strength_growth'],
+                search=options['search'],
+                max_extra_rooms=options['max_extra_rooms'],
+                time_limit=options['time_limit'],
+                max_workers=parameters.get('capacity_workers')
+            )
+            result = planner.run()
+            return Response({'success': result['status'] != 'infeasible', **result})
+
+        except Institution.DoesNotExist:
+            return Response({
+                'success': False,
+                'error': 'Institution not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error planning room capacity: {str(e)}")
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class GenerateDemoTimetableView(generics.CreateAPIView):
     """
     Generate a demo timetable with sample data
@@ -324,7 +507,7 @@ class ValidateTimetableView(generics.GenericAPIView):
             'constraint_violations': []
         }
         
-        sessions = timetable.sessions.all()
+        sessions = timetable_sessions(timetable)
         
         # Check for teacher conflicts
         teacher_schedule = {}
@@ -391,7 +574,7 @@ class ValidateTimetableView(generics.GenericAPIView):
             'is_valid': total_conflicts == 0,
             'total_conflicts': total_conflicts,
             'conflicts': conflicts,
-            'total_sessions': sessions.count()
+            'total_sessions': len(sessions)
         }
 
 
@@ -528,12 +711,12 @@ class GenerateMultipleVariantsView(generics.CreateAPIView):
                 )
                 institution_id = institution.id
 
-            # Initialize scheduler
-            scheduler = TimetableScheduler(institution_id)
-
             # Get parameters from request data
             parameters = request.data.get('parameters', {})
 
+            # Initialize scheduler
+            scheduler = TimetableScheduler(institution_id, parameters=parameters)
+
             # Check if branch-specific generation is requested
             generate_per_branch = parameters.get('generate_per_branch', False)
 
@@ -544,6 +727,9 @@ class GenerateMultipleVariantsView(generics.CreateAPIView):
                     generated_by_user=request.user,
                     num_variants=min(num_variants, 3)  # Limit variants per branch
                 )
+            elif parameters.get('variant_mode') == 'pool':
+                # Diverse CP-SAT variants from a single model
+                variants = scheduler.generate_solution_pool(num_variants=min(num_variants, 10))
             else:
                 # Generate multiple variants for the entire institution
                 variants = scheduler.generate_multiple_variants_working(
@@ -552,6 +738,10 @@ class GenerateMultipleVariantsView(generics.CreateAPIView):
                     num_variants=min(num_variants, 5)  # Limit to 5 variants max
                 )
 
+            # Solutions stay on the server; the response carries metrics and variant ids
+            if generate_per_branch or parameters.get('variant_mode') == 'pool':
+                variants = store_variants(institution, request.user, timetable_name, variants)
+
             # Filter successful variants
             successful_variants = [v for v in variants if v['status'] in ['optimal', 'feasible']]
 
@@ -583,130 +773,44 @@ class GenerateMultipleVariantsView(generics.CreateAPIView):
 
 class CommitTimetableVariantView(generics.CreateAPIView):
     """
-    Commit a selected timetable variant to the database
+    Commit a stored timetable variant by id. Accepts ``variant_id``, or a
+    ``variant`` that is either the id or the variant dict returned by
+    generate-variants; only its id is used.
     """
     permission_classes = [IsAuthenticated, IsAdminUser]
 
     def create(self, request, *args, **kwargs):
-        variant_data = request.data.get('variant')
-        timetable_name = request.data.get('name', 'Generated Timetable')
-        institution_id = request.data.get('institution_id')
+        variant = request.data.get('variant')
+        variant_id = request.data.get('variant_id')
+        if variant_id is None:
+            variant_id = variant.get('id') if isinstance(variant, dict) else variant
+        timetable_name = request.data.get('name')
 
-        # Debug logging
-        logger.info(f"Received variant_data type: {type(variant_data)}")
-        logger.info(f"Received variant_data: {variant_data}")
-
-        # Handle case where variant_data might be an integer (variant_id)
-        if isinstance(variant_data, int):
+        if not str(variant_id or '').isdigit():
             return Response({
                 'success': False,
-                'message': 'Invalid variant data format. Expected variant object, got variant ID.'
+                'message': 'variant_id of a generated variant is required'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        if not variant_data or not isinstance(variant_data, dict) or not variant_data.get('solution'):
+        try:
+            variant, created = commit_variant(int(variant_id), request.user, name=timetable_name)
+        except TimetableVariant.DoesNotExist:
             return Response({
                 'success': False,
-                'message': 'Variant data is required'
-            }, status=status.HTTP_400_BAD_REQUEST)
-
-        try:
-            # Get or create institution
-            try:
-                institution = Institution.objects.get(id=institution_id)
-            except Institution.DoesNotExist:
-                institution = Institution.objects.create(
-                    name="Demo Institution",
-                    type="college",
-                    address="Demo Address",
-                    phone="123-456-7890",
-                    email="demo@institution.edu"
-                )
-
-            # Create timetable with unique version
-            from django.db import IntegrityError
-            from datetime import datetime
-
-            # Get the next available version number
-            current_year = datetime.now().year
-            existing_versions = Timetable.objects.filter(
-                institution=institution,
-                academic_year=f"{current_year}-{current_year+1}",
-                semester=1
-            ).values_list('version', flat=True)
-
-            next_version = max(existing_versions, default=0) + 1
-
-            try:
-                timetable = Timetable.objects.create(
-                    name=timetable_name,
-                    institution=institution,
-                    generated_by=request.user,
-                    status='active',
-                    academic_year=f"{current_year}-{current_year+1}",
-                    semester=1,
-                    version=next_version,
-                    total_sessions=variant_data['metrics']['total_sessions'],
-                    optimization_score=variant_data['metrics']['quality_score']
-                )
-            except IntegrityError:
-                # If still fails, use timestamp as version
-                import time
-                timestamp_version = int(time.time()) % 10000
-                timetable = Timetable.objects.create(
-                    name=timetable_name,
-                    institution=institution,
-                    generated_by=request.user,
-                    status='active',
-                    academic_year=f"{current_year}-{timestamp_version}",
-                    semester=1,
-                    version=1,
-                    total_sessions=variant_data['metrics']['total_sessions'],
-                    optimization_score=variant_data['metrics']['quality_score']
-                )
-
-            # Create sessions from variant solution
-            sessions_created = 0
-            solution_sessions = variant_data['solution'].get('sessions', [])
-            for session_data in solution_sessions:
-                try:
-                    # Get related objects
-                    subject = Subject.objects.get(id=session_data['subject_id'])
-                    teacher = Teacher.objects.get(id=session_data['teacher_id'])
-                    room = Room.objects.get(id=session_data['room_id'])
-                    class_group = ClassGroup.objects.get(id=session_data['class_group_id'])
-
-                    # Calculate end time (assuming 1-hour sessions)
-                    from datetime import datetime, timedelta
-                    start_time = datetime.strptime(session_data['start_time'], '%H:%M:%S').time()
-                    start_datetime = datetime.combine(datetime.today(), start_time)
-                    end_datetime = start_datetime + timedelta(hours=1)
-                    end_time = end_datetime.time()
-
-                    # Create session
-                    TimetableSession.objects.create(
-                        timetable=timetable,
-                        subject=subject,
-                        teacher=teacher,
-                        room=room,
-                        class_group=class_group,
-                        day_of_week=session_data['day_of_week'],
-                        start_time=start_time,
-                        end_time=end_time
-                    )
-                    sessions_created += 1
-
-                except Exception as session_error:
-                    logger.warning(f"Failed to create session: {session_error}")
-                    continue
-
+                'message': f'Variant {variant_id} not found or expired'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
             return Response({
-                'success': True,
-                'message': 'Timetable variant committed successfully',
-                'timetable_id': timetable.id,
-                'sessions_created': sessions_created,
-                'metrics': variant_data['metrics']
-            }, status=status.HTTP_201_CREATED)
-
+                'success': False,
+                'message': 'Variant no longer matches the institution data',
+                'error': str(e)
+            }, status=status.HTTP_409_CONFLICT)
+        except IntegrityError as e:
+            return Response({
+                'success': False,
+                'message': 'Another timetable was committed at the same time, please retry',
+                'error': str(e)
+            }, status=status.HTTP_409_CONFLICT)
         except Exception as e:
             logger.error(f"Error committing timetable variant: {str(e)}")
             return Response({
@@ -714,3 +818,11 @@ class CommitTimetableVariantView(generics.CreateAPIView):
                 'message': 'Failed to commit timetable variant',
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response({
+            'success': True,
+            'message': 'Timetable variant committed successfully' if created else 'Timetable variant already committed',
+            'timetable_id': variant.timetable_id,
+            'sessions_created': variant.session_count if created else 0,
+            'metrics': variant.metrics
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
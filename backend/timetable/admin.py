@@ -1,8 +1,10 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
+from .conditional import bump_timetable_revision
 from .models import (
     Institution, Branch, ClassGroup, Subject, Teacher, TeacherSubject,
-    Room, Timetable, TimetableSession, TimetableConstraint
+    Room, Timetable, TimetableSession, TimetableConstraint, GenerationRun, GenerationJob, TimetableVariant,
+    TimetableArchive
 )
 
 
@@ -140,6 +142,20 @@ class TimetableSessionAdmin(admin.ModelAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        previous = form.initial.get('timetable') if change else None
+        super().save_model(request, obj, form, change)
+        bump_timetable_revision(previous, obj.timetable_id)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        bump_timetable_revision(obj.timetable_id)
+
+    def delete_queryset(self, request, queryset):
+        timetable_ids = list(queryset.values_list('timetable_id', flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        bump_timetable_revision(*timetable_ids)
+
 
 @admin.register(TimetableConstraint)
 class TimetableConstraintAdmin(admin.ModelAdmin):
@@ -155,3 +171,63 @@ class TimetableConstraintAdmin(admin.ModelAdmin):
             'fields': ('parameters', 'priority', 'is_active')
         }),
     )
+
+
+@admin.register(GenerationRun)
+class GenerationRunAdmin(admin.ModelAdmin):
+    list_display = ('institution', 'status', 'timetable', 'started_by', 'total_time', 'created_at')
+    list_filter = ('institution', 'status')
+    raw_id_fields = ('timetable', 'started_by')
+    readonly_fields = ('total_time', 'summary', 'spans', 'error', 'details', 'created_at')
+
+    fieldsets = (
+        (_('Run'), {
+            'fields': ('institution', 'timetable', 'started_by', 'status', 'parameters')
+        }),
+        (_('Trace'), {
+            'fields': ('total_time', 'summary', 'spans')
+        }),
+        (_('Outcome'), {
+            'fields': ('error', 'details', 'created_at')
+        }),
+    )
+
+
+@admin.register(GenerationJob)
+class GenerationJobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'institution', 'kind', 'status', 'priority', 'cpu_budget', 'worker', 'attempts',
+                    'created_at')
+    list_filter = ('institution', 'kind', 'status')
+    raw_id_fields = ('timetable', 'requested_by')
+    readonly_fields = ('worker', 'attempts', 'claimed_at', 'heartbeat_at', 'finished_at', 'result', 'error',
+                       'created_at', 'updated_at')
+
+    fieldsets = (
+        (_('Job'), {
+            'fields': ('institution', 'requested_by', 'kind', 'name', 'parameters', 'priority', 'cpu_budget')
+        }),
+        (_('Claim'), {
+            'fields': ('status', 'worker', 'attempts', 'max_attempts', 'claimed_at', 'heartbeat_at')
+        }),
+        (_('Outcome'), {
+            'fields': ('timetable', 'result', 'error', 'finished_at', 'created_at', 'updated_at')
+        }),
+    )
+
+
+@admin.register(TimetableVariant)
+class TimetableVariantAdmin(admin.ModelAdmin):
+    list_display = ('name', 'number', 'institution', 'branch', 'status', 'session_count', 'timetable', 'created_at')
+    list_filter = ('institution', 'status')
+    raw_id_fields = ('timetable', 'created_by')
+    readonly_fields = ('batch', 'session_count', 'metrics', 'details', 'reference_revision', 'created_at')
+    exclude = ('sessions',)
+
+
+@admin.register(TimetableArchive)
+class TimetableArchiveAdmin(admin.ModelAdmin):
+    list_display = ('timetable', 'kind', 'base', 'depth', 'session_count', 'stored_bytes', 'created_at')
+    list_filter = ('kind',)
+    raw_id_fields = ('timetable', 'base')
+    readonly_fields = ('kind', 'depth', 'session_count', 'notes', 'stored_bytes', 'created_at')
+    exclude = ('sessions', 'removed')
@@ -0,0 +1,242 @@
+"""
+Compacted storage of archived timetables.
+
+An archived timetable's sessions can be moved out of the session table
+into a TimetableArchive: the variant column format (timetable.variants)
+plus an is_fixed column, zlib-compressed. Consecutive versions of a
+semester share most of their sessions, so an archive is usually a delta
+against the closest earlier archived version: the base positions it drops
+and the sessions it adds. A full snapshot starts a new chain every
+TIMETABLE_ARCHIVE_SNAPSHOT_INTERVAL versions, or when a delta would not be
+clearly smaller.
+
+Reads rebuild the columns along the chain and cache every level, so the
+next version only applies its own delta. Read paths get unsaved
+TimetableSession objects (``timetable_sessions``); activating an archived
+timetable restores its rows.
+"""
+
+import logging
+import zlib
+from operator import attrgetter
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, QuerySet
+
+from .conditional import bump_timetable_revision
+from .models import Timetable, TimetableArchive, TimetableSession
+from .variants import COLUMNS, session_columns, session_rows
+
+logger = logging.getLogger(__name__)
+
+IS_FIXED = len(COLUMNS)
+ARCHIVE_ROWS = len(COLUMNS) + 1
+# A delta is kept only when it is at most this share of a full snapshot
+MAX_DELTA_RATIO = 0.5
+# Full snapshots are stored in this order; deltas append added sessions
+SNAPSHOT_ORDER = ('day_of_week', 'start_time', 'class_group_id')
+RELATIONS = ('subject', 'teacher', 'room', 'class_group')
+
+
+def _pack(values: np.ndarray) -> bytes:
+    return zlib.compress(np.ascontiguousarray(values, dtype='<i4').tobytes())
+
+
+def _unpack(blob: bytes, rows: int) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(bytes(blob)), dtype='<i4').reshape(rows, -1)
+
+
+def _cache_key(archive: TimetableArchive) -> str:
+    # created_at guards against a reused id (rolled-back archive on SQLite)
+    return f"timetable_archive:{archive.id}:{archive.created_at.timestamp():.6f}"
+
+
+def timetable_archive(timetable: Timetable) -> Optional[TimetableArchive]:
+    """
+    The archive holding a compacted timetable's sessions, or None when its
+    sessions are rows. Only archived timetables cost a query.
+    """
+    if timetable.status != Timetable.Status.ARCHIVED:
+        return None
+    return TimetableArchive.objects.filter(timetable_id=timetable.id).first()
+
+
+def archive_columns(archive: TimetableArchive) -> np.ndarray:
+    """
+    int32 array of shape (ARCHIVE_ROWS, sessions) in archive order, rebuilt
+    along the delta chain. Every level is cached.
+    """
+    key = _cache_key(archive)
+    columns = cache.get(key)
+    if columns is not None:
+        return columns
+
+    if archive.kind == TimetableArchive.Kind.FULL:
+        columns = _unpack(archive.sessions, ARCHIVE_ROWS)
+    else:
+        base = TimetableArchive.objects.get(id=archive.base_id)
+        removed = _unpack(archive.removed, 1)[0]
+        columns = np.concatenate(
+            [np.delete(archive_columns(base), removed, axis=1), _unpack(archive.sessions, ARCHIVE_ROWS)], axis=1
+        )
+    cache.set(key, columns, timeout=getattr(settings, 'TIMETABLE_ARCHIVE_CACHE_SECONDS', 3600))
+    return columns
+
+
+def _sessions(timetable: Timetable, archive: TimetableArchive) -> List[TimetableSession]:
+    columns = archive_columns(archive)
+    sessions = []
+    for position, (row, is_fixed) in enumerate(zip(session_rows(columns[:IS_FIXED]), columns[IS_FIXED].tolist())):
+        sessions.append(TimetableSession(
+            timetable=timetable, is_fixed=bool(is_fixed), notes=archive.notes.get(str(position)), **row
+        ))
+    return sessions
+
+
+def _sort_key(ordering: Tuple[str, ...]):
+    # Missing references sort last, as NULLs do on PostgreSQL
+    getters = [attrgetter(f"{name}_id" if name in RELATIONS else name) for name in ordering]
+    return lambda session: tuple((getter(session) is None, getter(session)) for getter in getters)
+
+
+def timetable_sessions(timetable: Timetable, ordering: Tuple[str, ...] = ('day_of_week', 'start_time')
+                       ) -> Union[QuerySet, List[TimetableSession]]:
+    """
+    Sessions of a timetable in ``ordering``: a queryset of its rows, or the
+    rebuilt (unsaved, id-less) sessions of a compacted archive
+    """
+    archive = timetable_archive(timetable)
+    if archive is None:
+        return TimetableSession.objects.filter(timetable=timetable).order_by(*ordering)
+    return sorted(_sessions(timetable, archive), key=_sort_key(ordering))
+
+
+def _row_columns(timetable_id: int) -> Tuple[np.ndarray, Dict[int, str]]:
+    rows = list(TimetableSession.objects.filter(timetable_id=timetable_id).order_by(*SNAPSHOT_ORDER).values(
+        *COLUMNS, 'is_fixed', 'notes'
+    ))
+    fixed = np.array([[row['is_fixed'] for row in rows]], dtype='<i4')
+    notes = {index: row['notes'] for index, row in enumerate(rows) if row['notes']}
+    return np.concatenate([session_columns(rows), fixed]), notes
+
+
+def _previous_archive(timetable: Timetable) -> Optional[TimetableArchive]:
+    return TimetableArchive.objects.filter(
+        timetable__institution_id=timetable.institution_id,
+        timetable__academic_year=timetable.academic_year,
+        timetable__semester=timetable.semester,
+        timetable__version__lt=timetable.version,
+    ).order_by('-timetable__version').first()
+
+
+def _delta(base: np.ndarray, columns: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Base positions to drop, positions of ``columns`` to add, and the order
+    of ``columns`` the rebuilt delta comes out in
+    """
+    from .diff import match_columns
+
+    base_matched, other_matched = match_columns(base, columns)
+    removed = np.setdiff1d(np.arange(base.shape[1]), base_matched)
+    added = np.setdiff1d(np.arange(columns.shape[1]), other_matched)
+    # Kept base sessions stay in base order, added ones follow
+    order = np.concatenate([other_matched[np.argsort(base_matched)], added]).astype(np.intp)
+    return removed, added, order
+
+
+def compact_timetable(timetable_id: int, snapshot_interval: Optional[int] = None) -> Optional[TimetableArchive]:
+    """
+    Move an archived timetable's sessions into a TimetableArchive and delete
+    its rows. Returns None when the timetable is not archived or already
+    compacted. The archive is rebuilt and compared before any row is deleted.
+    """
+    if snapshot_interval is None:
+        snapshot_interval = getattr(settings, 'TIMETABLE_ARCHIVE_SNAPSHOT_INTERVAL', 10)
+
+    with transaction.atomic():
+        timetable = Timetable.objects.select_for_update().get(id=timetable_id)
+        if timetable.status != Timetable.Status.ARCHIVED or TimetableArchive.objects.filter(
+                timetable=timetable).exists():
+            return None
+
+        columns, notes = _row_columns(timetable.id)
+        archive = TimetableArchive(
+            timetable=timetable, kind=TimetableArchive.Kind.FULL, session_count=columns.shape[1],
+            sessions=_pack(columns)
+        )
+        order = np.arange(columns.shape[1])
+
+        base = _previous_archive(timetable)
+        if base is not None and base.depth + 1 < snapshot_interval:
+            removed, added, delta_order = _delta(archive_columns(base), columns)
+            sessions, removed = _pack(columns[:, added]), _pack(removed)
+            if len(sessions) + len(removed) <= len(archive.sessions) * MAX_DELTA_RATIO:
+                archive.kind = TimetableArchive.Kind.DELTA
+                archive.base = base
+                archive.depth = base.depth + 1
+                archive.sessions, archive.removed = sessions, removed
+                order = delta_order
+
+        archive.notes = {str(position): notes[index] for position, index in enumerate(order.tolist())
+                         if index in notes}
+        archive.stored_bytes = len(archive.sessions) + len(archive.removed)
+        archive.save()
+
+        if not np.array_equal(archive_columns(archive), columns[:, order]):
+            raise ValueError(f"Archive of timetable {timetable.id} does not rebuild its sessions")
+
+        # Sessions have no dependents, so a raw delete is safe
+        deleted = TimetableSession.objects.filter(timetable=timetable)._raw_delete(TimetableSession.objects.db)
+        bump_timetable_revision(timetable.id)
+
+    logger.info(
+        f"Compacted timetable {timetable.id}: {deleted} session rows into a {archive.kind} archive "
+        f"of {archive.stored_bytes} bytes"
+    )
+    return archive
+
+
+def rebase_deltas(archive: TimetableArchive):
+    """
+    Rewrite the deltas based on ``archive`` as full snapshots, so it can be
+    deleted. Session order, and so the notes, stay the same.
+    """
+    for delta in TimetableArchive.objects.filter(base=archive):
+        delta.sessions = _pack(archive_columns(delta))
+        delta.removed = b''
+        delta.stored_bytes = len(delta.sessions)
+        delta.kind = TimetableArchive.Kind.FULL
+        delta.base = None
+        shift = delta.depth
+        delta.depth = 0
+        delta.save(update_fields=['sessions', 'removed', 'stored_bytes', 'kind', 'base', 'depth'])
+        _shift_depth(delta, shift)
+
+
+def _shift_depth(archive: TimetableArchive, shift: int):
+    children = list(TimetableArchive.objects.filter(base=archive).values_list('id', flat=True))
+    while children:
+        TimetableArchive.objects.filter(id__in=children).update(depth=F('depth') - shift)
+        children = list(TimetableArchive.objects.filter(base_id__in=children).values_list('id', flat=True))
+
+
+def restore_timetable(timetable: Timetable) -> int:
+    """
+    Recreate the session rows of a compacted timetable and drop its archive.
+    Returns the number of rows created.
+    """
+    with transaction.atomic():
+        archive = TimetableArchive.objects.select_for_update().filter(timetable_id=timetable.id).first()
+        if archive is None:
+            return 0
+        sessions = _sessions(timetable, archive)
+        TimetableSession.objects.bulk_create(sessions, batch_size=1000)
+        archive.delete()
+        bump_timetable_revision(timetable.id)
+
+    logger.info(f"Restored {len(sessions)} session rows of timetable {timetable.id}")
+    return len(sessions)
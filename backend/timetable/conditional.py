@@ -0,0 +1,119 @@
+"""
+Conditional GET (ETag / Last-Modified) for timetable read endpoints.
+
+Validators come from the Timetable rows only: version, updated_at and the
+revision counter that every session edit bumps (bump_timetable_revision),
+plus the institution's
+reference_revision (names of subjects, teachers, rooms in the payloads). A
+matching If-None-Match or If-Modified-Since is answered with 304 without
+touching the session table.
+"""
+
+from calendar import timegm
+from functools import wraps
+from typing import Callable, Optional, Tuple
+
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import Timetable
+
+State = Optional[Tuple[str, object]]
+
+
+def bump_timetable_revision(*timetable_ids):
+    """
+    Move every cached view and ETag of the timetables on. Called once per
+    session edit operation rather than from per-row signals, which would
+    also cost Django its fast path for bulk and cascade deletes.
+    """
+    Timetable.objects.filter(id__in=timetable_ids).update(revision=F('revision') + 1, updated_at=timezone.now())
+
+
+def timetable_state(timetable_id) -> State:
+    """
+    (etag, last_modified) of one timetable, or None when it does not exist
+    """
+    row = Timetable.objects.filter(id=timetable_id).values_list(
+        'version', 'revision', 'updated_at', 'institution__reference_revision', 'institution__updated_at'
+    ).first()
+    if row is None:
+        return None
+    version, revision, updated_at, reference_revision, institution_updated_at = row
+    return (f"tt-{timetable_id}-v{version}-r{revision}-ref{reference_revision}-{updated_at.timestamp():.6f}",
+            max(updated_at, institution_updated_at))
+
+
+def institution_state(institution_id) -> State:
+    """
+    (etag, last_modified) over all timetables of an institution. Creating,
+    deleting, editing or activating any of them changes it.
+    """
+    summary = Timetable.objects.filter(institution_id=institution_id).aggregate(
+        count=Count('id'), ids=Sum('id'), versions=Sum('version'), revisions=Sum('revision'),
+        last=Max('updated_at'), reference=Max('institution__reference_revision'),
+        institution_updated=Max('institution__updated_at')
+    )
+    if not summary['count']:
+        return None
+    return (f"inst-{institution_id}-n{summary['count']}-i{summary['ids']}-v{summary['versions']}"
+            f"-r{summary['revisions']}-ref{summary['reference']}-{summary['last'].timestamp():.6f}",
+            max(summary['last'], summary['institution_updated']))
+
+
+def timetable_from_request(request, *args, **kwargs) -> State:
+    """
+    Timetable from the URL (pk / timetable_id) or the timetable_id parameter
+    """
+    timetable_id = kwargs.get('pk') or kwargs.get('timetable_id') or request.GET.get('timetable_id')
+    if not timetable_id or not str(timetable_id).isdigit():
+        return None
+    return timetable_state(timetable_id)
+
+
+def analytics_from_request(request, *args, **kwargs) -> State:
+    """
+    Analytics are scoped by timetable_id, or by institution_id (active timetables)
+    """
+    if request.GET.get('timetable_id'):
+        return timetable_from_request(request)
+    institution_id = request.GET.get('institution_id')
+    if not institution_id or not institution_id.isdigit():
+        return None
+    return institution_state(institution_id)
+
+
+def conditional(state_func: Callable[..., State]):
+    """
+    View decorator: answer GET/HEAD with 304 when the client's validators
+    match ``state_func(request, *args, **kwargs)``, otherwise run the view
+    and attach ETag and Last-Modified. Put it inside DRF's api_view /
+    method_decorator so authentication runs first. Clients are told to
+    revalidate on every use.
+    """
+    def decorator(view):
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            state = state_func(request, *args, **kwargs)
+            if state is None:
+                return view(request, *args, **kwargs)
+
+            etag = quote_etag(state[0])
+            last_modified = timegm(state[1].utctimetuple())
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            if not response.has_header('ETag'):
+                response.headers['ETag'] = etag
+            if not response.has_header('Last-Modified'):
+                response.headers['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return inner
+    return decorator
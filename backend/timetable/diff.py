@@ -0,0 +1,250 @@
+"""
+Differences between two timetables, variants, or a timetable and a variant.
+
+Both sides are loaded as packed session columns (timetable.variants) and
+paired with array operations, in this order:
+
+- unchanged: every column equal
+- reassigned: same class group, subject and slot; teacher, room or type changed
+- moved: same class group and subject in a different slot
+- removed / added: sessions left over on the base / other side
+
+Repeated sessions are paired by occurrence, so a class with three lectures
+of a subject on one side and two on the other has one removed.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .archive import archive_columns, timetable_archive
+from .models import Timetable, TimetableSession, TimetableVariant
+from .reference_cache import get_reference_bundle
+from .variants import COLUMNS, session_columns, unpack_sessions
+
+DIFF_FORMAT_VERSION = 1
+SUBJECT, TEACHER, ROOM, CLASS_GROUP, DAY, START, END, SESSION_TYPE = range(len(COLUMNS))
+CHANGES = ('moved', 'reassigned', 'added', 'removed')
+MATCH_STEPS = (
+    ('unchanged', tuple(range(len(COLUMNS)))),
+    ('reassigned', (CLASS_GROUP, SUBJECT, DAY, START)),
+    ('moved', (CLASS_GROUP, SUBJECT)),
+)
+SOURCE_KINDS = ('timetable', 'variant')
+TIME_LABELS = np.array([f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(24 * 60 + 1)], dtype=object)
+
+
+def parse_source(value: Optional[str]) -> Optional[Tuple[str, int]]:
+    """
+    'timetable:12' / 'variant:5' -> (kind, id); None when malformed
+    """
+    kind, _, source_id = (value or '').partition(':')
+    if kind not in SOURCE_KINDS or not source_id.isdigit():
+        return None
+    return kind, int(source_id)
+
+
+def load_source(kind: str, source_id: int) -> Tuple[Dict, np.ndarray]:
+    """
+    Description and session columns of a timetable or stored variant.
+    Raises Timetable.DoesNotExist / TimetableVariant.DoesNotExist.
+    """
+    if kind == 'variant':
+        variant = TimetableVariant.objects.get(id=source_id)
+        return {
+            'kind': kind, 'id': variant.id, 'name': variant.name, 'number': variant.number,
+            'institution_id': variant.institution_id,
+        }, unpack_sessions(variant.sessions)
+
+    timetable = Timetable.objects.get(id=source_id)
+    archive = timetable_archive(timetable)
+    if archive is not None:
+        columns = archive_columns(archive)[:len(COLUMNS)]
+    else:
+        sessions = TimetableSession.objects.filter(timetable_id=source_id).values(*COLUMNS).iterator(chunk_size=5000)
+        columns = session_columns(sessions)
+    return {
+        'kind': kind, 'id': timetable.id, 'name': timetable.name, 'version': timetable.version,
+        'institution_id': timetable.institution_id,
+    }, columns
+
+
+def _pack(keys: np.ndarray) -> np.ndarray:
+    """
+    Key columns of shape (k, n) packed into as few int64 words as their
+    value ranges allow (usually two), keeping row equality and order
+    """
+    words, word, used = [], None, 0
+    for column in keys.astype(np.int64):
+        low = column.min()
+        bits = int(column.max() - low).bit_length()
+        if word is not None and used + bits <= 62:
+            word = (word << bits) | (column - low)
+            used += bits
+        else:
+            if word is not None:
+                words.append(word)
+            word, used = column - low, bits
+    words.append(word)
+    return np.stack(words)
+
+
+def _group(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    For key columns of shape (k, n): a code per distinct key row and, for
+    each row, how many equal rows come before it
+    """
+    words = _pack(keys)
+    order = np.argsort(words[0], kind='stable') if len(words) == 1 else np.lexsort(words[::-1])
+    sorted_words = words[:, order]
+    starts_group = np.r_[True, np.any(sorted_words[:, 1:] != sorted_words[:, :-1], axis=0)]
+    group = np.cumsum(starts_group) - 1
+    first = np.flatnonzero(starts_group)
+    codes = np.empty(len(order), dtype=np.int64)
+    occurrence = np.empty(len(order), dtype=np.int64)
+    codes[order] = group
+    occurrence[order] = np.arange(len(order)) - first[group]
+    return codes, occurrence
+
+
+def match_columns(base_keys: np.ndarray, other_keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Multiset matching of key columns: positions of the matched sessions on
+    each side. Also used to build archive deltas.
+    """
+    base_count, other_count = base_keys.shape[1], other_keys.shape[1]
+    if not base_count or not other_count:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    # The sort is stable, so base rows come first within every group
+    codes, occurrence = _group(np.concatenate([base_keys, other_keys], axis=1))
+    base_codes, other_codes = codes[:base_count], codes[base_count:]
+    other_occurrence = occurrence[base_count:] - np.bincount(base_codes, minlength=codes.max() + 1)[other_codes]
+    scale = max(base_count, other_count)
+    _, base_matched, other_matched = np.intersect1d(
+        base_codes * scale + occurrence[:base_count], other_codes * scale + other_occurrence,
+        assume_unique=True, return_indices=True
+    )
+    return base_matched, other_matched
+
+
+def pair_sessions(base: np.ndarray, other: np.ndarray) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Category -> (base positions, other positions); removed has no other
+    positions and added no base positions
+    """
+    # Slot order makes the pairing of repeated sessions deterministic
+    base_left = np.lexsort((base[START], base[DAY]))
+    other_left = np.lexsort((other[START], other[DAY]))
+    pairs = {}
+    for category, rows in MATCH_STEPS:
+        base_matched, other_matched = match_columns(base[list(rows)][:, base_left], other[list(rows)][:, other_left])
+        pairs[category] = (base_left[base_matched], other_left[other_matched])
+        base_left = np.delete(base_left, base_matched)
+        other_left = np.delete(other_left, other_matched)
+    empty = np.empty(0, dtype=np.intp)
+    pairs['removed'] = (base_left, empty)
+    pairs['added'] = (empty, other_left)
+    return pairs
+
+
+def _hhmm(minutes: np.ndarray) -> List[str]:
+    return TIME_LABELS[minutes].tolist()
+
+
+def _sessions(columns: np.ndarray, positions: np.ndarray) -> Dict[str, list]:
+    block = columns[:, positions]
+    return {
+        'subject': block[SUBJECT].tolist(),
+        'teacher': block[TEACHER].tolist(),
+        'room': block[ROOM].tolist(),
+        'class_group': block[CLASS_GROUP].tolist(),
+        'day': block[DAY].tolist(),
+        'start_time': _hhmm(block[START]),
+        'end_time': _hhmm(block[END]),
+    }
+
+
+def _impact(base: np.ndarray, other: np.ndarray, pairs: Dict, row: int, names: Dict[int, str]) -> Dict[str, list]:
+    """
+    Changed sessions per entity of one column (teacher, class group or room),
+    counting an entity once per pair even when it is on both sides
+    """
+    counted = {}
+    for category in CHANGES:
+        base_positions, other_positions = pairs[category]
+        before, after = base[row, base_positions], other[row, other_positions]
+        if category in ('moved', 'reassigned'):
+            touched = np.concatenate([before, after[after != before]])
+        else:
+            touched = before if category == 'removed' else after
+        counted[category] = np.unique(touched[touched >= 0], return_counts=True)
+
+    ids = np.unique(np.concatenate([ids for ids, _ in counted.values()]))
+    table = {category: np.zeros(len(ids), dtype=np.int64) for category in CHANGES}
+    for category, (category_ids, counts) in counted.items():
+        table[category][np.searchsorted(ids, category_ids)] = counts
+    total = sum(table.values()) if len(ids) else np.zeros(0, dtype=np.int64)
+
+    order = np.lexsort((ids, -total))
+    return {
+        'id': ids[order].tolist(),
+        'name': [names.get(entity_id, str(entity_id)) for entity_id in ids[order].tolist()],
+        **{category: table[category][order].tolist() for category in CHANGES},
+        'total': total[order].tolist(),
+    }
+
+
+def diff_columns(base: np.ndarray, other: np.ndarray, institution_id: Optional[int] = None) -> Dict:
+    """
+    Summary, changed sessions as column lists and per-entity impact.
+    Missing teachers/rooms/subjects are -1. Names come from the
+    institution's reference bundle when ``institution_id`` is given.
+    """
+    pairs = pair_sessions(base, other)
+    bundle = get_reference_bundle(institution_id) if institution_id else None
+    teacher_names, class_names, room_names = {}, {}, {}
+    if bundle:
+        teacher_names = {item.id: item.user.get_full_name() or item.employee_id for item in bundle.teachers}
+        class_names = {item.id: str(item) for item in bundle.class_groups}
+        room_names = {item.id: item.code for item in bundle.rooms}
+
+    changes = {}
+    for category in CHANGES:
+        base_positions, other_positions = pairs[category]
+        changes[category] = {}
+        if category != 'added':
+            changes[category]['base'] = _sessions(base, base_positions)
+        if category != 'removed':
+            changes[category]['other'] = _sessions(other, other_positions)
+
+    return {
+        'summary': {
+            'base_sessions': base.shape[1],
+            'other_sessions': other.shape[1],
+            'unchanged': len(pairs['unchanged'][0]),
+            **{category: len(pairs[category][0]) or len(pairs[category][1]) for category in CHANGES},
+        },
+        'changes': changes,
+        'impact': {
+            'teachers': _impact(base, other, pairs, TEACHER, teacher_names),
+            'class_groups': _impact(base, other, pairs, CLASS_GROUP, class_names),
+            'rooms': _impact(base, other, pairs, ROOM, room_names),
+        },
+    }
+
+
+def diff_sources(base: Tuple[str, int], other: Tuple[str, int]) -> Dict:
+    """
+    Diff two (kind, id) sources of the same institution. Raises ValueError
+    when they belong to different institutions.
+    """
+    base_info, base_columns = load_source(*base)
+    other_info, other_columns = load_source(*other)
+    if base_info['institution_id'] != other_info['institution_id']:
+        raise ValueError('Timetables of different institutions cannot be compared')
+    return {
+        'format_version': DIFF_FORMAT_VERSION,
+        'base': base_info,
+        'other': other_info,
+        **diff_columns(base_columns, other_columns, base_info['institution_id']),
+    }
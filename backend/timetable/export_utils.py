@@ -17,7 +17,40 @@ import openpyxl
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.utils import get_column_letter
 from PIL import Image, ImageDraw, ImageFont
-from .models import Timetable, TimetableSession
+from .models import Timetable
+from .archive import timetable_sessions
+from .reference_cache import attach_references, get_reference_bundle
+
+
+class SessionList(list):
+    """
+    In-memory stand-in for the parts of the session queryset API the
+    exporters use, so per-slot lookups do not query
+    """
+    
+    def filter(self, **criteria) -> 'SessionList':
+        return SessionList(
+            session for session in self
+            if all(getattr(session, field) == value for field, value in criteria.items())
+        )
+    
+    def exists(self) -> bool:
+        return bool(self)
+    
+    def first(self):
+        return self[0] if self else None
+
+
+def export_sessions(timetable: Timetable) -> SessionList:
+    """
+    Sessions by day and start time with references (and the timetable's
+    institution) from the reference cache; compacted archived timetables
+    are rebuilt from their archive
+    """
+    bundle = get_reference_bundle(timetable.institution_id)
+    if bundle:
+        timetable.institution = bundle.institution
+    return SessionList(attach_references(timetable_sessions(timetable), bundle))
 
 
 class TimetableExporter:
@@ -27,9 +60,8 @@ class TimetableExporter:
     
     def __init__(self, timetable: Timetable):
         self.timetable = timetable
-        self.sessions = timetable.sessions.select_related(
-            'subject', 'teacher__user', 'room', 'class_group'
-        ).order_by('day_of_week', 'start_time')
+        # One session query; related rows come from the reference cache
+        self.sessions = export_sessions(timetable)
     
     def export_pdf(self, view_type: str = 'general') -> HttpResponse:
         """
@@ -37,12 +37,14 @@ try:
 except ImportError:
     PIL_AVAILABLE = False
 
-from .models import Timetable, TimetableSession, Institution
-from .serializers import TimetableSessionSerializer
+from .models import Timetable
+from .export_utils import export_sessions
+from .conditional import conditional, timetable_from_request
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(timetable_from_request)
 def export_timetable_pdf(request, timetable_id):
     """Export timetable as PDF"""
     if not REPORTLAB_AVAILABLE:
@@ -52,9 +54,7 @@ def export_timetable_pdf(request, timetable_id):
     
     try:
         timetable = Timetable.objects.get(id=timetable_id)
-        sessions = TimetableSession.objects.filter(timetable=timetable).select_related(
-            'subject', 'teacher__user', 'room', 'class_group'
-        ).order_by('day_of_week', 'start_time')
+        sessions = export_sessions(timetable)
         
         # Create PDF
         buffer = io.BytesIO()
@@ -140,6 +140,7 @@ def export_timetable_pdf(request, timetable_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(timetable_from_request)
 def export_timetable_excel(request, timetable_id):
     """Export timetable as Excel"""
     if not OPENPYXL_AVAILABLE:
@@ -149,9 +150,7 @@ def export_timetable_excel(request, timetable_id):
     
     try:
         timetable = Timetable.objects.get(id=timetable_id)
-        sessions = TimetableSession.objects.filter(timetable=timetable).select_related(
-            'subject', 'teacher__user', 'room', 'class_group'
-        ).order_by('day_of_week', 'start_time')
+        sessions = export_sessions(timetable)
         
         # Create workbook
         wb = openpyxl.Workbook()
@@ -237,6 +236,7 @@ def export_timetable_excel(request, timetable_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(timetable_from_request)
 def export_timetable_png(request, timetable_id):
     """Export timetable as PNG image"""
     if not PIL_AVAILABLE:
@@ -246,9 +246,7 @@ def export_timetable_png(request, timetable_id):
     
     try:
         timetable = Timetable.objects.get(id=timetable_id)
-        sessions = TimetableSession.objects.filter(timetable=timetable).select_related(
-            'subject', 'teacher__user', 'room', 'class_group'
-        ).order_by('day_of_week', 'start_time')
+        sessions = export_sessions(timetable)
         
         # Image dimensions
         width, height = 1200, 800
@@ -330,13 +328,12 @@ def export_timetable_png(request, timetable_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(timetable_from_request)
 def export_timetable_ics(request, timetable_id):
     """Export timetable as ICS calendar file"""
     try:
         timetable = Timetable.objects.get(id=timetable_id)
-        sessions = TimetableSession.objects.filter(timetable=timetable).select_related(
-            'subject', 'teacher__user', 'room', 'class_group'
-        )
+        sessions = export_sessions(timetable)
         
         # Create ICS content
         ics_content = [
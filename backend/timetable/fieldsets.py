@@ -0,0 +1,103 @@
+"""
+Sparse fieldsets for list/detail endpoints.
+
+``?fields=id,name`` limits the top-level fields of a response and
+``?expand=teacher,room`` picks which nested ``*_details`` objects are
+included; ``expand=`` with no value drops them all. Without either
+parameter responses are unchanged. The view plans select_related and
+prefetch_related from the same selection, so unrequested relations are not
+loaded.
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from rest_framework import serializers
+
+
+def _split(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def selected_fields(serializer_class, request) -> Optional[Set[str]]:
+    """
+    Field names requested for ``serializer_class``, or None for all of them.
+    Only safe methods are narrowed; writes always validate and return every field.
+    """
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None
+    params = request.query_params
+    if 'fields' not in params and 'expand' not in params:
+        return None
+
+    expandable = getattr(serializer_class, 'expandable_fields', {})
+    if 'fields' in params:
+        selected = set(_split(params['fields']))
+    else:
+        selected = set(serializer_class().fields) - set(expandable.values())
+    if 'expand' in params:
+        selected |= {expandable[name] for name in _split(params['expand']) if name in expandable}
+    elif 'fields' not in params:
+        selected |= set(expandable.values())
+    return selected
+
+
+def related_plan(serializer_class, fields: Optional[Iterable[str]] = None,
+                 prefix: str = '') -> Tuple[Set[str], Set[str]]:
+    """
+    select_related and prefetch_related paths needed to serialize ``fields``
+    (all fields when None). Nested serializers contribute their own plan
+    under their source.
+    """
+    select, prefetch = set(), set()
+    declared = serializer_class._declared_fields
+    select_map: Dict[str, List[str]] = getattr(serializer_class, 'select_related_fields', {})
+    prefetch_map: Dict[str, List[str]] = getattr(serializer_class, 'prefetch_related_fields', {})
+    names = fields if fields is not None else set(select_map) | set(prefetch_map) | set(declared)
+
+    for name in names:
+        select.update(prefix + path for path in select_map.get(name, []))
+        prefetch.update(prefix + path for path in prefetch_map.get(name, []))
+        field = declared.get(name)
+        if isinstance(field, serializers.BaseSerializer) and not isinstance(field, serializers.ListSerializer):
+            source = prefix + (field.source or name).replace('.', '__')
+            select.add(source)
+            nested_select, nested_prefetch = related_plan(type(field), prefix=source + '__')
+            select |= nested_select
+            prefetch |= nested_prefetch
+    return select, prefetch
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin dropping fields the request did not ask for. Applies to
+    the top-level serializer only; nested serializers stay complete.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return fields
+
+        selected = selected_fields(type(self), self.context.get('request'))
+        if selected is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in selected}
+
+
+class SparseFieldsetViewMixin:
+    """
+    View mixin: ``plan_queryset`` adds the joins and prefetches the selected
+    fields of the view's serializer need.
+    """
+
+    def plan_queryset(self, queryset):
+        serializer_class = self.get_serializer_class()
+        select, prefetch = related_plan(serializer_class, selected_fields(serializer_class, self.request))
+        if select:
+            queryset = queryset.select_related(*sorted(select))
+        if prefetch:
+            queryset = queryset.prefetch_related(*sorted(prefetch))
+        return queryset
@@ -0,0 +1,101 @@
+"""
+Compact columnar representation of a timetable for grid rendering
+"""
+
+from typing import Dict, List, Tuple
+
+from .models import TimetableSession
+from .reference_cache import get_reference_bundle
+
+GRID_FORMAT_VERSION = 1
+SESSION_TYPES = [choice for choice, _ in TimetableSession._meta.get_field('session_type').choices]
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+GRID_FIELDS = ('id', 'subject_id', 'teacher_id', 'room_id', 'class_group_id',
+               'day_of_week', 'start_time', 'end_time', 'session_type', 'is_fixed', 'notes')
+
+
+def _entities(items, ids, fields: List[str]) -> Tuple[Dict[str, list], Dict[int, int]]:
+    """
+    Columns of ``fields`` (``user__first_name`` style paths allowed) for the
+    referenced reference-bundle rows, ordered by id, and the id -> position
+    map used to encode session references.
+    """
+    rows = sorted((item for item in items if item.id in ids), key=lambda item: item.id)
+    columns = {'id': [item.id for item in rows]}
+    for name in fields:
+        values = []
+        for item in rows:
+            value = item
+            for part in name.split('__'):
+                value = getattr(value, part)
+            values.append(value)
+        columns[name.replace('__', '_')] = values
+    return columns, {item.id: index for index, item in enumerate(rows)}
+
+
+def build_timetable_grid(timetable) -> Dict:
+    """
+    Every entity a timetable references is sent once as columns; sessions
+    are parallel integer arrays of positions into those columns (-1 for a
+    missing teacher, room or subject). Entities come from the reference
+    cache, so this is one session query plus the bundle check. Sessions of
+    a compacted archived timetable have null ids; their notes are keyed by
+    position.
+    """
+    # timetable.archive builds on the session columns of timetable.variants, which use SESSION_TYPES
+    from .archive import timetable_sessions
+
+    sessions = timetable_sessions(timetable)
+    if isinstance(sessions, list):
+        rows = [tuple(getattr(session, field) for field in GRID_FIELDS) for session in sessions]
+    else:
+        rows = list(sessions.values_list(*GRID_FIELDS))
+
+    bundle = get_reference_bundle(timetable.institution_id)
+    subjects, subject_index = _entities(bundle.subjects, {row[1] for row in rows}, ['code', 'name', 'type'])
+    teachers, teacher_index = _entities(bundle.teachers, {row[2] for row in rows},
+                                        ['employee_id', 'user__first_name', 'user__last_name'])
+    rooms, room_index = _entities(bundle.rooms, {row[3] for row in rows}, ['code', 'name', 'type', 'capacity'])
+    class_groups, class_index = _entities(bundle.class_groups, {row[4] for row in rows}, ['name', 'year', 'section'])
+
+    slot_index = {}
+    for row in rows:
+        slot_index.setdefault((row[5], row[6], row[7]), len(slot_index))
+    type_index = {session_type: index for index, session_type in enumerate(SESSION_TYPES)}
+
+    sessions = {
+        'id': [row[0] for row in rows],
+        'subject': [subject_index.get(row[1], -1) for row in rows],
+        'teacher': [teacher_index.get(row[2], -1) for row in rows],
+        'room': [room_index.get(row[3], -1) for row in rows],
+        'class_group': [class_index[row[4]] for row in rows],
+        'slot': [slot_index[(row[5], row[6], row[7])] for row in rows],
+        'session_type': [type_index.get(row[8], 0) for row in rows],
+        'is_fixed': [int(row[9]) for row in rows],
+    }
+
+    return {
+        'format_version': GRID_FORMAT_VERSION,
+        'timetable': {
+            'id': timetable.id,
+            'name': timetable.name,
+            'version': timetable.version,
+            'status': timetable.status,
+        },
+        'days': DAY_NAMES,
+        'session_types': SESSION_TYPES,
+        'slots': {
+            'day': [day for day, _, _ in slot_index],
+            'start_time': [start.strftime('%H:%M') for _, start, _ in slot_index],
+            'end_time': [end.strftime('%H:%M') for _, _, end in slot_index],
+        },
+        'subjects': subjects,
+        'teachers': teachers,
+        'rooms': rooms,
+        'class_groups': class_groups,
+        'sessions': sessions,
+        # Notes are rare; only sessions that have one are listed
+        'notes': {
+            str(row[0] if row[0] is not None else index): row[10] for index, row in enumerate(rows) if row[10]
+        },
+    }
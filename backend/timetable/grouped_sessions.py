@@ -0,0 +1,61 @@
+"""
+Sessions of a timetable grouped by class or teacher, cached per timetable
+version and revision (bumped by the session signals) and per institution
+reference_revision (the payloads carry subject, teacher and room names)
+"""
+
+import logging
+from typing import Dict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .archive import timetable_sessions
+from .models import TimetableSession
+from .reference_cache import attach_references, get_reference_bundle
+from .serializers import TimetableSessionRowSerializer
+
+logger = logging.getLogger(__name__)
+
+GROUPINGS = {
+    'class': ('class_group', 'day_of_week', 'start_time'),
+    'teacher': ('teacher', 'day_of_week', 'start_time'),
+}
+
+
+def _group_key(session: TimetableSession, grouping: str):
+    if grouping == 'class':
+        return str(session.class_group)
+    return session.teacher.user.get_full_name() if session.teacher else None
+
+
+def build_grouped_sessions(timetable, grouping: str) -> Dict[str, list]:
+    """
+    One session query; subjects, teachers (with users), rooms and class
+    groups (with branches) are attached from the reference cache.
+    """
+    sessions = attach_references(
+        timetable_sessions(timetable, GROUPINGS[grouping]), get_reference_bundle(timetable.institution_id)
+    )
+
+    grouped = {}
+    for session in sessions:
+        group = _group_key(session, grouping)
+        if group is None:
+            continue
+        grouped.setdefault(group, []).append(TimetableSessionRowSerializer(session).data)
+    return grouped
+
+
+def grouped_sessions(timetable, grouping: str) -> Dict[str, list]:
+    """
+    Cached ``build_grouped_sessions``
+    """
+    key = (f"timetable:{timetable.id}:v{timetable.version}:r{timetable.revision}"
+           f":ref{timetable.institution.reference_revision}:by_{grouping}")
+    grouped = cache.get(key)
+    if grouped is None:
+        grouped = build_grouped_sessions(timetable, grouping)
+        cache.set(key, grouped, timeout=getattr(settings, 'TIMETABLE_VIEW_CACHE_SECONDS', 3600))
+        logger.debug(f"Cached sessions by {grouping} for timetable {timetable.id}")
+    return grouped
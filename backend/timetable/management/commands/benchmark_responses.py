@@ -0,0 +1,109 @@
+"""
+Django management command to benchmark JSON rendering and response
+compression of the largest timetable endpoints
+"""
+
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.middleware import BROTLI_AVAILABLE, compress
+from core.renderers import ORJSONRenderer
+from scheduler.ortools_scheduler import TimetableScheduler
+from scheduler.synthetic import SCALING_LADDER, generate_instance, materialize_instance
+
+RESULTS_FORMAT_VERSION = 1
+
+ENDPOINTS = [
+    ('timetable detail', '/api/timetable/timetables/{timetable}/'),
+    ('grid', '/api/timetable/timetables/{timetable}/grid/'),
+    ('sessions_by_class', '/api/timetable/timetables/{timetable}/sessions_by_class/'),
+    ('sessions_by_teacher', '/api/timetable/timetables/{timetable}/sessions_by_teacher/'),
+    ('faculty workload', '/api/timetable/analytics/faculty-workload/?timetable_id={timetable}'),
+    ('room utilization', '/api/timetable/analytics/room-utilization/?timetable_id={timetable}'),
+]
+RENDERERS = [('json', JSONRenderer()), ('orjson', ORJSONRenderer())]
+
+
+def time_render(renderer, data, repeat: int) -> float:
+    """
+    Median seconds of ``repeat`` renders
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        renderer.render(data, 'application/json', {})
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = 'Compare JSON renderers and response compression on a generated timetable'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', default='small', help=f"Ladder step ({', '.join(SCALING_LADDER)})")
+        parser.add_argument('--repeat', type=int, default=20, help='Renders per endpoint; the median is reported')
+        parser.add_argument('--time-limit', type=float, default=30, help='Solver time limit')
+        parser.add_argument('--output', help='Results file to write')
+
+    def handle(self, *args, **options):
+        if options['size'] not in SCALING_LADDER:
+            raise CommandError(f"Unknown size: {options['size']}")
+
+        with transaction.atomic():
+            institution, admin = materialize_instance(generate_instance(SCALING_LADDER[options['size']]))
+            timetable = TimetableScheduler(institution.id, {'time_limit': options['time_limit']}).generate_timetable(
+                f"Benchmark {options['size']}", admin
+            )
+            if timetable is None:
+                transaction.set_rollback(True)
+                raise CommandError('Timetable generation found no solution')
+
+            client = APIClient(SERVER_NAME='localhost')
+            client.force_authenticate(admin)
+            rows = [self._measure(client, name, url.format(timetable=timetable.id), options['repeat'])
+                    for name, url in ENDPOINTS]
+            transaction.set_rollback(True)
+
+        self._report(rows)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump({
+                    'format_version': RESULTS_FORMAT_VERSION,
+                    'created_at': timezone.now().isoformat(),
+                    'size': options['size'],
+                    'brotli': BROTLI_AVAILABLE,
+                    'results': rows,
+                }, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}"))
+
+    def _measure(self, client, name: str, url: str, repeat: int) -> dict:
+        response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f"{name}: GET {url} returned {response.status_code}")
+
+        row = {'endpoint': name, 'url': url}
+        for label, renderer in RENDERERS:
+            row[f"{label}_seconds"] = time_render(renderer, response.data, repeat)
+        content = ORJSONRenderer().render(response.data, 'application/json', {})
+        row['bytes'] = len(content)
+        row['gzip_bytes'] = len(compress(content, 'gzip'))
+        row['br_bytes'] = len(compress(content, 'br')) if BROTLI_AVAILABLE else None
+        return row
+
+    def _report(self, rows: list):
+        self.stdout.write(f"{'endpoint':<20} {'json ms':>9} {'orjson ms':>10} {'speedup':>8} "
+                          f"{'bytes':>9} {'gzip':>8} {'br':>8}")
+        for row in rows:
+            speedup = row['json_seconds'] / row['orjson_seconds'] if row['orjson_seconds'] else 0
+            br = str(row['br_bytes']) if row['br_bytes'] is not None else '-'
+            self.stdout.write(
+                f"{row['endpoint']:<20} {row['json_seconds'] * 1000:>9.2f} {row['orjson_seconds'] * 1000:>10.2f} "
+                f"{speedup:>7.1f}x {row['bytes']:>9} {row['gzip_bytes']:>8} {br:>8}"
+            )
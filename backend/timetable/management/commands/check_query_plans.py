@@ -0,0 +1,163 @@
+"""
+Django management command that checks the timetable session, analytics and
+export queries are planned on the composite indexes
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from timetable.models import Timetable, TimetableSession
+
+SESSION_TABLE = TimetableSession._meta.db_table
+TIMETABLE_TABLE = Timetable._meta.db_table
+
+
+@dataclass
+class PlanCase:
+    name: str
+    build: Callable[[Dict], object]
+    # table -> leading index columns any one of which the plan must use
+    expect: Dict[str, List[Tuple[str, ...]]]
+    ordered: bool = False
+    plan: str = field(default='', repr=False)
+
+
+def _active_timetables(ids: Dict):
+    return Timetable.objects.filter(institution_id=ids['institution'], status=Timetable.Status.ACTIVE)
+
+
+CASES = [
+    # TimetableSessionViewSet filters
+    PlanCase('sessions: timetable + teacher',
+             lambda ids: TimetableSession.objects.filter(timetable_id=ids['timetable'], teacher_id=ids['teacher']),
+             {SESSION_TABLE: [('timetable_id', 'teacher_id')]}),
+    PlanCase('sessions: timetable + class group',
+             lambda ids: TimetableSession.objects.filter(timetable_id=ids['timetable'],
+                                                         class_group_id=ids['class_group']),
+             {SESSION_TABLE: [('timetable_id', 'class_group_id')]}),
+    PlanCase('sessions: timetable + day',
+             lambda ids: TimetableSession.objects.filter(timetable_id=ids['timetable'], day_of_week=0),
+             {SESSION_TABLE: [('timetable_id', 'day_of_week')]}),
+    # Keyset pages; SQLite's timetable_id index already yields rowid order
+    PlanCase('sessions: keyset page',
+             lambda ids: TimetableSession.objects.filter(timetable_id=ids['timetable'], id__gt=0).order_by('id')[:21],
+             {SESSION_TABLE: [('timetable_id', 'id'), ('timetable_id',)]}, ordered=True),
+    # TimetableViewSet grouped actions
+    PlanCase('sessions_by_teacher',
+             lambda ids: TimetableSession.objects.filter(timetable_id=ids['timetable']).order_by(
+                 'teacher', 'day_of_week', 'start_time'),
+             {SESSION_TABLE: [('timetable_id', 'teacher_id', 'day_of_week', 'start_time')]}, ordered=True),
+    PlanCase('sessions_by_class',
+             lambda ids: TimetableSession.objects.filter(timetable_id=ids['timetable']).order_by(
+                 'class_group', 'day_of_week', 'start_time'),
+             {SESSION_TABLE: [('timetable_id', 'class_group_id', 'day_of_week', 'start_time')]}, ordered=True),
+    # Analytics
+    PlanCase('analytics: active timetables',
+             _active_timetables,
+             {TIMETABLE_TABLE: [('institution_id', 'status')]}),
+    PlanCase('analytics: faculty workload',
+             lambda ids: TimetableSession.objects.filter(
+                 timetable__in=_active_timetables(ids)).select_related('teacher__user'),
+             {SESSION_TABLE: [('timetable_id',)], TIMETABLE_TABLE: [('institution_id', 'status')]}),
+    PlanCase('analytics: room utilization',
+             lambda ids: TimetableSession.objects.filter(timetable_id=ids['timetable'], room_id=ids['room']),
+             {SESSION_TABLE: [('timetable_id', 'room_id')]}),
+    PlanCase('analytics: student density',
+             lambda ids: TimetableSession.objects.filter(
+                 timetable__in=_active_timetables(ids), class_group_id=ids['class_group']),
+             {SESSION_TABLE: [('timetable_id', 'class_group_id')]}),
+    # Exports
+    PlanCase('export: day/time order',
+             lambda ids: TimetableSession.objects.filter(timetable_id=ids['timetable']).select_related(
+                 'subject', 'teacher__user', 'room', 'class_group').order_by('day_of_week', 'start_time'),
+             {SESSION_TABLE: [('timetable_id', 'day_of_week', 'start_time')]}, ordered=True),
+]
+
+
+def table_indexes(table: str) -> Dict[str, List[str]]:
+    """
+    Index name -> columns for every index on a table
+    """
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return {name: info['columns'] for name, info in constraints.items() if info['index'] and info['columns']}
+
+
+def explain(queryset) -> str:
+    """
+    Plan text of a queryset. On PostgreSQL sequential scans and sorts are
+    disabled for the transaction, so small development tables still show
+    whether an index path exists.
+    """
+    if connection.vendor != 'postgresql':
+        return queryset.explain()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_sort = off')
+        return queryset.explain()
+
+
+def check_plan(case: PlanCase, indexes: Dict[str, Dict[str, List[str]]]) -> List[str]:
+    """
+    Problems found in a case's plan; empty when it uses the expected indexes
+    """
+    problems = []
+    plan = case.plan
+    for table, prefixes in case.expect.items():
+        if re.search(rf'\bSCAN {table}\b|Seq Scan on {table}\b', plan):
+            problems.append(f"full scan of {table}")
+            continue
+        accepted = [
+            name for name, columns in indexes[table].items()
+            if any(tuple(columns[:len(prefix)]) == prefix for prefix in prefixes)
+        ]
+        if not any(re.search(rf'\b{re.escape(name)}\b', plan) for name in accepted):
+            problems.append(f"{table} not searched on any of {', '.join(sorted(accepted)) or 'no matching index'}")
+    if case.ordered and re.search(r'TEMP B-TREE FOR ORDER BY|\bSort\b', plan):
+        problems.append('ordering needs a sort step')
+    return problems
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN on the timetable session, analytics and export queries and check the indexes are used'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--show-plans', action='store_true', help='Print the plan of every query')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f"Query plan checks support SQLite and PostgreSQL, not {connection.vendor}")
+
+        # Plans do not depend on the ids; use real ones when there is data
+        session = TimetableSession.objects.select_related('timetable').first()
+        ids = {
+            'timetable': session.timetable_id if session else 1,
+            'institution': session.timetable.institution_id if session else 1,
+            'teacher': session.teacher_id or 1 if session else 1,
+            'room': session.room_id or 1 if session else 1,
+            'class_group': session.class_group_id if session else 1,
+        }
+        indexes = {table: table_indexes(table) for table in (SESSION_TABLE, TIMETABLE_TABLE)}
+
+        failures = 0
+        for case in CASES:
+            case.plan = explain(case.build(ids))
+            problems = check_plan(case, indexes)
+            if problems:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f"FAIL {case.name}: {'; '.join(problems)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok   {case.name}"))
+            if options['show_plans'] or problems:
+                for line in case.plan.splitlines():
+                    self.stdout.write(f"       {line}")
+
+        if failures:
+            raise CommandError(f"{failures} of {len(CASES)} queries do not use the expected indexes "
+                               f"on {connection.vendor}")
+        self.stdout.write(f"All {len(CASES)} queries use the expected indexes on {connection.vendor}")
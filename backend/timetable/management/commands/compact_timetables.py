@@ -0,0 +1,58 @@
+"""
+Django management command to move the sessions of archived timetables into
+compressed archives (see timetable.archive)
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from timetable.archive import compact_timetable
+from timetable.models import Timetable, TimetableArchive
+
+
+class Command(BaseCommand):
+    help = 'Compact the session rows of archived timetables into full snapshots and deltas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--institution', type=int, help='Only this institution')
+        parser.add_argument('--snapshot-interval', type=int,
+                            help='Versions per full snapshot (default TIMETABLE_ARCHIVE_SNAPSHOT_INTERVAL)')
+        parser.add_argument('--dry-run', action='store_true', help='List what would be compacted')
+
+    def handle(self, *args, **options):
+        if options['snapshot_interval'] is not None and options['snapshot_interval'] < 1:
+            raise CommandError('--snapshot-interval must be at least 1')
+
+        pending = Timetable.objects.filter(status=Timetable.Status.ARCHIVED, archive__isnull=True)
+        if options['institution']:
+            pending = pending.filter(institution_id=options['institution'])
+        # Oldest first, so every version can be a delta on the one before
+        pending = pending.annotate(rows=Count('sessions')).order_by(
+            'institution_id', 'academic_year', 'semester', 'version'
+        )
+
+        if options['dry_run']:
+            total = 0
+            for timetable in pending:
+                total += timetable.rows
+                self.stdout.write(f"{timetable.id:>8} {timetable} - {timetable.rows} session rows")
+            self.stdout.write(f"{len(pending)} timetables, {total} session rows")
+            return
+
+        counts = {TimetableArchive.Kind.FULL: 0, TimetableArchive.Kind.DELTA: 0}
+        rows = stored = 0
+        for timetable in pending:
+            archive = compact_timetable(timetable.id, options['snapshot_interval'])
+            if archive is None:
+                continue
+            counts[archive.kind] += 1
+            rows += timetable.rows
+            stored += archive.stored_bytes
+            base = f" on {archive.base.timetable_id}" if archive.base_id else ''
+            self.stdout.write(f"{timetable.id:>8} {timetable}: {archive.kind}{base}, "
+                              f"{timetable.rows} rows -> {archive.stored_bytes} bytes")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {sum(counts.values())} timetables ({counts['full']} full, {counts['delta']} delta): "
+            f"{rows} session rows -> {stored} bytes"
+        ))
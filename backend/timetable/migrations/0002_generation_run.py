@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('timetable', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('success', 'Success'), ('infeasible', 'Infeasible'), ('failed', 'Failed')], max_length=20)),
+                ('parameters', models.JSONField(default=dict, help_text='Request parameters of the generation')),
+                ('total_time', models.DurationField(blank=True, null=True)),
+                ('summary', models.JSONField(default=dict, help_text='Totals: wall/CPU time, queries, model size, peak RSS')),
+                ('spans', models.JSONField(default=list, help_text='Per-phase spans in start order')),
+                ('error', models.TextField(blank=True, default='')),
+                ('details', models.JSONField(default=dict, help_text='Infeasibility analysis or validation result')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('institution', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='generation_runs', to='timetable.institution')),
+                ('started_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='generation_runs', to=settings.AUTH_USER_MODEL)),
+                ('timetable', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='generation_runs', to='timetable.timetable')),
+            ],
+            options={
+                'verbose_name': 'Generation Run',
+                'verbose_name_plural': 'Generation Runs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:45
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('timetable', '0002_generation_run'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('generate', 'Generate Timetable'), ('variants', 'Generate Variants')], default='generate', max_length=20)),
+                ('name', models.CharField(max_length=200)),
+                ('parameters', models.JSONField(default=dict, help_text='Request parameters of the generation')),
+                ('priority', models.IntegerField(default=5, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(10)])),
+                ('cpu_budget', models.PositiveIntegerField(default=1, help_text='CPU cores the solve may use')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('worker', models.CharField(blank=True, default='', max_length=100)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=3)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('result', models.JSONField(default=dict, help_text='Summary returned by the worker')),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('institution', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='generation_jobs', to='timetable.institution')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='generation_jobs', to=settings.AUTH_USER_MODEL)),
+                ('timetable', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='generation_jobs', to='timetable.timetable')),
+            ],
+            options={
+                'verbose_name': 'Generation Job',
+                'verbose_name_plural': 'Generation Jobs',
+                'ordering': ['-priority', 'created_at'],
+                'indexes': [models.Index(fields=['status', '-priority', 'created_at'], name='generation_job_claim_idx'), models.Index(fields=['status', 'heartbeat_at'], name='generation_job_stale_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0003_generation_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='attached_requests',
+            field=models.PositiveIntegerField(default=0, help_text='Duplicate requests coalesced into this job'),
+        ),
+        migrations.AddField(
+            model_name='generationjob',
+            name='request_key',
+            field=models.CharField(blank=True, default='', help_text='Hash of institution, input fingerprint and parameters; equal keys share one solve', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='generationjob',
+            index=models.Index(fields=['institution', 'status'], name='generation_job_inflight_idx'),
+        ),
+    ]
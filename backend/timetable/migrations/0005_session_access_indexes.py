@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0004_generation_job_coalescing'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timetable',
+            index=models.Index(fields=['institution', 'status'], name='timetable_inst_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timetablesession',
+            index=models.Index(fields=['timetable', 'teacher', 'day_of_week', 'start_time'], include=('end_time', 'subject', 'class_group', 'room'), name='session_timetable_teacher_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timetablesession',
+            index=models.Index(fields=['timetable', 'room', 'day_of_week', 'start_time'], include=('end_time', 'subject', 'class_group', 'teacher'), name='session_timetable_room_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timetablesession',
+            index=models.Index(fields=['timetable', 'class_group', 'day_of_week', 'start_time'], name='session_timetable_class_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0005_session_access_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timetable',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped on every session edit'),
+        ),
+    ]
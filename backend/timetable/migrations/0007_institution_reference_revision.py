@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0006_timetable_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='institution',
+            name='reference_revision',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped when branches, subjects, teachers, rooms or class groups change'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0007_institution_reference_revision'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timetablesession',
+            index=models.Index(fields=['timetable', 'id'], name='session_timetable_pk_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('timetable', '0008_session_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch', models.CharField(db_index=True, help_text='Shared by the variants of one request', max_length=32)),
+                ('number', models.PositiveIntegerField(help_text='Variant number within the batch')),
+                ('name', models.CharField(max_length=200)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('committed', 'Committed')], default='pending', max_length=20)),
+                ('session_count', models.PositiveIntegerField(default=0)),
+                ('sessions', models.BinaryField(help_text='zlib-compressed int32 session columns')),
+                ('metrics', models.JSONField(default=dict)),
+                ('details', models.JSONField(default=dict, help_text='Solver statistics, diversity and coordination')),
+                ('reference_revision', models.PositiveIntegerField(default=0, help_text='Institution reference_revision the variant was solved against')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('branch', models.ForeignKey(blank=True, help_text='Set for branch-specific generation', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='timetable.branch')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='timetable_variants', to=settings.AUTH_USER_MODEL)),
+                ('institution', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='timetable.institution')),
+                ('timetable', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='source_variants', to='timetable.timetable')),
+            ],
+            options={
+                'verbose_name': 'Timetable Variant',
+                'verbose_name_plural': 'Timetable Variants',
+                'ordering': ['-created_at', 'number'],
+                'indexes': [models.Index(fields=['institution', 'status', 'created_at'], name='variant_inst_status_idx')],
+            },
+        ),
+    ]
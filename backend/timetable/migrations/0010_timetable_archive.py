@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0009_timetable_variant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('full', 'Full snapshot'), ('delta', 'Delta')], max_length=10)),
+                ('depth', models.PositiveIntegerField(default=0, help_text='Deltas between this archive and its full snapshot')),
+                ('session_count', models.PositiveIntegerField(default=0)),
+                ('sessions', models.BinaryField(help_text='zlib-compressed int32 columns: all sessions, or those added to the base')),
+                ('removed', models.BinaryField(default=b'', help_text='zlib-compressed int32 base positions dropped by a delta')),
+                ('notes', models.JSONField(default=dict, help_text='Session position -> notes')),
+                ('stored_bytes', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('base', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='deltas', to='timetable.timetablearchive')),
+                ('timetable', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='archive', to='timetable.timetable')),
+            ],
+            options={
+                'verbose_name': 'Timetable Archive',
+                'verbose_name_plural': 'Timetable Archives',
+            },
+        ),
+    ]
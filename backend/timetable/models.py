@@ -52,6 +52,10 @@ class Institution(models.Model):
         validators=[MinValueValidator(12), MaxValueValidator(40)],
         help_text='Maximum teaching hours per teacher per week (NEP-2020 compliant)'
     )
+    reference_revision = models.PositiveIntegerField(
+        default=0,
+        help_text='Bumped when branches, subjects, teachers, rooms or class groups change'
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -361,6 +365,7 @@ class Timetable(models.Model):
         default=Status.DRAFT
     )
     version = models.IntegerField(default=1)
+    revision = models.PositiveIntegerField(default=0, help_text='Bumped on every session edit')
 
     # Generation metadata
     generated_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='generated_timetables')
@@ -385,6 +390,10 @@ class Timetable(models.Model):
         verbose_name = _('Timetable')
         verbose_name_plural = _('Timetables')
         unique_together = ['institution', 'academic_year', 'semester', 'version']
+        indexes = [
+            # Active/draft timetables of an institution (analytics, timetable list)
+            models.Index(fields=['institution', 'status'], name='timetable_inst_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.academic_year} (v{self.version})"
@@ -432,7 +441,28 @@ class TimetableSession(models.Model):
     class Meta:
         verbose_name = _('Timetable Session')
         verbose_name_plural = _('Timetable Sessions')
+        # The unique index also serves (timetable, day_of_week) filters and
+        # day/time ordering; the indexes below cover the per-resource views.
+        # INCLUDE columns are only used on PostgreSQL.
         unique_together = ['timetable', 'day_of_week', 'start_time', 'class_group']
+        indexes = [
+            models.Index(
+                fields=['timetable', 'teacher', 'day_of_week', 'start_time'],
+                include=['end_time', 'subject', 'class_group', 'room'],
+                name='session_timetable_teacher_idx'
+            ),
+            models.Index(
+                fields=['timetable', 'room', 'day_of_week', 'start_time'],
+                include=['end_time', 'subject', 'class_group', 'teacher'],
+                name='session_timetable_room_idx'
+            ),
+            models.Index(
+                fields=['timetable', 'class_group', 'day_of_week', 'start_time'],
+                name='session_timetable_class_idx'
+            ),
+            # Keyset pagination of the session list (timetable_id filter, id order)
+            models.Index(fields=['timetable', 'id'], name='session_timetable_pk_idx'),
+        ]
 
     def __str__(self):
         if self.subject:
@@ -484,3 +514,226 @@ class TimetableConstraint(models.Model):
 
     def __str__(self):
         return f"{self.name} ({self.get_type_display()})"
+
+
+class GenerationRun(models.Model):
+    """
+    Instrumented record of one timetable generation attempt
+    """
+
+    class Status(models.TextChoices):
+        SUCCESS = 'success', _('Success')
+        INFEASIBLE = 'infeasible', _('Infeasible')
+        FAILED = 'failed', _('Failed')
+
+    institution = models.ForeignKey(Institution, on_delete=models.CASCADE, related_name='generation_runs')
+    timetable = models.ForeignKey(
+        Timetable,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='generation_runs'
+    )
+    started_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='generation_runs'
+    )
+    status = models.CharField(max_length=20, choices=Status.choices)
+    parameters = models.JSONField(default=dict, help_text='Request parameters of the generation')
+
+    # Trace
+    total_time = models.DurationField(null=True, blank=True)
+    summary = models.JSONField(default=dict, help_text='Totals: wall/CPU time, queries, model size, peak RSS')
+    spans = models.JSONField(default=list, help_text='Per-phase spans in start order')
+    error = models.TextField(blank=True, default='')
+    details = models.JSONField(default=dict, help_text='Infeasibility analysis or validation result')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Generation Run')
+        verbose_name_plural = _('Generation Runs')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.institution} - {self.get_status_display()} ({self.created_at:%Y-%m-%d %H:%M})"
+
+
+class GenerationJob(models.Model):
+    """
+    Queued timetable generation, claimed and run by run_generation_worker
+    """
+
+    class Kind(models.TextChoices):
+        GENERATE = 'generate', _('Generate Timetable')
+        VARIANTS = 'variants', _('Generate Variants')
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', _('Queued')
+        RUNNING = 'running', _('Running')
+        SUCCEEDED = 'succeeded', _('Succeeded')
+        FAILED = 'failed', _('Failed')
+
+    institution = models.ForeignKey(Institution, on_delete=models.CASCADE, related_name='generation_jobs')
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='generation_jobs'
+    )
+    kind = models.CharField(max_length=20, choices=Kind.choices, default=Kind.GENERATE)
+    name = models.CharField(max_length=200)
+    parameters = models.JSONField(default=dict, help_text='Request parameters of the generation')
+    priority = models.IntegerField(
+        default=5,
+        validators=[MinValueValidator(1), MaxValueValidator(10)]
+    )
+    cpu_budget = models.PositiveIntegerField(default=1, help_text='CPU cores the solve may use')
+    request_key = models.CharField(
+        max_length=64, blank=True, default='',
+        help_text='Hash of institution, input fingerprint and parameters; equal keys share one solve'
+    )
+    attached_requests = models.PositiveIntegerField(
+        default=0, help_text='Duplicate requests coalesced into this job'
+    )
+
+    # Claim state
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+    worker = models.CharField(max_length=100, blank=True, default='')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # Outcome
+    timetable = models.ForeignKey(
+        Timetable,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='generation_jobs'
+    )
+    result = models.JSONField(default=dict, help_text='Summary returned by the worker')
+    error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('Generation Job')
+        verbose_name_plural = _('Generation Jobs')
+        ordering = ['-priority', 'created_at']
+        indexes = [
+            models.Index(fields=['status', '-priority', 'created_at'], name='generation_job_claim_idx'),
+            models.Index(fields=['status', 'heartbeat_at'], name='generation_job_stale_idx'),
+            models.Index(fields=['institution', 'status'], name='generation_job_inflight_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+
+
+class TimetableVariant(models.Model):
+    """
+    Generated variant kept on the server until one is committed. Sessions
+    are stored packed (see timetable.variants); clients only see metrics
+    and the variant id.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('Pending')
+        COMMITTED = 'committed', _('Committed')
+
+    institution = models.ForeignKey(Institution, on_delete=models.CASCADE, related_name='variants')
+    branch = models.ForeignKey(
+        Branch,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='variants',
+        help_text='Set for branch-specific generation'
+    )
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='timetable_variants'
+    )
+    batch = models.CharField(max_length=32, db_index=True, help_text='Shared by the variants of one request')
+    number = models.PositiveIntegerField(help_text='Variant number within the batch')
+    name = models.CharField(max_length=200)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+
+    session_count = models.PositiveIntegerField(default=0)
+    sessions = models.BinaryField(help_text='zlib-compressed int32 session columns')
+    metrics = models.JSONField(default=dict)
+    details = models.JSONField(default=dict, help_text='Solver statistics, diversity and coordination')
+    reference_revision = models.PositiveIntegerField(
+        default=0, help_text="Institution reference_revision the variant was solved against"
+    )
+
+    timetable = models.ForeignKey(
+        Timetable,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='source_variants'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Timetable Variant')
+        verbose_name_plural = _('Timetable Variants')
+        ordering = ['-created_at', 'number']
+        indexes = [
+            models.Index(fields=['institution', 'status', 'created_at'], name='variant_inst_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.number} ({self.get_status_display()})"
+
+
+class TimetableArchive(models.Model):
+    """
+    Compressed sessions of an archived timetable whose TimetableSession rows
+    were compacted away (see timetable.archive). A full snapshot holds every
+    session; a delta holds the sessions added to, and the positions removed
+    from, its base archive.
+    """
+
+    class Kind(models.TextChoices):
+        FULL = 'full', _('Full snapshot')
+        DELTA = 'delta', _('Delta')
+
+    timetable = models.OneToOneField(Timetable, on_delete=models.CASCADE, related_name='archive')
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    # Deleting a base rewrites its deltas as full snapshots first (signals)
+    base = models.ForeignKey(
+        'self',
+        on_delete=models.DO_NOTHING,
+        null=True,
+        blank=True,
+        related_name='deltas'
+    )
+    depth = models.PositiveIntegerField(default=0, help_text='Deltas between this archive and its full snapshot')
+
+    session_count = models.PositiveIntegerField(default=0)
+    sessions = models.BinaryField(help_text='zlib-compressed int32 columns: all sessions, or those added to the base')
+    removed = models.BinaryField(default=b'', help_text='zlib-compressed int32 base positions dropped by a delta')
+    notes = models.JSONField(default=dict, help_text='Session position -> notes')
+    stored_bytes = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Timetable Archive')
+        verbose_name_plural = _('Timetable Archives')
+
+    def __str__(self):
+        return f"{self.timetable_id} ({self.get_kind_display()}, {self.session_count} sessions)"
@@ -0,0 +1,16 @@
+"""
+Keyset (cursor) pagination for the large list endpoints
+"""
+
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Pages by ``id > cursor`` instead of OFFSET, so every page costs the same.
+    Responses carry next/previous links but no count; ``page_size``
+    overrides the PAGE_SIZE setting up to ``max_page_size``.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -0,0 +1,204 @@
+"""
+Read-through cache of per-institution reference data: branches, subjects,
+teachers, rooms, class groups and teacher-subject assignments.
+
+Bundles live in the 'reference' cache and carry the institution's
+reference_revision. Signals bump that column on every save/delete of
+reference rows, so a bundle built before the change is rebuilt on the next
+read even when the cache is per-process.
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Branch, ClassGroup, Institution, Room, Subject, Teacher, TeacherSubject
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT_VERSION = 1
+
+_stats = defaultdict(int)
+_stats_lock = threading.Lock()
+
+
+def _count(event: str):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def reference_cache_stats() -> Dict[str, int]:
+    """
+    Hits, misses (absent or stale bundles) and invalidations of this process
+    """
+    with _stats_lock:
+        return {key: _stats[key] for key in ('hits', 'misses', 'stale', 'invalidations')}
+
+
+def _cache():
+    try:
+        return caches['reference']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def _key(institution_id: int) -> str:
+    return f"reference:v{BUNDLE_FORMAT_VERSION}:{institution_id}"
+
+
+@dataclass
+class ReferenceBundle:
+    """
+    Reference rows of one institution. Teachers come with their user and
+    class groups with their branch, so names and labels need no queries.
+    """
+    institution: Institution
+    revision: int
+    branches: List[Branch]
+    subjects: List[Subject]
+    teachers: List[Teacher]
+    rooms: List[Room]
+    class_groups: List[ClassGroup]
+    teacher_subjects: List[Tuple[int, int, int]]  # (subject_id, teacher_id, preference_level)
+    teacher_branches: Dict[int, List[int]]
+    _index: Dict[str, Dict[int, object]] = field(default_factory=dict, repr=False)
+
+    def _by_id(self, name: str) -> Dict[int, object]:
+        if name not in self._index:
+            self._index[name] = {item.id: item for item in getattr(self, name)}
+        return self._index[name]
+
+    def subject(self, subject_id: Optional[int]) -> Optional[Subject]:
+        return self._by_id('subjects').get(subject_id)
+
+    def teacher(self, teacher_id: Optional[int]) -> Optional[Teacher]:
+        return self._by_id('teachers').get(teacher_id)
+
+    def room(self, room_id: Optional[int]) -> Optional[Room]:
+        return self._by_id('rooms').get(room_id)
+
+    def class_group(self, class_group_id: Optional[int]) -> Optional[ClassGroup]:
+        return self._by_id('class_groups').get(class_group_id)
+
+
+def build_reference_bundle(institution: Institution) -> ReferenceBundle:
+    """
+    Load every reference table of an institution (seven queries)
+    """
+    branches = list(Branch.objects.filter(institution=institution))
+    subjects = list(Subject.objects.filter(branch__institution=institution))
+    teachers = list(Teacher.objects.filter(department__institution=institution).select_related('user'))
+    rooms = list(Room.objects.filter(institution=institution))
+    class_groups = list(ClassGroup.objects.filter(branch__institution=institution).select_related('branch'))
+    teacher_subjects = list(TeacherSubject.objects.filter(
+        subject__branch__institution=institution
+    ).values_list('subject_id', 'teacher_id', 'preference_level'))
+
+    teacher_branches = defaultdict(list)
+    for teacher_id, branch_id in Teacher.classes_assigned.through.objects.filter(
+        teacher__department__institution=institution
+    ).values_list('teacher_id', 'branch_id'):
+        teacher_branches[teacher_id].append(branch_id)
+
+    return ReferenceBundle(
+        institution=institution,
+        revision=institution.reference_revision,
+        branches=branches,
+        subjects=subjects,
+        teachers=teachers,
+        rooms=rooms,
+        class_groups=class_groups,
+        teacher_subjects=teacher_subjects,
+        teacher_branches=dict(teacher_branches),
+    )
+
+
+def get_reference_bundle(institution_id: int) -> Optional[ReferenceBundle]:
+    """
+    Cached reference bundle, or None for an unknown institution. Costs one
+    primary-key query when the cached bundle is current.
+    """
+    institution = Institution.objects.filter(id=institution_id).first()
+    if institution is None:
+        return None
+
+    cache = _cache()
+    bundle = cache.get(_key(institution_id))
+    # created_at guards against a reused id (rolled-back institution on SQLite)
+    if (bundle is not None and bundle.revision == institution.reference_revision
+            and bundle.institution.created_at == institution.created_at):
+        _count('hits')
+        bundle.institution = institution
+        return bundle
+
+    _count('stale' if bundle is not None else 'misses')
+    bundle = build_reference_bundle(institution)
+    cache.set(_key(institution_id), bundle, timeout=getattr(settings, 'REFERENCE_CACHE_SECONDS', 3600))
+    logger.debug(f"Built reference bundle for institution {institution_id} (revision {bundle.revision})")
+    return bundle
+
+
+def get_subjects(institution_id: int) -> List[Subject]:
+    bundle = get_reference_bundle(institution_id)
+    return bundle.subjects if bundle else []
+
+
+def get_teachers(institution_id: int) -> List[Teacher]:
+    bundle = get_reference_bundle(institution_id)
+    return bundle.teachers if bundle else []
+
+
+def get_rooms(institution_id: int, active_only: bool = False) -> List[Room]:
+    bundle = get_reference_bundle(institution_id)
+    if bundle is None:
+        return []
+    return [room for room in bundle.rooms if room.is_active] if active_only else bundle.rooms
+
+
+def get_class_groups(institution_id: int) -> List[ClassGroup]:
+    bundle = get_reference_bundle(institution_id)
+    return bundle.class_groups if bundle else []
+
+
+def attach_references(sessions: Iterable, bundle: Optional[ReferenceBundle]) -> List:
+    """
+    Set subject, teacher, room and class_group of loaded sessions from the
+    bundle so accessing them does not query. Unknown ids stay lazy.
+    """
+    sessions = list(sessions)
+    if bundle is None:
+        return sessions
+    for session in sessions:
+        for name, lookup in (('subject', bundle.subject), ('teacher', bundle.teacher),
+                             ('room', bundle.room), ('class_group', bundle.class_group)):
+            related = lookup(getattr(session, f"{name}_id"))
+            if related is not None:
+                setattr(session, name, related)
+    return sessions
+
+
+def drop_reference_bundle(institution_id: int):
+    _cache().delete(_key(institution_id))
+
+
+def invalidate_reference_data(institution_id: Optional[int]):
+    """
+    Move the institution to a new reference revision and drop its bundle.
+    A bundle cached by a read racing the writing transaction still carries
+    the old revision and is rebuilt once the new one commits.
+    """
+    if not institution_id:
+        return
+    Institution.objects.filter(id=institution_id).update(
+        reference_revision=F('reference_revision') + 1, updated_at=timezone.now()
+    )
+    drop_reference_bundle(institution_id)
+    _count('invalidations')
@@ -1,9 +1,12 @@
 from rest_framework import serializers
 from .models import (
     Institution, Branch, ClassGroup, Subject, Teacher, TeacherSubject,
-    Room, Timetable, TimetableSession, TimetableConstraint
+    Room, Timetable, TimetableSession, TimetableConstraint, GenerationRun, GenerationJob
 )
 from users.serializers import UserSerializer
+from .archive import timetable_sessions
+from .fieldsets import SparseFieldsetMixin
+from .reference_cache import attach_references, get_reference_bundle
 
 
 class InstitutionSerializer(serializers.ModelSerializer):
@@ -47,6 +50,8 @@ class ClassGroupSerializer(serializers.ModelSerializer):
     branch_name = serializers.CharField(source='branch.name', read_only=True)
     branch_code = serializers.CharField(source='branch.code', read_only=True)
     coordinator_name = serializers.CharField(source='coordinator.get_full_name', read_only=True)
+
+    select_related_fields = {'branch_name': ['branch'], 'branch_code': ['branch'], 'coordinator_name': ['coordinator']}
     
     class Meta:
         model = ClassGroup
@@ -58,7 +63,7 @@ class ClassGroupSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class SubjectSerializer(serializers.ModelSerializer):
+class SubjectSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Subject serializer
     """
@@ -66,6 +71,9 @@ class SubjectSerializer(serializers.ModelSerializer):
     branch_code = serializers.CharField(source='branch.code', read_only=True)
     type_display = serializers.CharField(source='get_type_display', read_only=True)
     total_hours = serializers.IntegerField(read_only=True)
+
+    select_related_fields = {'branch_name': ['branch'], 'branch_code': ['branch']}
+    prefetch_related_fields = {'prerequisites': ['prerequisites']}
     
     class Meta:
         model = Subject
@@ -94,7 +102,7 @@ class TeacherSubjectSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class TeacherSerializer(serializers.ModelSerializer):
+class TeacherSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Teacher serializer
     """
@@ -102,6 +110,14 @@ class TeacherSerializer(serializers.ModelSerializer):
     department_name = serializers.CharField(source='department.name', read_only=True)
     designation_display = serializers.CharField(source='get_designation_display', read_only=True)
     subject_assignments = TeacherSubjectSerializer(source='teachersubject_set', many=True, read_only=True)
+
+    expandable_fields = {'user': 'user_details', 'subject_assignments': 'subject_assignments'}
+    select_related_fields = {'department_name': ['department']}
+    prefetch_related_fields = {
+        'subject_assignments': ['teachersubject_set__subject'],
+        'subjects_taught': ['subjects_taught'],
+        'classes_assigned': ['classes_assigned'],
+    }
     
     class Meta:
         model = Teacher
@@ -122,6 +138,8 @@ class RoomSerializer(serializers.ModelSerializer):
     institution_name = serializers.CharField(source='institution.name', read_only=True)
     type_display = serializers.CharField(source='get_type_display', read_only=True)
     is_lab = serializers.BooleanField(read_only=True)  # NEP-2020 property
+
+    select_related_fields = {'institution_name': ['institution']}
     
     class Meta:
         model = Room
@@ -133,7 +151,7 @@ class RoomSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class TimetableSessionSerializer(serializers.ModelSerializer):
+class TimetableSessionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Timetable session serializer
     """
@@ -143,6 +161,13 @@ class TimetableSessionSerializer(serializers.ModelSerializer):
     class_group_details = ClassGroupSerializer(source='class_group', read_only=True)
     session_type_display = serializers.CharField(source='get_session_type_display', read_only=True)
     day_display = serializers.CharField(source='get_day_display', read_only=True)
+
+    expandable_fields = {
+        'subject': 'subject_details',
+        'teacher': 'teacher_details',
+        'room': 'room_details',
+        'class_group': 'class_group_details',
+    }
     
     class Meta:
         model = TimetableSession
@@ -156,6 +181,30 @@ class TimetableSessionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
+class TimetableSessionRowSerializer(serializers.ModelSerializer):
+    """
+    Flat session row for grouped views; needs subject, teacher__user, room
+    and class_group__branch selected
+    """
+    subject_code = serializers.CharField(source='subject.code', read_only=True, allow_null=True)
+    subject_name = serializers.CharField(source='subject.name', read_only=True, allow_null=True)
+    subject_type = serializers.CharField(source='subject.type', read_only=True, allow_null=True)
+    teacher_name = serializers.CharField(source='teacher.user.get_full_name', read_only=True, allow_null=True)
+    room_code = serializers.CharField(source='room.code', read_only=True, allow_null=True)
+    room_name = serializers.CharField(source='room.name', read_only=True, allow_null=True)
+    class_group_name = serializers.CharField(source='class_group.name', read_only=True)
+    
+    class Meta:
+        model = TimetableSession
+        fields = [
+            'id', 'subject', 'subject_code', 'subject_name', 'subject_type',
+            'teacher', 'teacher_name', 'room', 'room_code', 'room_name',
+            'class_group', 'class_group_name', 'day_of_week', 'start_time', 'end_time',
+            'session_type', 'notes', 'is_fixed'
+        ]
+        read_only_fields = fields
+
+
 class TimetableSerializer(serializers.ModelSerializer):
     """
     Timetable serializer
@@ -163,7 +212,7 @@ class TimetableSerializer(serializers.ModelSerializer):
     institution_name = serializers.CharField(source='institution.name', read_only=True)
     generated_by_name = serializers.CharField(source='generated_by.get_full_name', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
-    sessions = TimetableSessionSerializer(many=True, read_only=True)
+    sessions = serializers.SerializerMethodField()
     
     class Meta:
         model = Timetable
@@ -179,6 +228,13 @@ class TimetableSerializer(serializers.ModelSerializer):
             'conflicts_resolved', 'optimization_score', 'created_at', 'updated_at'
         ]
 
+    def get_sessions(self, obj):
+        # Rows, or the rebuilt sessions of a compacted archived timetable.
+        # No request in the context: nested sessions stay complete under
+        # the timetable's own sparse fieldset.
+        sessions = attach_references(timetable_sessions(obj), get_reference_bundle(obj.institution_id))
+        return TimetableSessionSerializer(sessions, many=True).data
+
 
 class TimetableListSerializer(serializers.ModelSerializer):
     """
@@ -196,3 +252,49 @@ class TimetableListSerializer(serializers.ModelSerializer):
             'algorithm_used', 'total_sessions', 'optimization_score', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
+
+
+class GenerationRunListSerializer(serializers.ModelSerializer):
+    """
+    Generation run summary for list views
+    """
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = GenerationRun
+        fields = [
+            'id', 'institution', 'timetable', 'started_by', 'status', 'status_display',
+            'total_time', 'summary', 'error', 'created_at'
+        ]
+        read_only_fields = fields
+
+
+class GenerationJobSerializer(serializers.ModelSerializer):
+    """
+    Queued generation with its claim state and result
+    """
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = GenerationJob
+        fields = [
+            'id', 'institution', 'requested_by', 'kind', 'name', 'parameters', 'priority', 'cpu_budget',
+            'status', 'status_display', 'worker', 'attempts', 'max_attempts', 'claimed_at', 'heartbeat_at',
+            'finished_at', 'timetable', 'result', 'error', 'created_at'
+        ]
+        read_only_fields = fields
+
+
+class GenerationRunSerializer(serializers.ModelSerializer):
+    """
+    Generation run with its full per-phase trace
+    """
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = GenerationRun
+        fields = [
+            'id', 'institution', 'timetable', 'started_by', 'status', 'status_display',
+            'parameters', 'total_time', 'summary', 'spans', 'error', 'details', 'created_at'
+        ]
+        read_only_fields = fields
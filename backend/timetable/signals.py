@@ -0,0 +1,71 @@
+"""
+Revision tracking for reference data, and archive chain upkeep. Session
+edits bump their timetable's revision explicitly (see
+conditional.bump_timetable_revision).
+"""
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .archive import rebase_deltas
+from .models import (
+    Branch, ClassGroup, Institution, Room, Subject, Teacher, TeacherSubject, TimetableArchive
+)
+from .reference_cache import drop_reference_bundle, invalidate_reference_data
+
+
+def _institution_id(instance):
+    """
+    Institution a reference row belongs to, without loading related objects
+    """
+    if isinstance(instance, (Branch, Room)):
+        return instance.institution_id
+    if isinstance(instance, (Subject, ClassGroup)):
+        branch_id = instance.branch_id
+    elif isinstance(instance, Teacher):
+        branch_id = instance.department_id
+    elif isinstance(instance, TeacherSubject):
+        branch_id = Subject.objects.filter(id=instance.subject_id).values_list('branch_id', flat=True).first()
+    else:
+        return None
+    # The branch may already be gone when a cascade deletes its rows
+    return Branch.objects.filter(id=branch_id).values_list('institution_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Branch)
+@receiver([post_save, post_delete], sender=Subject)
+@receiver([post_save, post_delete], sender=Teacher)
+@receiver([post_save, post_delete], sender=TeacherSubject)
+@receiver([post_save, post_delete], sender=Room)
+@receiver([post_save, post_delete], sender=ClassGroup)
+def reference_data_changed(sender, instance, **kwargs):
+    invalidate_reference_data(_institution_id(instance))
+
+
+@receiver(m2m_changed, sender=Teacher.classes_assigned.through)
+def teacher_branches_changed(sender, instance, action, **kwargs):
+    # instance is the teacher, or the branch for reverse changes
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_reference_data(_institution_id(instance))
+
+
+@receiver(post_save, sender=get_user_model())
+def teacher_user_changed(sender, instance, created, update_fields=None, **kwargs):
+    # Bundles carry teacher names; logins only touch last_login
+    if not created and not (update_fields and set(update_fields) <= {'last_login'}):
+        teacher = Teacher.objects.filter(user=instance).only('department_id').first()
+        if teacher:
+            invalidate_reference_data(_institution_id(teacher))
+
+
+@receiver([post_save, post_delete], sender=Institution)
+def institution_changed(sender, instance, **kwargs):
+    # Institution fields are read fresh; only drop bundles of a reused id
+    drop_reference_bundle(instance.id)
+
+
+@receiver(pre_delete, sender=TimetableArchive)
+def archive_deleted(sender, instance, **kwargs):
+    # Deltas cannot outlive their base; they become full snapshots
+    rebase_deltas(instance)
@@ -0,0 +1,36 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from timetable.management.commands.check_query_plans import (
+    CASES, SESSION_TABLE, TIMETABLE_TABLE, check_plan, explain, table_indexes,
+)
+
+
+class QueryPlanTests(TestCase):
+    """
+    The session, analytics and export queries are planned on the composite
+    indexes of the configured database
+    """
+
+    ids = {'timetable': 1, 'institution': 1, 'teacher': 1, 'room': 1, 'class_group': 1}
+
+    def test_queries_use_expected_indexes(self):
+        indexes = {table: table_indexes(table) for table in (SESSION_TABLE, TIMETABLE_TABLE)}
+        for case in CASES:
+            with self.subTest(case=case.name):
+                case.plan = explain(case.build(self.ids))
+                self.assertEqual(check_plan(case, indexes), [], case.plan)
+
+    def test_session_indexes_exist(self):
+        indexes = table_indexes(SESSION_TABLE)
+        for name in ('session_timetable_teacher_idx', 'session_timetable_room_idx', 'session_timetable_class_idx'):
+            self.assertIn(name, indexes)
+        self.assertEqual(indexes['session_timetable_teacher_idx'][:2], ['timetable_id', 'teacher_id'])
+
+    def test_check_query_plans_command(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn(f"All {len(CASES)} queries use the expected indexes on {connection.vendor}", out.getvalue())
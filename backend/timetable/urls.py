@@ -12,6 +12,8 @@ router.register(r'rooms', views.RoomViewSet)
 router.register(r'class-groups', views.ClassGroupViewSet)
 router.register(r'timetables', views.TimetableViewSet)
 router.register(r'sessions', views.TimetableSessionViewSet)
+router.register(r'generation-runs', views.GenerationRunViewSet)
+router.register(r'generation-jobs', views.GenerationJobViewSet)
 
 urlpatterns = [
     # Export endpoints
@@ -20,6 +22,9 @@ urlpatterns = [
     path('timetables/<int:timetable_id>/export/png/', export_views.export_timetable_png, name='export-timetable-png'),
     path('timetables/<int:timetable_id>/export/ics/', export_views.export_timetable_ics, name='export-timetable-ics'),
     
+    # Timetable / variant comparison
+    path('diff/', views.TimetableDiffView.as_view(), name='timetable-diff'),
+
     # Analytics endpoints
     path('analytics/faculty-workload/', 
          views.FacultyWorkloadAnalyticsView.as_view(), 
@@ -0,0 +1,242 @@
+"""
+Server-side storage of generated timetable variants.
+
+A variant's sessions are kept as eight int32 columns (subject, teacher,
+room, class group, day, start and end minute, session type index),
+zlib-compressed. A few hundred bytes cover what the JSON solution spent
+tens of kilobytes on. Responses carry metrics and the variant id only;
+committing promotes the stored rows into a Timetable with bulk writes.
+"""
+
+import logging
+import uuid
+import zlib
+from datetime import time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .grid import SESSION_TYPES
+from .models import Institution, Timetable, TimetableSession, TimetableVariant
+from .reference_cache import get_reference_bundle
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('subject_id', 'teacher_id', 'room_id', 'class_group_id', 'day_of_week', 'start_time', 'end_time',
+           'session_type')
+SUCCESSFUL = ('optimal', 'feasible')
+# Version numbers tried when concurrent commits take the next one first
+VERSION_ATTEMPTS = 3
+
+
+def _minutes(value) -> int:
+    if isinstance(value, time):
+        return value.hour * 60 + value.minute
+    hours, minutes = str(value).split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def _time(minutes: int) -> time:
+    return time(minutes // 60, minutes % 60)
+
+
+def session_columns(sessions: Iterable[Dict]) -> np.ndarray:
+    """
+    Session dicts (solution records or TimetableSession values) -> int32
+    array of shape (len(COLUMNS), sessions); missing ids are -1
+    """
+    type_index = {session_type: index for index, session_type in enumerate(SESSION_TYPES)}
+    rows = [
+        (
+            session['subject_id'] if session.get('subject_id') is not None else -1,
+            session['teacher_id'] if session.get('teacher_id') is not None else -1,
+            session['room_id'] if session.get('room_id') is not None else -1,
+            session['class_group_id'],
+            session['day_of_week'],
+            _minutes(session['start_time']),
+            _minutes(session['end_time']),
+            type_index.get(session.get('session_type'), 0),
+        )
+        for session in sessions
+    ]
+    return np.ascontiguousarray(np.array(rows, dtype='<i4').reshape(-1, len(COLUMNS)).T)
+
+
+def pack_sessions(sessions: List[Dict]) -> bytes:
+    """
+    Solution session dicts -> compressed column block
+    """
+    return zlib.compress(session_columns(sessions).tobytes())
+
+
+def unpack_sessions(blob: bytes) -> np.ndarray:
+    """
+    Column block -> int32 array of shape (len(COLUMNS), sessions)
+    """
+    return np.frombuffer(zlib.decompress(bytes(blob)), dtype='<i4').reshape(len(COLUMNS), -1)
+
+
+def session_rows(columns: np.ndarray) -> List[Dict]:
+    """
+    Unpacked columns as TimetableSession field dicts
+    """
+    rows = []
+    for subject_id, teacher_id, room_id, class_group_id, day, start, end, session_type in columns.T.tolist():
+        rows.append({
+            'subject_id': subject_id if subject_id >= 0 else None,
+            'teacher_id': teacher_id if teacher_id >= 0 else None,
+            'room_id': room_id if room_id >= 0 else None,
+            'class_group_id': class_group_id,
+            'day_of_week': day,
+            'start_time': _time(start),
+            'end_time': _time(end),
+            'session_type': SESSION_TYPES[session_type],
+        })
+    return rows
+
+
+def _scalar_statistics(solution: Dict) -> Dict:
+    statistics = solution.get('statistics', {})
+    return {key: value for key, value in statistics.items() if not isinstance(value, (dict, list))}
+
+
+def store_variants(institution, user, name: str, variants: List[Dict]) -> List[Dict]:
+    """
+    Persist the successful variants of one generation request and return
+    the variant dicts without their solutions, each with the stored ``id``
+    """
+    batch = uuid.uuid4().hex
+    reference_revision = institution.reference_revision
+    stored, summaries = [], []
+    for index, variant in enumerate(variants, start=1):
+        summary = {key: value for key, value in variant.items() if key != 'solution'}
+        summaries.append(summary)
+        solution = variant.get('solution') or {}
+        if variant.get('status') not in SUCCESSFUL or not solution.get('sessions'):
+            continue
+        stored.append((summary, TimetableVariant(
+            institution=institution,
+            branch_id=variant.get('branch_id'),
+            created_by=user,
+            batch=batch,
+            number=variant.get('variant_id', index),
+            name=name,
+            session_count=len(solution['sessions']),
+            sessions=pack_sessions(solution['sessions']),
+            metrics=variant.get('metrics') or {},
+            details={
+                'status': variant['status'],
+                'statistics': _scalar_statistics(solution),
+                **{key: variant[key] for key in ('diversity', 'solver_stats', 'coordination', 'branch_name')
+                   if key in variant},
+            },
+            reference_revision=reference_revision,
+        )))
+
+    with transaction.atomic():
+        TimetableVariant.objects.bulk_create([variant for _, variant in stored])
+        expire_variants(institution.id)
+    for summary, variant in stored:
+        summary['id'] = variant.id
+        summary['batch'] = batch
+
+    logger.info(f"Stored {len(stored)} variants of '{name}' for institution {institution.id} (batch {batch})")
+    return summaries
+
+
+def expire_variants(institution_id: Optional[int] = None) -> int:
+    """
+    Delete pending variants older than TIMETABLE_VARIANT_TTL_HOURS
+    """
+    cutoff = timezone.now() - timedelta(hours=getattr(settings, 'TIMETABLE_VARIANT_TTL_HOURS', 24))
+    expired = TimetableVariant.objects.filter(status=TimetableVariant.Status.PENDING, created_at__lt=cutoff)
+    if institution_id is not None:
+        expired = expired.filter(institution_id=institution_id)
+    deleted, _ = expired.delete()
+    return deleted
+
+
+def _missing_references(institution_id: int, columns: np.ndarray) -> List[str]:
+    bundle = get_reference_bundle(institution_id)
+    known = {
+        'subject': {item.id for item in bundle.subjects},
+        'teacher': {item.id for item in bundle.teachers},
+        'room': {item.id for item in bundle.rooms},
+        'class_group': {item.id for item in bundle.class_groups},
+    }
+    missing = []
+    for row, (label, ids) in enumerate(known.items()):
+        unknown = set(np.unique(columns[row]).tolist()) - ids - {-1}
+        if unknown:
+            missing.append(f"{label} {', '.join(str(item) for item in sorted(unknown))}")
+    return missing
+
+
+def commit_variant(variant_id: int, user, name: Optional[str] = None) -> Tuple[TimetableVariant, bool]:
+    """
+    Promote a stored variant to an active Timetable. Returns the variant,
+    its ``timetable`` set, and whether the timetable was created now;
+    committing a variant again returns the existing timetable. Raises
+    TimetableVariant.DoesNotExist, or ValueError when the variant references
+    deleted rows.
+    """
+    with transaction.atomic():
+        variant = TimetableVariant.objects.select_for_update().select_related('institution').get(id=variant_id)
+        if variant.status == TimetableVariant.Status.COMMITTED and variant.timetable_id:
+            return variant, False
+
+        columns = unpack_sessions(variant.sessions)
+        missing = _missing_references(variant.institution_id, columns)
+        if missing:
+            raise ValueError(f"Variant references deleted {'; '.join(missing)}")
+
+        # The institution row lock serializes version numbers where row locks
+        # exist; elsewhere a lost race retries with the next version
+        institution = Institution.objects.select_for_update().get(id=variant.institution_id)
+        statistics = variant.details.get('statistics', {})
+        fields = dict(
+            institution=institution,
+            name=name or variant.name,
+            academic_year=institution.academic_year,
+            semester=1,
+            status=Timetable.Status.ACTIVE,
+            generated_by=user,
+            algorithm_used='OR-Tools CP-SAT Enhanced',
+            total_sessions=columns.shape[1],
+            conflicts_resolved=statistics.get('conflicts_resolved', 0),
+            optimization_score=variant.metrics.get('quality_score', statistics.get('optimization_score', 0.0)),
+            generation_parameters={
+                'variant_id': variant.id,
+                'variant_batch': variant.batch,
+                'variant_number': variant.number,
+                'solver_status': variant.details.get('status', 'unknown'),
+                'solving_time': variant.details.get('solver_stats', {}).get('solve_time', 0),
+            },
+        )
+        for attempt in range(VERSION_ATTEMPTS):
+            latest = Timetable.objects.filter(
+                institution=institution, academic_year=institution.academic_year, semester=1
+            ).aggregate(version=Max('version'))['version']
+            try:
+                with transaction.atomic():
+                    timetable = Timetable.objects.create(version=(latest or 0) + 1, **fields)
+                break
+            except IntegrityError:
+                if attempt == VERSION_ATTEMPTS - 1:
+                    raise
+                logger.warning(f"Timetable version {(latest or 0) + 1} of institution {institution.id} "
+                               f"was taken concurrently, retrying")
+        TimetableSession.objects.bulk_create(
+            [TimetableSession(timetable=timetable, **row) for row in session_rows(columns)], batch_size=1000
+        )
+
+        variant.status = TimetableVariant.Status.COMMITTED
+        variant.timetable = timetable
+        variant.save(update_fields=['status', 'timetable'])
+
+    logger.info(f"Committed variant {variant.id} as timetable {timetable.id} ({timetable.total_sessions} sessions)")
+    return variant, True
@@ -6,6 +6,8 @@ from django.db.models import Q, Count, Avg
 from django.http import HttpResponse, JsonResponse
 from django.core.exceptions import ValidationError
 from django.conf import settings
+from django.utils import timezone
+from django.utils.decorators import method_decorator
 import json
 import logging
 import io
@@ -14,14 +16,23 @@ from datetime import datetime
 from users.permissions import IsAdminUser, IsFacultyOrAdmin
 from .models import (
     Institution, Branch, ClassGroup, Subject, Teacher,
-    Room, Timetable, TimetableSession
+    Room, Timetable, TimetableSession, GenerationRun, GenerationJob, TimetableVariant
 )
 from .serializers import (
     InstitutionSerializer, BranchSerializer, ClassGroupSerializer,
     SubjectSerializer, TeacherSerializer, RoomSerializer,
-    TimetableSerializer, TimetableListSerializer, TimetableSessionSerializer
+    TimetableSerializer, TimetableListSerializer, TimetableSessionSerializer,
+    GenerationRunSerializer, GenerationRunListSerializer, GenerationJobSerializer
 )
 from .export_utils import TimetableExporter
+from .fieldsets import SparseFieldsetViewMixin
+from .pagination import KeysetPagination
+from .conditional import analytics_from_request, bump_timetable_revision, conditional, timetable_from_request
+from .archive import compact_timetable, restore_timetable, timetable_sessions
+from .diff import diff_sources, parse_source
+from .grid import build_timetable_grid
+from .grouped_sessions import grouped_sessions
+from .reference_cache import attach_references, get_reference_bundle
 from .excel_utils import ExcelParser, ExcelTemplateGenerator
 
 logger = logging.getLogger(__name__)
@@ -193,13 +204,14 @@ class ClassGroupViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class SubjectViewSet(viewsets.ModelViewSet):
+class SubjectViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     Subject management viewset
     """
     queryset = Subject.objects.all()
     serializer_class = SubjectSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -209,7 +221,7 @@ class SubjectViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
     
     def get_queryset(self):
-        queryset = Subject.objects.all()
+        queryset = self.plan_queryset(Subject.objects.all())
         branch_id = self.request.query_params.get('branch_id')
         semester = self.request.query_params.get('semester')
         year = self.request.query_params.get('year')
@@ -261,13 +273,14 @@ class SubjectViewSet(viewsets.ModelViewSet):
             )
 
 
-class TeacherViewSet(viewsets.ModelViewSet):
+class TeacherViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     Teacher management viewset
     """
     queryset = Teacher.objects.all()
     serializer_class = TeacherSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -277,7 +290,7 @@ class TeacherViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
     
     def get_queryset(self):
-        queryset = Teacher.objects.select_related('user', 'department')
+        queryset = self.plan_queryset(Teacher.objects.all())
         department_id = self.request.query_params.get('department_id')
         designation = self.request.query_params.get('designation')
         
@@ -357,6 +370,10 @@ class TimetableViewSet(viewsets.ModelViewSet):
             
         return queryset
     
+    @method_decorator(conditional(timetable_from_request))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     @action(detail=True, methods=['post'])
     def activate(self, request, pk=None):
         """
@@ -370,68 +387,68 @@ class TimetableViewSet(viewsets.ModelViewSet):
         
         timetable = self.get_object()
         
+        # A compacted archived timetable gets its session rows back
+        if timetable.status == Timetable.Status.ARCHIVED:
+            restore_timetable(timetable)
+        
         # Deactivate other timetables for the same institution/semester
-        Timetable.objects.filter(
+        semester_timetables = Timetable.objects.filter(
             institution=timetable.institution,
             academic_year=timetable.academic_year,
             semester=timetable.semester
-        ).update(status=Timetable.Status.ARCHIVED)
+        )
+        newly_archived = list(
+            semester_timetables.exclude(id=timetable.id).exclude(status=Timetable.Status.ARCHIVED)
+            .values_list('id', flat=True)
+        )
+        semester_timetables.update(status=Timetable.Status.ARCHIVED, updated_at=timezone.now())
         
         # Activate this timetable
         timetable.status = Timetable.Status.ACTIVE
         timetable.save()
         
+        if getattr(settings, 'TIMETABLE_ARCHIVE_ON_ACTIVATE', True):
+            for timetable_id in sorted(newly_archived):
+                compact_timetable(timetable_id)
+        
         return Response({'message': 'Timetable activated successfully'})
     
     @action(detail=True, methods=['get'])
+    @method_decorator(conditional(timetable_from_request))
+    def grid(self, request, pk=None):
+        """
+        Compact columnar sessions with each referenced entity sent once
+        """
+        timetable = self.get_object()
+        return Response(build_timetable_grid(timetable))
+    
+    @action(detail=True, methods=['get'])
+    @method_decorator(conditional(timetable_from_request))
     def sessions_by_class(self, request, pk=None):
         """
         Get sessions grouped by class
         """
         timetable = self.get_object()
-        sessions = timetable.sessions.select_related(
-            'subject', 'teacher__user', 'room', 'class_group'
-        ).order_by('class_group', 'day_of_week', 'start_time')
-        
-        # Group by class
-        sessions_by_class = {}
-        for session in sessions:
-            class_key = str(session.class_group)
-            if class_key not in sessions_by_class:
-                sessions_by_class[class_key] = []
-            sessions_by_class[class_key].append(TimetableSessionSerializer(session).data)
-        
-        return Response(sessions_by_class)
+        return Response(grouped_sessions(timetable, 'class'))
     
     @action(detail=True, methods=['get'])
+    @method_decorator(conditional(timetable_from_request))
     def sessions_by_teacher(self, request, pk=None):
         """
         Get sessions grouped by teacher
         """
         timetable = self.get_object()
-        sessions = timetable.sessions.select_related(
-            'subject', 'teacher__user', 'room', 'class_group'
-        ).order_by('teacher', 'day_of_week', 'start_time')
-        
-        # Group by teacher
-        sessions_by_teacher = {}
-        for session in sessions:
-            if session.teacher:
-                teacher_key = session.teacher.user.get_full_name()
-                if teacher_key not in sessions_by_teacher:
-                    sessions_by_teacher[teacher_key] = []
-                sessions_by_teacher[teacher_key].append(TimetableSessionSerializer(session).data)
-        
-        return Response(sessions_by_teacher)
+        return Response(grouped_sessions(timetable, 'teacher'))
 
 
-class TimetableSessionViewSet(viewsets.ModelViewSet):
+class TimetableSessionViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     Timetable session management viewset
     """
     queryset = TimetableSession.objects.all()
     serializer_class = TimetableSessionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -441,9 +458,7 @@ class TimetableSessionViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
     
     def get_queryset(self):
-        queryset = TimetableSession.objects.select_related(
-            'timetable', 'subject', 'teacher__user', 'room', 'class_group'
-        )
+        queryset = self.plan_queryset(TimetableSession.objects.all())
         
         timetable_id = self.request.query_params.get('timetable_id')
         class_group_id = self.request.query_params.get('class_group_id')
@@ -460,6 +475,106 @@ class TimetableSessionViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(day_of_week=day_of_week)
             
         return queryset
+    
+    @method_decorator(conditional(timetable_from_request))
+    def list(self, request, *args, **kwargs):
+        archived = self._archived_sessions()
+        if archived is not None:
+            # Compacted archives have no session rows or ids to page by; they
+            # are one timetable's worth of read-only history, sent as one page
+            return Response({
+                'next': None,
+                'previous': None,
+                'results': self.get_serializer(archived, many=True).data,
+            })
+        return super().list(request, *args, **kwargs)
+
+    def _archived_sessions(self):
+        """
+        Filtered sessions of the requested timetable when it is a compacted
+        archive, else None
+        """
+        timetable_id = self.request.query_params.get('timetable_id')
+        timetable = Timetable.objects.filter(id=timetable_id).first() if str(timetable_id).isdigit() else None
+        if timetable is None or timetable.status != Timetable.Status.ARCHIVED:
+            return None
+        sessions = timetable_sessions(timetable)
+        if not isinstance(sessions, list):
+            return None
+        # Same filters as get_queryset, compared as query-string values
+        filters = {
+            name: self.request.query_params[name] for name in ('class_group_id', 'teacher_id', 'day_of_week')
+            if name in self.request.query_params
+        }
+        sessions = [session for session in sessions
+                    if all(str(getattr(session, field)) == value for field, value in filters.items())]
+        return attach_references(sessions, get_reference_bundle(timetable.institution_id))
+
+    def perform_create(self, serializer):
+        session = serializer.save()
+        bump_timetable_revision(session.timetable_id)
+
+    def perform_update(self, serializer):
+        previous = serializer.instance.timetable_id
+        session = serializer.save()
+        bump_timetable_revision(previous, session.timetable_id)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        bump_timetable_revision(instance.timetable_id)
+
+
+class GenerationRunViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Per-phase traces of timetable generation runs
+    """
+    queryset = GenerationRun.objects.all()
+    permission_classes = [IsAuthenticated, IsFacultyOrAdmin]
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return GenerationRunListSerializer
+        return GenerationRunSerializer
+
+    def get_queryset(self):
+        queryset = GenerationRun.objects.all()
+        if self.action == 'list':
+            queryset = queryset.defer('spans', 'details', 'parameters')
+
+        institution_id = self.request.query_params.get('institution_id')
+        timetable_id = self.request.query_params.get('timetable_id')
+        status_filter = self.request.query_params.get('status')
+
+        if institution_id:
+            queryset = queryset.filter(institution_id=institution_id)
+        if timetable_id:
+            queryset = queryset.filter(timetable_id=timetable_id)
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+
+        return queryset
+
+
+class GenerationJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Queued and finished generation jobs
+    """
+    queryset = GenerationJob.objects.all()
+    serializer_class = GenerationJobSerializer
+    permission_classes = [IsAuthenticated, IsFacultyOrAdmin]
+
+    def get_queryset(self):
+        queryset = GenerationJob.objects.all()
+
+        institution_id = self.request.query_params.get('institution_id')
+        status_filter = self.request.query_params.get('status')
+
+        if institution_id:
+            queryset = queryset.filter(institution_id=institution_id)
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+
+        return queryset
 
 
 class ExportTimetableView(generics.GenericAPIView):
@@ -468,6 +583,7 @@ class ExportTimetableView(generics.GenericAPIView):
     """
     permission_classes = [IsAuthenticated]
 
+    @method_decorator(conditional(timetable_from_request))
     def get(self, request, timetable_id, format):
         try:
             timetable = Timetable.objects.get(id=timetable_id)
@@ -505,34 +621,76 @@ class ExportTimetableView(generics.GenericAPIView):
         )
 
 
+def _analytics_sessions(timetable_id, institution_id):
+    """
+    Sessions of one timetable, or of an institution's active timetables, with
+    references attached from the reference cache; None without a scope
+    """
+    if timetable_id:
+        timetable = Timetable.objects.filter(id=timetable_id).first()
+        if timetable is None:
+            return [], None
+        institution_id = timetable.institution_id
+        sessions = timetable_sessions(timetable)
+    elif institution_id:
+        # Get active timetables for the institution
+        active_timetables = Timetable.objects.filter(
+            institution_id=institution_id,
+            status=Timetable.Status.ACTIVE
+        )
+        sessions = TimetableSession.objects.filter(timetable__in=active_timetables)
+    else:
+        return None
+    bundle = get_reference_bundle(institution_id) if institution_id else None
+    return attach_references(sessions, bundle), bundle
+
+
+class TimetableDiffView(generics.GenericAPIView):
+    """
+    Differences between two timetables or variants:
+    ?base=timetable:<id>|variant:<id>&other=timetable:<id>|variant:<id>
+    """
+    permission_classes = [IsAuthenticated, IsFacultyOrAdmin]
+
+    def get(self, request):
+        base = parse_source(request.query_params.get('base'))
+        other = parse_source(request.query_params.get('other'))
+        if base is None or other is None:
+            return Response(
+                {'error': 'base and other are required, as timetable:<id> or variant:<id>'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            return Response(diff_sources(base, other))
+        except (Timetable.DoesNotExist, TimetableVariant.DoesNotExist) as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
 class FacultyWorkloadAnalyticsView(generics.GenericAPIView):
     """
     Faculty workload analytics
     """
     permission_classes = [IsAuthenticated, IsFacultyOrAdmin]
 
+    @method_decorator(conditional(analytics_from_request))
     def get(self, request):
         institution_id = request.query_params.get('institution_id')
         timetable_id = request.query_params.get('timetable_id')
 
-        if timetable_id:
-            sessions = TimetableSession.objects.filter(timetable_id=timetable_id)
-        elif institution_id:
-            # Get active timetables for the institution
-            active_timetables = Timetable.objects.filter(
-                institution_id=institution_id,
-                status=Timetable.Status.ACTIVE
-            )
-            sessions = TimetableSession.objects.filter(timetable__in=active_timetables)
-        else:
+        loaded = _analytics_sessions(timetable_id, institution_id)
+        if loaded is None:
             return Response(
                 {'error': 'institution_id or timetable_id required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        sessions, _ = loaded
 
         # Calculate workload per teacher
         workload_data = {}
-        for session in sessions.select_related('teacher__user'):
+        for session in sessions:
             if session.teacher:
                 teacher_name = session.teacher.user.get_full_name()
                 if teacher_name not in workload_data:
@@ -575,39 +733,37 @@ class RoomUtilizationAnalyticsView(generics.GenericAPIView):
     """
     permission_classes = [IsAuthenticated, IsFacultyOrAdmin]
 
+    @method_decorator(conditional(analytics_from_request))
     def get(self, request):
         institution_id = request.query_params.get('institution_id')
         timetable_id = request.query_params.get('timetable_id')
 
-        if timetable_id:
-            sessions = TimetableSession.objects.filter(timetable_id=timetable_id)
-            rooms = Room.objects.filter(
-                timetablesession__timetable_id=timetable_id
-            ).distinct()
-        elif institution_id:
-            active_timetables = Timetable.objects.filter(
-                institution_id=institution_id,
-                status=Timetable.Status.ACTIVE
-            )
-            sessions = TimetableSession.objects.filter(timetable__in=active_timetables)
-            rooms = Room.objects.filter(institution_id=institution_id)
-        else:
+        loaded = _analytics_sessions(timetable_id, institution_id)
+        if loaded is None:
             return Response(
                 {'error': 'institution_id or timetable_id required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        sessions, bundle = loaded
+        sessions_by_room = {}
+        for session in sessions:
+            sessions_by_room.setdefault(session.room_id, []).append(session)
+        rooms = bundle.rooms if bundle else []
+        if timetable_id:
+            # Only rooms the timetable uses
+            rooms = [room for room in rooms if room.id in sessions_by_room]
 
         # Calculate utilization per room
         utilization_data = {}
 
         for room in rooms:
-            room_sessions = sessions.filter(room=room)
+            room_sessions = sessions_by_room.get(room.id, [])
             utilization_data[room.name] = {
                 'room_id': room.id,
                 'room_code': room.code,
                 'room_type': room.get_type_display(),
                 'capacity': room.capacity,
-                'total_sessions': room_sessions.count(),
+                'total_sessions': len(room_sessions),
                 'utilization_by_day': {0: 0, 1: 0, 2: 0, 3: 0, 4: 0, 5: 0, 6: 0},
                 'subjects_taught': set(),
                 'classes_hosted': set()
@@ -626,7 +782,7 @@ class RoomUtilizationAnalyticsView(generics.GenericAPIView):
             # Calculate utilization percentage (assuming 8 slots per day, 5 days a week)
             max_possible_sessions = 40  # 8 slots * 5 days
             utilization_data[room.name]['utilization_percentage'] = (
-                room_sessions.count() / max_possible_sessions * 100
+                len(room_sessions) / max_possible_sessions * 100
             ) if max_possible_sessions > 0 else 0
 
         return Response({
@@ -654,40 +810,38 @@ class StudentDensityAnalyticsView(generics.GenericAPIView):
     """
     permission_classes = [IsAuthenticated, IsFacultyOrAdmin]
 
+    @method_decorator(conditional(analytics_from_request))
     def get(self, request):
         institution_id = request.query_params.get('institution_id')
         timetable_id = request.query_params.get('timetable_id')
 
-        if timetable_id:
-            sessions = TimetableSession.objects.filter(timetable_id=timetable_id)
-            class_groups = ClassGroup.objects.filter(
-                timetablesession__timetable_id=timetable_id
-            ).distinct()
-        elif institution_id:
-            active_timetables = Timetable.objects.filter(
-                institution_id=institution_id,
-                status=Timetable.Status.ACTIVE
-            )
-            sessions = TimetableSession.objects.filter(timetable__in=active_timetables)
-            class_groups = ClassGroup.objects.filter(branch__institution_id=institution_id)
-        else:
+        loaded = _analytics_sessions(timetable_id, institution_id)
+        if loaded is None:
             return Response(
                 {'error': 'institution_id or timetable_id required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        sessions, bundle = loaded
+        sessions_by_class = {}
+        for session in sessions:
+            sessions_by_class.setdefault(session.class_group_id, []).append(session)
+        class_groups = bundle.class_groups if bundle else []
+        if timetable_id:
+            # Only classes the timetable schedules
+            class_groups = [class_group for class_group in class_groups if class_group.id in sessions_by_class]
 
         # Calculate density per class
         density_data = {}
 
         for class_group in class_groups:
-            class_sessions = sessions.filter(class_group=class_group)
+            class_sessions = sessions_by_class.get(class_group.id, [])
             density_data[str(class_group)] = {
                 'class_id': class_group.id,
                 'branch': class_group.branch.name,
                 'year': class_group.year,
                 'section': class_group.section,
                 'strength': class_group.strength,
-                'total_sessions': class_sessions.count(),
+                'total_sessions': len(class_sessions),
                 'sessions_by_day': {0: 0, 1: 0, 2: 0, 3: 0, 4: 0, 5: 0, 6: 0},
                 'subjects': set(),
                 'teachers': set()
@@ -705,7 +859,7 @@ class StudentDensityAnalyticsView(generics.GenericAPIView):
             density_data[str(class_group)]['teachers'] = list(density_data[str(class_group)]['teachers'])
 
             # Calculate average sessions per day
-            total_sessions = class_sessions.count()
+            total_sessions = len(class_sessions)
             working_days = 5  # Assuming 5 working days
             density_data[str(class_group)]['avg_sessions_per_day'] = total_sessions / working_days if working_days > 0 else 0
 
@@ -1,6 +1,6 @@
 "use client"
 
-import { useState } from 'react'
+import { useEffect, useState } from 'react'
 import { motion, AnimatePresence } from 'framer-motion'
 import {
   CheckCircle,
@@ -17,11 +17,13 @@ import {
   Zap
 } from 'lucide-react'
 import toast from 'react-hot-toast'
+import { apiClient } from '@/lib/api'
+import { TimetableDiff } from '@/types'
 
 interface TimetableVariant {
+  id: number  // stored variant, sent back to commit-variant
   variant_id: number
   status: string
-  solution: any[]
   metrics: {
     total_sessions: number
     room_utilization_percent: number
@@ -57,6 +59,7 @@ export function TimetableVariantSelector({
 }: TimetableVariantSelectorProps) {
   const [selectedVariant, setSelectedVariant] = useState<TimetableVariant | null>(null)
   const [previewMode, setPreviewMode] = useState(false)
+  const [diffs, setDiffs] = useState<Record<number, TimetableDiff['summary']>>({})
 
   const getQualityColor = (score: number) => {
     if (score >= 90) return 'text-green-400'
@@ -80,6 +83,24 @@ export function TimetableVariantSelector({
 
   const successfulVariants = variants.filter(v => v.status === 'optimal' || v.status === 'feasible')
 
+  // Changes of every variant against the first one, computed server-side
+  useEffect(() => {
+    const [first, ...rest] = successfulVariants
+    if (!isOpen || !first?.id) return
+    let cancelled = false
+    Promise.all(rest.filter(v => v.id).map(v =>
+      apiClient.getTimetableDiff(`variant:${first.id}`, `variant:${v.id}`)
+        .then(diff => [v.id, diff.summary] as const)
+        .catch(() => null)
+    )).then(results => {
+      if (cancelled) return
+      const summaries: Record<number, TimetableDiff['summary']> = {}
+      results.forEach(result => { if (result) summaries[result[0]] = result[1] })
+      setDiffs(summaries)
+    })
+    return () => { cancelled = true }
+  }, [isOpen, variants])
+
   return (
     <AnimatePresence>
       {isOpen && (
@@ -237,6 +258,18 @@ export function TimetableVariantSelector({
                           </div>
                           <span className="text-white font-medium">{variant.solver_stats.solve_time.toFixed(2)}s</span>
                         </div>
+
+                        {diffs[variant.id] && (
+                          <div className="flex items-center justify-between text-sm">
+                            <div className="flex items-center space-x-2">
+                              <RefreshCw className="w-4 h-4 text-cyan-400" />
+                              <span className="text-gray-300">vs Variant {successfulVariants[0].variant_id}</span>
+                            </div>
+                            <span className="text-white font-medium">
+                              {diffs[variant.id].moved} moved · {diffs[variant.id].reassigned} reassigned
+                            </span>
+                          </div>
+                        )}
                       </div>
 
                       {/* Action Buttons */}
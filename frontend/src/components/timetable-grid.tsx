@@ -4,9 +4,56 @@ import { useState, useEffect } from 'react'
 import { motion } from 'framer-motion'
 import { Clock, MapPin, User, BookOpen } from 'lucide-react'
 import { apiClient } from '@/lib/api'
-import { Timetable, TimetableSession } from '@/types'
+import { ClassGroup, Room, Subject, Teacher, Timetable, TimetableGridData, TimetableSession } from '@/types'
 import { formatTime, getDayName, getSubjectTypeColor } from '@/lib/utils'
 
+// Rebuild the session objects this grid renders from the columnar payload;
+// only the detail fields shown here are filled in.
+function expandGrid(grid: TimetableGridData): TimetableSession[] {
+  const { sessions, subjects, teachers, rooms, class_groups, slots } = grid
+  return sessions.id.map((id, i) => {
+    const s = sessions.subject[i]
+    const t = sessions.teacher[i]
+    const r = sessions.room[i]
+    const c = sessions.class_group[i]
+    const slot = sessions.slot[i]
+    const sessionType = grid.session_types[sessions.session_type[i]]
+    return {
+      // Sessions of a compacted archive have no id; keep React keys unique
+      id: id ?? -(i + 1),
+      timetable: grid.timetable.id,
+      subject: s >= 0 ? subjects.id[s] : undefined,
+      subject_details: s >= 0
+        ? { id: subjects.id[s], code: subjects.code[s], name: subjects.name[s], type: subjects.type[s] } as Subject
+        : undefined,
+      teacher: t >= 0 ? teachers.id[t] : undefined,
+      teacher_details: t >= 0
+        ? {
+            id: teachers.id[t],
+            employee_id: teachers.employee_id[t],
+            user_details: { first_name: teachers.user_first_name[t], last_name: teachers.user_last_name[t] },
+          } as Teacher
+        : undefined,
+      room: r >= 0 ? rooms.id[r] : undefined,
+      room_details: r >= 0
+        ? { id: rooms.id[r], code: rooms.code[r], name: rooms.name[r], type: rooms.type[r], capacity: rooms.capacity[r] } as Room
+        : undefined,
+      class_group: class_groups.id[c],
+      class_group_details: { id: class_groups.id[c], name: class_groups.name[c] } as ClassGroup,
+      day_of_week: slots.day[slot],
+      day_display: grid.days[slots.day[slot]],
+      start_time: slots.start_time[slot],
+      end_time: slots.end_time[slot],
+      session_type: sessionType,
+      session_type_display: sessionType,
+      notes: grid.notes[String(id ?? i)],
+      is_fixed: sessions.is_fixed[i] === 1,
+      created_at: '',
+      updated_at: '',
+    }
+  })
+}
+
 interface TimetableGridProps {
   timetable: Timetable
   editable?: boolean
@@ -25,8 +72,8 @@ export function TimetableGrid({ timetable, editable = false, viewType = 'general
   const loadSessions = async () => {
     try {
       setLoading(true)
-      const sessionsData = await apiClient.getTimetableSessions(timetable.id)
-      setSessions(sessionsData)
+      const grid = await apiClient.getTimetableGrid(timetable.id)
+      setSessions(expandGrid(grid))
     } catch (error) {
       console.error('Failed to load sessions:', error)
     } finally {
@@ -12,6 +12,8 @@ import {
   ClassGroup, 
   Timetable, 
   TimetableSession,
+  TimetableGridData,
+  TimetableDiff,
   GenerateTimetableRequest,
   GenerateTimetableResponse,
   PaginatedResponse,
@@ -246,6 +248,17 @@ class ApiClient {
     return response.data.results || response.data
   }
 
+  async getTimetableGrid(timetableId: number): Promise<TimetableGridData> {
+    const response = await this.client.get(`/api/timetable/timetables/${timetableId}/grid/`)
+    return response.data
+  }
+
+  // Sources are 'timetable:<id>' or 'variant:<id>'
+  async getTimetableDiff(base: string, other: string): Promise<TimetableDiff> {
+    const response = await this.client.get('/api/timetable/diff/', { params: { base, other } })
+    return response.data
+  }
+
   async updateTimetableSession(id: number, data: Partial<TimetableSession>): Promise<TimetableSession> {
     const response = await this.client.patch(`/api/timetable/sessions/${id}/`, data)
     return response.data
@@ -199,6 +199,77 @@ export interface TimetableSession {
   updated_at: string
 }
 
+// Compact columnar timetable returned by /timetables/{id}/grid/.
+// Session columns hold positions into the entity columns (-1 = none).
+export interface TimetableGridData {
+  format_version: number
+  timetable: { id: number; name: string; version: number; status: string }
+  days: string[]
+  session_types: TimetableSession['session_type'][]
+  slots: { day: number[]; start_time: string[]; end_time: string[] }
+  subjects: { id: number[]; code: string[]; name: string[]; type: Subject['type'][] }
+  teachers: { id: number[]; employee_id: string[]; user_first_name: string[]; user_last_name: string[] }
+  rooms: { id: number[]; code: string[]; name: string[]; type: Room['type'][]; capacity: number[] }
+  class_groups: { id: number[]; name: string[]; year: number[]; section: string[] }
+  sessions: {
+    // null for sessions of a compacted archived timetable
+    id: (number | null)[]
+    subject: number[]
+    teacher: number[]
+    room: number[]
+    class_group: number[]
+    slot: number[]
+    session_type: number[]
+    is_fixed: number[]
+  }
+  // Keyed by session id, or by position when the id is null
+  notes: Record<string, string>
+}
+
+// /diff/?base=timetable:<id>|variant:<id>&other=...
+// Changed sessions and per-entity impact are column lists; missing ids are -1.
+export interface TimetableDiffSessions {
+  subject: number[]
+  teacher: number[]
+  room: number[]
+  class_group: number[]
+  day: number[]
+  start_time: string[]
+  end_time: string[]
+}
+
+export interface TimetableDiffImpact {
+  id: number[]
+  name: string[]
+  moved: number[]
+  reassigned: number[]
+  added: number[]
+  removed: number[]
+  total: number[]
+}
+
+export interface TimetableDiff {
+  format_version: number
+  base: { kind: 'timetable' | 'variant'; id: number; name: string }
+  other: { kind: 'timetable' | 'variant'; id: number; name: string }
+  summary: {
+    base_sessions: number
+    other_sessions: number
+    unchanged: number
+    moved: number
+    reassigned: number
+    added: number
+    removed: number
+  }
+  changes: {
+    moved: { base: TimetableDiffSessions; other: TimetableDiffSessions }
+    reassigned: { base: TimetableDiffSessions; other: TimetableDiffSessions }
+    added: { other: TimetableDiffSessions }
+    removed: { base: TimetableDiffSessions }
+  }
+  impact: { teachers: TimetableDiffImpact; class_groups: TimetableDiffImpact; rooms: TimetableDiffImpact }
+}
+
 // API types
 export interface ApiResponse<T> {
   success: boolean